@@ -99,6 +99,27 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Set REDIS_URL to share caches (and cross-worker coordination) between workers and instances.
+
+_REDIS_URL = os.getenv('REDIS_URL', '').strip()
+if _REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LOCMEM_CACHE_MAX_ENTRIES', 5000))},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -159,6 +180,129 @@ TMDB_API_KEY = os.getenv('TMDB_API_KEY')
 TMDB_ACCESS_TOKEN = os.getenv('TMDB_ACCESS_TOKEN')
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 
+# Upstream HTTP connection pooling (shared by TMDB and YouTube clients, one pool per worker)
+UPSTREAM_HTTP_POOL_CONNECTIONS = int(os.getenv('UPSTREAM_HTTP_POOL_CONNECTIONS', 10))  # number of hosts kept pooled
+UPSTREAM_HTTP_POOL_MAXSIZE = int(os.getenv('UPSTREAM_HTTP_POOL_MAXSIZE', 20))  # connections kept per host
+UPSTREAM_HTTP_POOL_BLOCK = os.getenv('UPSTREAM_HTTP_POOL_BLOCK', 'False') == 'True'  # wait instead of exceeding maxsize
+UPSTREAM_HTTP_KEEPALIVE = os.getenv('UPSTREAM_HTTP_KEEPALIVE', 'True') == 'True'
+
+# TMDB response cache: 'local' (in-process LRU), 'django' (CACHES alias below, shared by workers) or 'none'
+TMDB_CACHE_BACKEND = os.getenv('TMDB_CACHE_BACKEND', 'local')
+TMDB_CACHE_ALIAS = os.getenv('TMDB_CACHE_ALIAS', 'default')
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv('TMDB_CACHE_MAX_ENTRIES', 1000))  # 'local' backend only
+TMDB_CACHE_STALE_SECONDS = int(os.getenv('TMDB_CACHE_STALE_SECONDS', 3600))  # serve-stale window while refreshing
+TMDB_CACHE_TTLS = {}  # endpoint regex -> seconds, checked before the defaults in movies/cache.py
+TMDB_CACHE_FALLBACK_SECONDS = int(os.getenv('TMDB_CACHE_FALLBACK_SECONDS', 86400))  # keep last good payload for outages
+# Identical concurrent misses are collapsed into one fetch; with the 'django' backend this spans workers
+TMDB_SINGLEFLIGHT_LOCK_TIMEOUT = int(os.getenv('TMDB_SINGLEFLIGHT_LOCK_TIMEOUT', 30))  # max time a fetch lock is held
+TMDB_SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv('TMDB_SINGLEFLIGHT_WAIT_TIMEOUT', 10))  # then fetch ourselves
+
+# Per-endpoint circuit breakers (state shared through the cache alias) and retry budget
+UPSTREAM_BREAKER_CACHE_ALIAS = os.getenv('UPSTREAM_BREAKER_CACHE_ALIAS', 'default')
+UPSTREAM_BREAKER_FAILURE_THRESHOLD = int(os.getenv('UPSTREAM_BREAKER_FAILURE_THRESHOLD', 5))  # failures to open
+UPSTREAM_BREAKER_WINDOW = int(os.getenv('UPSTREAM_BREAKER_WINDOW', 30))  # seconds failures are counted over
+UPSTREAM_BREAKER_RESET_TIMEOUT = int(os.getenv('UPSTREAM_BREAKER_RESET_TIMEOUT', 30))  # open time before a probe
+UPSTREAM_RETRY_BUDGET_RATIO = float(os.getenv('UPSTREAM_RETRY_BUDGET_RATIO', 0.1))  # retries per request, at most
+
+# Cluster-wide outbound rate limits, shared through the cache alias: bucket -> (requests, per seconds[, burst]).
+# Token buckets refill continuously and hold at most `burst` tokens (default: a quarter of `requests`).
+# 'tmdb'/'youtube' cap the whole API; 'api:class' buckets (search, details, meta, lists, videos) cap one endpoint class.
+UPSTREAM_RATE_LIMIT_CACHE_ALIAS = os.getenv('UPSTREAM_RATE_LIMIT_CACHE_ALIAS', 'default')
+UPSTREAM_RATE_LIMITS = {
+    'tmdb': (int(os.getenv('TMDB_RATE_LIMIT', 40)), 10),
+    'tmdb:search': (int(os.getenv('TMDB_SEARCH_RATE_LIMIT', 20)), 10),
+    'youtube': (int(os.getenv('YOUTUBE_RATE_LIMIT', 10)), 1),
+}
+UPSTREAM_RATE_LIMIT_BACKGROUND_SHARE = float(os.getenv('UPSTREAM_RATE_LIMIT_BACKGROUND_SHARE', 0.5))  # of each bucket
+UPSTREAM_RATE_LIMIT_INTERACTIVE_WAIT = float(os.getenv('UPSTREAM_RATE_LIMIT_INTERACTIVE_WAIT', 1))  # max seconds queued
+UPSTREAM_RATE_LIMIT_BACKGROUND_WAIT = float(os.getenv('UPSTREAM_RATE_LIMIT_BACKGROUND_WAIT', 30))
+YOUTUBE_DAILY_QUOTA = int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000))  # units; resets at midnight Pacific
+YOUTUBE_QUOTA_INTERACTIVE_RESERVE = float(os.getenv('YOUTUBE_QUOTA_INTERACTIVE_RESERVE', 0.2))  # kept for page loads
+YOUTUBE_EMBED_CACHE_TTL = int(os.getenv('YOUTUBE_EMBED_CACHE_TTL', 24 * 3600))  # cached embeddable status per video
+YOUTUBE_EMBED_CACHE_ALIAS = os.getenv('YOUTUBE_EMBED_CACHE_ALIAS', 'default')  # also holds trailer lookup claims
+
+# Trailer lookups run off the request path (movies/trailers.py, `python manage.py resolve_trailers`)
+TRAILER_WORKERS = int(os.getenv('TRAILER_WORKERS', 2))  # background lookup threads per worker
+TRAILER_RETRY_AFTER = int(os.getenv('TRAILER_RETRY_AFTER', 7 * 24 * 3600))  # wait after "no embeddable trailer"
+TRAILER_ERROR_RETRY_AFTER = int(os.getenv('TRAILER_ERROR_RETRY_AFTER', 3600))  # wait after an upstream error
+
+# Local catalog mirror, filled by `python manage.py sync_catalog` (run it from cron / a scheduled job)
+CATALOG_MIRROR_BROWSE = os.getenv('CATALOG_MIRROR_BROWSE', 'True') == 'True'  # serve browse lists from the mirror
+CATALOG_MIRROR_MAX_AGE = int(os.getenv('CATALOG_MIRROR_MAX_AGE', 6 * 3600))  # older syncs fall back to TMDB
+CATALOG_CHANGES_WORKERS = int(os.getenv('CATALOG_CHANGES_WORKERS', 4))  # concurrent detail refetches in sync_changes
+
+# Hidden-movie set cached in each worker and reloaded when toggle_hide_movie bumps its version (movies/moderation.py)
+HIDDEN_MOVIES_CACHE_ALIAS = os.getenv('HIDDEN_MOVIES_CACHE_ALIAS', 'default')
+HIDDEN_MOVIES_CHECK_INTERVAL = float(os.getenv('HIDDEN_MOVIES_CHECK_INTERVAL', 1.0))  # seconds between version checks
+
+# Movie view analytics: detail pages queue MovieView rows that a background thread bulk-inserts (movies/analytics.py)
+ANALYTICS_BUFFERED = os.getenv('ANALYTICS_BUFFERED', 'True') == 'True'  # False writes one row per request
+ANALYTICS_BATCH_SIZE = int(os.getenv('ANALYTICS_BATCH_SIZE', 500))  # flush early once this many are queued
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_FLUSH_INTERVAL', 2.0))  # seconds between flushes
+ANALYTICS_BUFFER_SIZE = int(os.getenv('ANALYTICS_BUFFER_SIZE', 10000))  # beyond this, new events are dropped and counted
+ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', 90))  # raw MovieView rows kept by compact_views
+ANALYTICS_ARCHIVE_DIR = os.getenv('ANALYTICS_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'views'))  # compacted daily files
+
+# Supervisor dashboard live feed: flushed view deltas in a cache ring buffer (movies/live.py), streamed over
+# SSE under ASYNC_VIEWS (ASGI) and polled as JSON under WSGI so a dashboard never holds a sync worker.
+# Without REDIS_URL the buffer is per process and a dashboard only sees views flushed by the worker it hits.
+LIVE_FEED_CACHE_ALIAS = os.getenv('LIVE_FEED_CACHE_ALIAS', 'default')  # must be shared by all workers (Redis)
+LIVE_FEED_SIZE = int(os.getenv('LIVE_FEED_SIZE', 256))  # batches kept for reconnecting dashboards
+LIVE_FEED_POLL_INTERVAL = float(os.getenv('LIVE_FEED_POLL_INTERVAL', 1.0))  # SSE: seconds between ring buffer reads
+LIVE_FEED_CLIENT_POLL_INTERVAL = float(os.getenv('LIVE_FEED_CLIENT_POLL_INTERVAL', 5))  # WSGI: seconds between polls
+
+# Trending on Aura: exponentially decayed view scores and a shared top-K snapshot (movies/trending.py)
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 6))  # a view counts half after this long
+TRENDING_SIZE = int(os.getenv('TRENDING_SIZE', 50))  # movies kept in the snapshot
+TRENDING_CACHE_ALIAS = os.getenv('TRENDING_CACHE_ALIAS', 'default')
+TRENDING_CHECK_INTERVAL = float(os.getenv('TRENDING_CHECK_INTERVAL', 5.0))  # seconds between snapshot reloads
+
+# Local search over stored movies: FTS5 on SQLite, tsvector/GIN on PostgreSQL, trigram fallback (movies/search.py)
+SEARCH_LOCAL = os.getenv('SEARCH_LOCAL', 'True') == 'True'
+SEARCH_LOCAL_MIN_RESULTS = int(os.getenv('SEARCH_LOCAL_MIN_RESULTS', 5))  # fewer matches (and no exact title) asks TMDB
+SEARCH_LOCAL_LIMIT = int(os.getenv('SEARCH_LOCAL_LIMIT', 100))  # matches served locally (5 pages)
+SEARCH_TRIGRAM_THRESHOLD = float(os.getenv('SEARCH_TRIGRAM_THRESHOLD', 0.3))  # minimum title similarity for typos
+
+# Search results cached by normalized query and page; retention grows with how often a query is searched (movies/search_cache.py)
+SEARCH_CACHE_ALIAS = os.getenv('SEARCH_CACHE_ALIAS', 'default')
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 600))  # seconds for a query searched once today
+SEARCH_CACHE_MAX_TTL = int(os.getenv('SEARCH_CACHE_MAX_TTL', 6 * 3600))  # cap for head queries
+SEARCH_HEAD_QUERY_MIN = int(os.getenv('SEARCH_HEAD_QUERY_MIN', 5))  # searches per day before page 2 is prefetched
+
+# Search box suggestions from an in-process prefix index over stored titles (movies/autocomplete.py)
+AUTOCOMPLETE_MAX_MOVIES = int(os.getenv('AUTOCOMPLETE_MAX_MOVIES', 50000))  # most popular titles indexed
+AUTOCOMPLETE_MAX_MB = float(os.getenv('AUTOCOMPLETE_MAX_MB', 32))  # approximate memory budget per worker
+AUTOCOMPLETE_REFRESH_INTERVAL = int(os.getenv('AUTOCOMPLETE_REFRESH_INTERVAL', 300))  # seconds between incremental updates
+
+# Rendered home/browse/detail shells with per-user holes (movies/page_cache.py)
+PAGE_CACHE = os.getenv('PAGE_CACHE', 'True') == 'True'
+PAGE_CACHE_ALIAS = os.getenv('PAGE_CACHE_ALIAS', 'default')
+PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 120))  # bounds staleness of the view-count and trending rails
+
+# ETag / Last-Modified and Cache-Control on the movies views (movies/conditional.py)
+HTTP_MAX_AGE = {}  # view name -> max-age for anonymous responses, checked before the defaults in movies/conditional.py
+
+# Concurrent upstream calls per page (movies/fanout.py)
+UPSTREAM_FANOUT_WORKERS = int(os.getenv('UPSTREAM_FANOUT_WORKERS', 16))  # threads shared by all requests in a worker
+UPSTREAM_FANOUT_TIMEOUT = float(os.getenv('UPSTREAM_FANOUT_TIMEOUT', 8))  # total deadline for one page's calls
+UPSTREAM_FANOUT_MAX_IN_FLIGHT = int(os.getenv('UPSTREAM_FANOUT_MAX_IN_FLIGHT', 4))  # overdue tasks per call name
+
+# ASGI profile: serve home/browse/search/detail from movies/async_views.py (see gunicorn_asgi.py)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+UPSTREAM_ASYNC_MAX_CONNECTIONS = int(os.getenv('UPSTREAM_ASYNC_MAX_CONNECTIONS', 100))  # per event loop
+UPSTREAM_ASYNC_KEEPALIVE_EXPIRY = float(os.getenv('UPSTREAM_ASYNC_KEEPALIVE_EXPIRY', 30))
+
+# Offline TMDB/YouTube stub (movies/upstream_stub.py): 'record' saves real responses to the corpus,
+# 'replay' answers from it with no network, injecting the latency / errors / 429 bursts below
+UPSTREAM_STUB_MODE = os.getenv('UPSTREAM_STUB_MODE', '')
+UPSTREAM_STUB_CORPUS = os.getenv('UPSTREAM_STUB_CORPUS', str(BASE_DIR / 'movies' / 'fixtures' / 'upstream_corpus.json.gz'))
+UPSTREAM_STUB_LATENCY_MS = float(os.getenv('UPSTREAM_STUB_LATENCY_MS', 0))
+UPSTREAM_STUB_JITTER_MS = float(os.getenv('UPSTREAM_STUB_JITTER_MS', 0))
+UPSTREAM_STUB_ERROR_RATE = float(os.getenv('UPSTREAM_STUB_ERROR_RATE', 0))  # share of calls answered with 503
+UPSTREAM_STUB_429_EVERY = int(os.getenv('UPSTREAM_STUB_429_EVERY', 0))  # start a 429 burst every N seconds (0 = never)
+UPSTREAM_STUB_429_SECONDS = int(os.getenv('UPSTREAM_STUB_429_SECONDS', 0))  # length of each burst
+UPSTREAM_STUB_SEED = os.getenv('UPSTREAM_STUB_SEED')  # fixed seed for repeatable runs
+
 # Email Configuration (SMTP)
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
@@ -0,0 +1,33 @@
+# Gunicorn profile for serving Aura over ASGI with uvicorn workers:
+#   ASYNC_VIEWS=True gunicorn Aura.asgi:application -c gunicorn_asgi.py
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Each worker multiplexes many in-flight upstream calls on its event loop,
+# so a couple of workers per core is plenty for I/O-bound traffic.
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth of in-process caches
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    # Build the search suggestion index in the background, in the worker itself
+    from movies.autocomplete import title_index
+    title_index.warm()
+
+
+def worker_exit(server, worker):
+    # Write buffered analytics events before the worker goes away
+    from movies.analytics import view_events
+    view_events.flush()
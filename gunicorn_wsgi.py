@@ -0,0 +1,20 @@
+# Gunicorn profile for serving Aura over WSGI (the default Procfile):
+#   gunicorn Aura.wsgi:application -c gunicorn_wsgi.py
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+
+def post_worker_init(worker):
+    # Build the search suggestion index in the background, in the worker itself
+    from movies.autocomplete import title_index
+    title_index.warm()
+
+
+def worker_exit(server, worker):
+    # Write buffered analytics events before the worker goes away
+    from movies.analytics import view_events
+    view_events.flush()
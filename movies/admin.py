@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Movie, Watchlist, MovieView
+from .models import Movie, Watchlist, MovieView, CatalogRanking, SyncState, MovieDailyStats, SiteDailyStats
+from .moderation import hidden_movies
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
@@ -8,6 +9,11 @@ class MovieAdmin(admin.ModelAdmin):
     list_filter = ('release_date', 'status')
     ordering = ('-popularity',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'is_hidden' in form.changed_data:
+            hidden_movies.bump()
+
 @admin.register(Watchlist)
 class WatchlistAdmin(admin.ModelAdmin):
     list_display = ('user', 'movie', 'added_at')
@@ -24,3 +30,27 @@ class MovieViewAdmin(admin.ModelAdmin):
     readonly_fields = ('movie', 'user', 'ip_address', 'viewed_at')
     ordering = ('-viewed_at',)
 
+
+@admin.register(CatalogRanking)
+class CatalogRankingAdmin(admin.ModelAdmin):
+    list_display = ('list_name', 'position', 'movie', 'synced_at')
+    list_filter = ('list_name',)
+    search_fields = ('movie__title',)
+    ordering = ('list_name', 'position')
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'watermark', 'last_run_at')
+    readonly_fields = ('last_result',)
+
+@admin.register(MovieDailyStats)
+class MovieDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('movie', 'day', 'views', 'unique_viewers', 'last_viewed_at')
+    list_filter = ('day',)
+    search_fields = ('movie__title',)
+    exclude = ('viewer_sketch',)
+
+@admin.register(SiteDailyStats)
+class SiteDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('day', 'views', 'unique_viewers')
+    exclude = ('viewer_sketch',)
@@ -0,0 +1,164 @@
+import os
+import atexit
+import threading
+import logging
+from collections import deque
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import get_counters
+from .models import MovieView
+from .live import live_views
+from .rollups import apply_views
+from .trending import record_views as record_trending
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('analytics')
+
+
+def _update_trending(events):
+    try:
+        record_trending(events)
+    except Exception as e:
+        stats.incr('trending_errors')
+        logger.error(f"Could not update trending scores for {len(events)} view events: {e}")
+
+
+def _publish_live(events):
+    try:
+        live_views.publish(events)
+    except Exception as e:
+        stats.incr('live_errors')
+        logger.error(f"Could not publish {len(events)} view events to the live feed: {e}")
+
+
+class ViewEventBuffer:
+    """
+    In-process buffer for MovieView events written by a background flusher.
+
+    ``record()`` only appends to a bounded deque, so a request never waits on
+    the analytics INSERT. A daemon thread writes the buffer with bulk_create
+    every ``flush_interval`` seconds, or sooner once ``batch_size`` events are
+    waiting, adds them to the daily rollup and trending scores and publishes
+    them to the live feed. When ``max_size`` events are queued (the database can't keep up)
+    new events are dropped and counted instead of slowing requests down.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=2.0, max_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, movie_id, user_id=None, ip_address=None):
+        """Queue one view; returns False if it was dropped because the buffer is full"""
+        self._ensure_flusher()
+        event = MovieView(movie_id=movie_id, user_id=user_id, ip_address=ip_address, viewed_at=timezone.now())
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                stats.incr('dropped')
+                return False
+            self._events.append(event)
+            depth = len(self._events)
+        stats.incr('recorded')
+        if depth == self.batch_size:
+            stats.incr('early_flushes')
+            self._wakeup.set()
+        return True
+
+    def _take(self):
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def flush(self):
+        """Write every queued event now; returns how many were written"""
+        with self._flush_lock:
+            events = self._take()
+            if not events:
+                return 0
+            try:
+                MovieView.objects.bulk_create(events, batch_size=self.batch_size)
+            except Exception as e:
+                stats.incr('flush_errors')
+                stats.incr('dropped', len(events))
+                logger.error(f"Could not write {len(events)} view events: {e}")
+                return 0
+            stats.incr('flushed', len(events))
+            stats.incr('batches')
+            try:
+                apply_views(events)
+            except Exception as e:
+                stats.incr('rollup_errors')
+                logger.error(f"Could not update daily stats for {len(events)} view events: {e}")
+            _update_trending(events)
+            _publish_live(events)
+            return len(events)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+    def _ensure_flusher(self):
+        # One flusher per process; a forked worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._events.clear()
+            self._thread = threading.Thread(target=self._run, name='view-event-flusher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def describe(self):
+        with self._lock:
+            depth = len(self._events)
+        return {
+            'buffered': depth,
+            'capacity': self.max_size,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            **stats.snapshot(),
+        }
+
+
+class DirectViewWriter:
+    """Unbuffered writer (ANALYTICS_BUFFERED=False): one INSERT per view, on the request path"""
+
+    def record(self, movie_id, user_id=None, ip_address=None):
+        event = MovieView.objects.create(movie_id=movie_id, user_id=user_id, ip_address=ip_address)
+        apply_views([event])
+        _update_trending([event])
+        _publish_live([event])
+        stats.incr('recorded')
+        return True
+
+    def flush(self):
+        return 0
+
+    def describe(self):
+        return {'buffered': 0, **stats.snapshot()}
+
+
+if getattr(settings, 'ANALYTICS_BUFFERED', True):
+    view_events = ViewEventBuffer(
+        batch_size=getattr(settings, 'ANALYTICS_BATCH_SIZE', 500),
+        flush_interval=getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 2.0),
+        max_size=getattr(settings, 'ANALYTICS_BUFFER_SIZE', 10000),
+    )
+else:
+    view_events = DirectViewWriter()
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import gzip
+import shutil
+import logging
+import tempfile
+from array import array
+from heapq import merge
+from itertools import chain, repeat
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+from .models import MovieView
+from .rollups import rebuild, viewer_id
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Columns stored as packed little-endian arrays; ip addresses follow as text.
+# Rows are ordered by (movie_id, id).
+COLUMNS = [
+    ('id', 'q'),
+    ('movie_id', 'q'),
+    ('second', 'i'),  # seconds since the start of the day (local time)
+    ('user_id', 'q'),  # 0 for anonymous views
+]
+
+
+def archive_dir():
+    return str(getattr(settings, 'ANALYTICS_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'views')))
+
+
+def archive_path(day):
+    return os.path.join(archive_dir(), f"views-{day.isoformat()}.bin.gz")
+
+
+def _pack(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data, typecode):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _archived_rows(day):
+    """Stream a day's archive as (id, movie_id, second, user_id, ip_address) rows, in file order"""
+    path = archive_path(day)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        columns = [_unpack(f.read(size), typecode) for name, typecode, size in header['columns']]
+        # The addresses are the rest of the file, one per line; a trailing empty one has no line
+        ips = (line.rstrip(b'\n').decode('utf-8') for line in f)
+        yield from zip(*columns, chain(ips, repeat('')))
+
+
+def write_day(day, rows):
+    """
+    Write one day of raw views as a compressed columnar file.
+
+    ``rows`` is an iterable of (id, movie_id, viewed_at, user_id, ip_address)
+    tuples ordered by (movie_id, id), consumed once. It is merged with any
+    existing archive for the day (kept in the same order), and rows already
+    archived (same id) are kept once, so an interrupted compaction can simply
+    be re-run. Only the packed numeric columns are held in memory: addresses
+    go to a temporary file, and viewers are counted one movie at a time.
+    Returns the header.
+    """
+    day_start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    new_rows = (
+        (event_id, movie_id, int((viewed_at - day_start).total_seconds()), user_id or 0, ip_address or '')
+        for event_id, movie_id, viewed_at, user_id, ip_address in rows
+    )
+    columns = {name: array(typecode) for name, typecode in COLUMNS}
+    movies = {}
+    unique_viewers = 0
+    viewers = set()
+    last = None
+
+    with tempfile.TemporaryFile() as ips:
+        for event_id, movie_id, second, user_id, ip_address in merge(
+            _archived_rows(day), new_rows, key=lambda row: (row[1], row[0])
+        ):
+            if last == (movie_id, event_id):
+                continue
+            if last is None or last[0] != movie_id:
+                # Rows arrive grouped by movie, so one movie's viewers are counted at a time
+                unique_viewers += len(viewers)
+                viewers = set()
+            last = (movie_id, event_id)
+            if columns['id']:
+                ips.write(b'\n')
+            ips.write(ip_address.encode('utf-8'))
+            columns['id'].append(event_id)
+            columns['movie_id'].append(movie_id)
+            columns['second'].append(second)
+            columns['user_id'].append(user_id)
+            movies[str(movie_id)] = movies.get(str(movie_id), 0) + 1
+            viewers.add(viewer_id(user_id, ip_address))
+        unique_viewers += len(viewers)
+
+        packed = [_pack(columns[name], typecode) for name, typecode in COLUMNS]
+        header = {
+            'version': FORMAT_VERSION,
+            'day': day.isoformat(),
+            'rows': len(columns['id']),
+            'views': len(columns['id']),
+            'unique_viewers': unique_viewers,  # summed per movie, like MovieDailyStats
+            'movies': movies,
+            'columns': [[name, typecode, len(data)] for (name, typecode), data in zip(COLUMNS, packed)],
+            'ip_bytes': ips.tell(),
+        }
+
+        path = archive_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for data in packed:
+                f.write(data)
+            ips.seek(0)
+            shutil.copyfileobj(ips, f)
+    os.replace(tmp, path)
+    return header
+
+
+def read_header(day):
+    """Header of a day's archive (totals and per-movie views), or None if there is none"""
+    path = archive_path(day)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rb') as f:
+        return json.loads(f.readline())
+
+
+def read_day(day):
+    """All columns of a day's archive as {name: sequence}, or None if there is none"""
+    path = archive_path(day)
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        columns = {name: _unpack(f.read(size), typecode) for name, typecode, size in header['columns']}
+        ips = f.read(header['ip_bytes']).decode('utf-8')
+    columns = {name: list(values) for name, values in columns.items()}
+    columns['ip_address'] = ips.split('\n') if header['rows'] else []
+    return columns
+
+
+def archived_days(start=None, end=None):
+    """Archived days, optionally limited to [start, end], in order"""
+    if not os.path.isdir(archive_dir()):
+        return []
+    days = []
+    for name in os.listdir(archive_dir()):
+        if name.startswith('views-') and name.endswith('.bin.gz'):
+            day = datetime.strptime(name[len('views-'):-len('.bin.gz')], '%Y-%m-%d').date()
+            if (start is None or day >= start) and (end is None or day <= end):
+                days.append(day)
+    return sorted(days)
+
+
+def daily_totals(start, end):
+    """{day: views} for archived days in [start, end], read from the archive headers only"""
+    totals = {}
+    for day in archived_days(start, end):
+        totals[day] = read_header(day)['views']
+    return totals
+
+
+def compact_day(day, chunk_size=5000):
+    """
+    Move one day of raw MovieView rows into its archive.
+
+    The day's rollup is rebuilt exactly from the raw rows first (only on the
+    first pass, so a re-run after an interruption doesn't undercount), then
+    the rows are streamed from the database ``chunk_size`` at a time, grouped
+    by movie, into the archive's column arrays, then they are deleted in chunks of
+    ``chunk_size`` so each DELETE holds its locks briefly. Only the ids of the
+    archived rows are kept for that. Returns the number of rows deleted.
+    """
+    day_start = timezone.make_aware(datetime.combine(day, dt_time.min))
+    events = MovieView.objects.filter(viewed_at__gte=day_start, viewed_at__lt=day_start + timedelta(days=1))
+
+    if read_header(day) is None:
+        rebuild(start=day, end=day)
+    ids = array('q')
+
+    def rows():
+        for row in events.order_by('movie_id', 'id').values_list(
+            'id', 'movie_id', 'viewed_at', 'user_id', 'ip_address'
+        ).iterator(chunk_size=chunk_size):
+            ids.append(row[0])
+            yield row
+
+    header = write_day(day, rows())
+
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        deleted += MovieView.objects.filter(id__in=ids[start:start + chunk_size].tolist()).delete()[0]
+    logger.info(f"Compacted {deleted} views from {day} ({header['rows']} archived)")
+    return deleted
+
+
+def compactable_days(retention_days):
+    """Days with raw events older than the retention window, oldest first"""
+    cutoff = timezone.localdate() - timedelta(days=retention_days)
+    cutoff_start = timezone.make_aware(datetime.combine(cutoff, dt_time.min))
+    return list(MovieView.objects.filter(viewed_at__lt=cutoff_start).dates('viewed_at', 'day'))
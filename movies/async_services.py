@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import weakref
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+
+from . import upstream_stub
+from .cache import get_response_cache
+from .ratelimit import YOUTUBE_COSTS, QuotaExceeded, RateLimitExceeded, rate_limiter, youtube_quota
+from .resilience import CircuitOpenError, endpoint_template, get_breaker, retry_budget, should_retry
+from .services import TMDBService, YouTubeService, cached_embeddable, embeddable_chunks, store_embeddable
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# One client per event loop: httpx connections are bound to the loop that opened them
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the pooled keep-alive AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(
+            max_connections=getattr(settings, 'UPSTREAM_ASYNC_MAX_CONNECTIONS', 100),
+            max_keepalive_connections=getattr(settings, 'UPSTREAM_HTTP_POOL_MAXSIZE', 20),
+            keepalive_expiry=getattr(settings, 'UPSTREAM_ASYNC_KEEPALIVE_EXPIRY', 30),
+        )
+        client = httpx.AsyncClient(timeout=10, limits=limits, transport=upstream_stub.async_transport(limits))
+        _clients[loop] = client
+    return client
+
+
+class AsyncTMDBService:
+    """asyncio-native client with the same surface as TMDBService"""
+    BASE_URL = TMDBService.BASE_URL
+    IMAGE_BASE_URL = TMDBService.IMAGE_BASE_URL
+
+    def __init__(self, cache=None):
+        self.api_key = settings.TMDB_API_KEY
+        self.headers = {
+            'Authorization': f'Bearer {settings.TMDB_ACCESS_TOKEN}',
+            'Content-Type': 'application/json;charset=utf-8'
+        }
+        self._cache = cache
+
+    @property
+    def cache(self):
+        """Response cache shared with the sync client"""
+        if self._cache is None:
+            self._cache = get_response_cache()
+        return self._cache
+
+    async def _make_request(self, endpoint, params=None):
+        """Make a request to TMDB API, served from the response cache when possible"""
+        params = dict(params or {})
+        return await self.cache.afetch(endpoint, params, lambda: self._guarded_fetch(endpoint, params))
+
+    async def _guarded_fetch(self, endpoint, params):
+        """Fetch through the endpoint's circuit breaker so an unhealthy upstream fails fast"""
+        retry_budget.deposit()
+        breaker = get_breaker(f"tmdb:{endpoint_template(endpoint)}")
+        return await breaker.acall(lambda: self._fetch(endpoint, params))
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.25, max=2),
+        retry=retry_if_exception(should_retry),
+        reraise=True
+    )
+    async def _fetch(self, endpoint, params):
+        """Fetch an endpoint from TMDB API with budgeted retries"""
+        await rate_limiter.aacquire('tmdb', endpoint)
+        url = f"{self.BASE_URL}{endpoint}"
+        params = dict(params)
+        params['api_key'] = self.api_key
+
+        try:
+            response = await get_async_client().get(url, params=params, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Error making request to TMDB: {e}")
+            raise
+
+    async def get_popular_movies(self, page=1):
+        """Get popular movies"""
+        return await self._make_request("/movie/popular", {"page": page})
+
+    async def get_trending_movies(self, time_window='week', page=1):
+        """Get trending movies (day or week)"""
+        return await self._make_request(f"/trending/movie/{time_window}", {"page": page})
+
+    async def get_top_rated_movies(self, page=1):
+        """Get top rated movies"""
+        return await self._make_request("/movie/top_rated", {"page": page})
+
+    async def get_now_playing_movies(self, page=1):
+        """Get now playing movies"""
+        return await self._make_request("/movie/now_playing", {"page": page})
+
+    async def get_upcoming_movies(self, page=1):
+        """Get upcoming movies"""
+        return await self._make_request("/movie/upcoming", {"page": page})
+
+    async def get_movie_details(self, movie_id, refresh=False):
+        """Get detailed information about a movie (refresh=True skips the cached copy)"""
+        endpoint = f"/movie/{movie_id}"
+        params = {"append_to_response": "videos,credits,similar,recommendations"}
+        if refresh:
+            await self.cache.ainvalidate(endpoint, params)
+        return await self._make_request(endpoint, params)
+
+    async def get_movie_changes(self, start_date, end_date, page=1):
+        """Get ids of movies changed between two dates (at most 14 days apart)"""
+        return await self._make_request("/movie/changes", {
+            "start_date": start_date,
+            "end_date": end_date,
+            "page": page
+        })
+
+    async def search_movies(self, query, page=1):
+        """Search for movies"""
+        return await self._make_request("/search/movie", {
+            "query": query,
+            "page": page
+        })
+
+    async def get_movie_videos(self, movie_id):
+        """Get videos (trailers) for a movie"""
+        return await self._make_request(f"/movie/{movie_id}/videos")
+
+    async def get_genres(self):
+        """Get list of movie genres"""
+        return await self._make_request("/genre/movie/list")
+
+    async def discover_movies(self, **kwargs):
+        """Discover movies with filters"""
+        return await self._make_request("/discover/movie", kwargs)
+
+    parse_movie_data = TMDBService.parse_movie_data
+
+
+class AsyncYouTubeService:
+    """asyncio-native client with the same surface as YouTubeService"""
+    BASE_URL = YouTubeService.BASE_URL
+
+    def __init__(self):
+        self.api_key = settings.YOUTUBE_API_KEY
+
+    async def _request(self, path, params):
+        """Call the YouTube API through the endpoint's circuit breaker"""
+        retry_budget.deposit()
+        return await get_breaker(f"youtube:{path}").acall(lambda: self._get(path, params))
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.25, max=2),
+        retry=retry_if_exception(should_retry),
+        reraise=True
+    )
+    async def _get(self, path, params):
+        """GET a YouTube API path with budgeted retries"""
+        await rate_limiter.aacquire('youtube', path)
+        await youtube_quota.acharge(YOUTUBE_COSTS.get(path, 1))
+        response = await get_async_client().get(f"{self.BASE_URL}{path}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def is_embeddable(self, video_id):
+        """Check if a YouTube video is embeddable"""
+        return (await self.is_embeddable_many([video_id])).get(video_id, False)
+
+    async def is_embeddable_many(self, video_ids, raise_errors=False):
+        """Check several YouTube videos in one /videos call (see YouTubeService.is_embeddable_many)"""
+        statuses, missing = await sync_to_async(cached_embeddable)(video_ids)
+        for chunk in embeddable_chunks(missing):
+            params = {
+                "part": "status",
+                "id": ",".join(chunk),
+                "key": self.api_key
+            }
+            try:
+                data = await self._request("/videos", params)
+            except Exception as e:
+                logger.error(f"Error checking YouTube embeddability: {e}")
+                if raise_errors:
+                    raise
+                statuses.update({video_id: False for video_id in chunk})
+                continue
+            statuses.update(await sync_to_async(store_embeddable)(chunk, data))
+        return statuses
+
+    async def search_trailer(self, movie_title, year=None):
+        """Search for movie trailer on YouTube"""
+        query = f"{movie_title} official trailer"
+        if year:
+            query += f" {year}"
+
+        params = {
+            'part': 'snippet',
+            'q': query,
+            'type': 'video',
+            'videoEmbeddable': 'true',  # Only search for embeddable videos
+            'maxResults': 1,
+            'key': self.api_key
+        }
+
+        try:
+            data = await self._request("/search", params)
+
+            if data.get('items'):
+                return data['items'][0]['id']['videoId']
+            return None
+        except (httpx.HTTPError, CircuitOpenError, RateLimitExceeded, QuotaExceeded) as e:
+            logger.error(f"Error searching YouTube: {e}")
+            return None
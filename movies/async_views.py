@@ -0,0 +1,97 @@
+import logging
+from asgiref.sync import sync_to_async
+
+from . import views
+from .async_services import AsyncTMDBService
+from .catalog import mirror_page
+from .fanout import afan_out
+from .page_cache import page_cache
+from .search import local_search_page
+from .search_cache import search_results
+from .trailers import schedule_trailer
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Async variants of the catalog views for ASGI deployments (ASYNC_VIEWS=True).
+# Upstream calls are awaited concurrently; ORM access and rendering reuse the
+# sync helpers in views.py through sync_to_async so both variants render the same pages.
+
+tmdb_service = AsyncTMDBService()
+
+
+async def home(request):
+    """Home page with featured movies"""
+    cached = await sync_to_async(page_cache.get)(request, 'home')
+    if cached:
+        return await sync_to_async(views._respond_cached)(request, 'home', cached)
+
+    rails = await afan_out(views._home_rails(tmdb_service))
+    return await sync_to_async(views._render_home)(request, rails)
+
+
+async def browse_movies(request):
+    """Browse all movies with filters"""
+    cached = await sync_to_async(page_cache.get)(request, 'browse')
+    if cached:
+        return await sync_to_async(views._respond_cached)(request, 'browse', cached)
+
+    page, category, genre_id = views._browse_params(request)
+
+    data = None if genre_id else await sync_to_async(mirror_page)(category, page)
+
+    calls = {'genres': tmdb_service.get_genres}
+    if data is None:
+        calls['movies'] = views._browse_movies_call(tmdb_service, category, genre_id, page)
+    results = await afan_out(calls)
+    return await sync_to_async(views._render_browse)(
+        request, page, category, genre_id, results['genres'], data or results['movies']
+    )
+
+
+async def movie_detail(request, movie_id):
+    """Movie detail page"""
+    cached = await sync_to_async(page_cache.get)(request, 'movie_detail')
+    if cached:
+        return await sync_to_async(views._respond_detail)(request, cached)
+
+    try:
+        movie_data = await tmdb_service.get_movie_details(movie_id)
+    except Exception as e:
+        logger.error(f"Error fetching movie details for {movie_id}: {e}")
+        return await sync_to_async(views._detail_error)(request, views.DETAIL_UNAVAILABLE)
+
+    if not movie_data:
+        return await sync_to_async(views._detail_error)(request, 'Movie not found')
+
+    movie, error_response = await sync_to_async(views._get_visible_movie)(request, movie_id, movie_data)
+    if error_response:
+        return error_response
+
+    # Resolve a missing trailer in the background; the page shows a placeholder meanwhile
+    await sync_to_async(schedule_trailer)(movie, movie_data)
+
+    return await sync_to_async(views._render_detail)(request, movie, movie_data)
+
+
+async def search_movies(request):
+    """Search movies"""
+    query, normalized, page = views._search_params(request)
+
+    data = None
+    if normalized:
+        # The search cache is a shared (Redis) cache; keep its calls off the event loop
+        count = await sync_to_async(search_results.record)(normalized)
+        data = await sync_to_async(search_results.get)(normalized, page)
+        if data is None:
+            data = await sync_to_async(local_search_page)(normalized, page)
+            if data is None:
+                try:
+                    data = await tmdb_service.search_movies(normalized, page=page)
+                except Exception as e:
+                    logger.error(f"Error searching movies for '{normalized}': {e}")
+            if data:
+                await sync_to_async(search_results.set)(normalized, page, data, count)
+        if data and page == 1 and data.get('total_pages', 1) > 1:
+            await sync_to_async(search_results.prefetch)(normalized, 2, views._search_payload, count)
+    return await sync_to_async(views._render_search)(request, query, page, data)
@@ -0,0 +1,302 @@
+import os
+import re
+import sys
+import time
+import heapq
+import bisect
+import threading
+import logging
+import unicodedata
+from array import array
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import get_counters
+from .models import Movie
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('autocomplete')
+
+# Keys per block; each block also lists its movies by popularity, so a prefix
+# lookup merges whole blocks in rank order instead of scanning their keys
+BLOCK = 64
+
+# Changed movies held in a small overlay before a refresh re-sorts every key
+MAX_PENDING = 2000
+
+
+def normalize_title(text):
+    """Casefolded, accent-free words separated by single spaces ("Amélie!" -> "amelie")"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(re.findall(r'\w+', text.casefold()))
+
+
+def _title_keys(pk, title):
+    """One key per word start of a title, so a "knight" prefix finds The Dark Knight"""
+    words = normalize_title(title).split(' ')
+    return [(' '.join(words[i:]), pk) for i in range(len(words)) if words[i]]
+
+
+def _prefix_range(keys, prefix):
+    """Slice of the sorted ``keys`` that start with ``prefix``"""
+    return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + '\U0010ffff')
+
+
+class _Keys:
+    """Sorted title keys of a set of movies, with a popularity-ordered copy of each block"""
+
+    def __init__(self, movies):
+        entries = sorted(entry for pk, row in movies.items() for entry in _title_keys(pk, row[1]))
+        self.keys = [key for key, _ in entries]
+        self.refs = array('q', (pk for _, pk in entries))
+        self.ranked = array('q')
+        for start in range(0, len(self.refs), BLOCK):
+            self.ranked.extend(sorted(self.refs[start:start + BLOCK], key=lambda pk: -movies[pk][4]))
+
+    def nbytes(self):
+        size = sys.getsizeof(self.keys) + sum(sys.getsizeof(key) for key in self.keys)
+        return size + (self.refs.itemsize + self.ranked.itemsize) * len(self.refs)
+
+
+class _Snapshot:
+    """
+    Immutable index state; a refresh builds a new one and swaps it in.
+
+    ``base`` holds the keys of the last full build. Movies changed since then
+    are ``stale`` in it and looked up in the small sorted ``pending`` overlay
+    instead, until there are enough of them to rebuild ``base``.
+    """
+
+    def __init__(self, movies, watermark, base=None, stale=frozenset(), pending=()):
+        self.movies = movies  # {pk: (tmdb_id, title, year, poster_path, popularity)}
+        self.watermark = watermark
+        self.base = base or _Keys(movies)
+        self.stale = stale
+        self.pending = list(pending)
+        self.pending_keys = [key for key, _ in self.pending]
+
+    def _popularity(self, pk):
+        return -self.movies[pk][4]
+
+    def _fresh(self, pks):
+        return (pk for pk in pks if pk not in self.stale)
+
+    def _base_ranked(self, lo, hi):
+        """Movie pks of base keys[lo:hi] (minus stale ones), most popular first"""
+        refs, ranked = self.base.refs, self.base.ranked
+        first = min(-(-lo // BLOCK) * BLOCK, hi)
+        last = max(hi // BLOCK * BLOCK, first)
+        # Keys in partly covered blocks are ranked here; full blocks are ranked already
+        streams = [sorted(self._fresh(refs[lo:first].tolist() + refs[last:hi].tolist()), key=self._popularity)]
+        streams.extend(
+            self._fresh(ranked[i] for i in range(block, block + BLOCK))
+            for block in range(first, last, BLOCK)
+        )
+        return heapq.merge(*streams, key=self._popularity)
+
+    def ranked(self, prefix):
+        """Movie pks with a key starting with ``prefix``, most popular first (may repeat)"""
+        lo, hi = _prefix_range(self.base.keys, prefix)
+        streams = [self._base_ranked(lo, hi)]
+        if self.pending:
+            lo, hi = _prefix_range(self.pending_keys, prefix)
+            streams.append(sorted((pk for _, pk in self.pending[lo:hi]), key=self._popularity))
+        return heapq.merge(*streams, key=self._popularity)
+
+    def nbytes(self):
+        size = self.base.nbytes()
+        size += sum(sys.getsizeof(key) + 8 for key in self.pending_keys)
+        size += sum(sys.getsizeof(title) + 120 for _, title, _, _, _ in self.movies.values())
+        return size
+
+
+class PrefixIndex:
+    """
+    In-process typeahead index over stored movie titles.
+
+    Keys (normalized title suffixes starting at each word) live in one
+    sorted list cut into blocks of ``BLOCK`` keys, each also kept in
+    popularity order; a prefix lookup is two bisects and a merge of the
+    covered blocks, so the most popular matches come first however many
+    titles share the prefix. Only the most popular titles are indexed: at
+    most ``max_movies``, and no more than fit in about ``max_bytes``. The
+    index is built in the background at startup, and every
+    ``refresh_interval`` seconds a background thread fetches just the movies
+    updated since the last refresh into a small overlay, so lookups never
+    wait on the database.
+    """
+
+    def __init__(self, max_movies=50000, max_bytes=32 * 1024 * 1024, refresh_interval=300):
+        self.max_movies = max_movies
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._refreshed_at = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _rows(self, queryset):
+        for pk, tmdb_id, title, release_date, poster_path, popularity in queryset.values_list(
+            'pk', 'tmdb_id', 'title', 'release_date', 'poster_path', 'popularity'
+        ):
+            yield pk, (tmdb_id, title, release_date.year if release_date else None, poster_path, popularity)
+
+    def build(self):
+        """Index the most popular stored movies from scratch"""
+        started = time.monotonic()
+        watermark = Movie.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        movies = dict(self._rows(
+            Movie.objects.filter(is_hidden=False).order_by('-popularity')[:self.max_movies]
+        ))
+        snapshot = self._fit(movies, watermark)
+        stats.incr('builds')
+        logger.info(
+            f"Built autocomplete index: {len(snapshot.movies)} movies, {len(snapshot.base.keys)} keys, "
+            f"~{snapshot.nbytes() // 1024} KB in {time.monotonic() - started:.2f}s"
+        )
+        return snapshot
+
+    def update(self, snapshot):
+        """
+        Apply movies changed since ``snapshot`` was built (new, renamed, re-ranked or hidden).
+
+        Changes go to the snapshot's overlay; the sorted keys are only
+        rebuilt once the overlay or the movie count outgrows its budget.
+        """
+        if snapshot.watermark is None:
+            return self.build()
+        changed = Movie.objects.filter(updated_at__gt=snapshot.watermark)
+        watermark = changed.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        if watermark is None:
+            return snapshot
+        movies = dict(snapshot.movies)
+        changed_pks = set()
+        for pk in changed.filter(is_hidden=True).values_list('pk', flat=True):
+            movies.pop(pk, None)
+            changed_pks.add(pk)
+        visible = dict(self._rows(changed.filter(is_hidden=False)))
+        movies.update(visible)
+        changed_pks.update(visible)
+        stats.incr('updates')
+
+        stale = snapshot.stale | changed_pks
+        if len(stale) > MAX_PENDING or len(movies) > self.max_movies:
+            return self._fit(movies, watermark)
+        pending = [entry for entry in snapshot.pending if entry[1] not in changed_pks]
+        pending.extend(entry for pk, row in visible.items() for entry in _title_keys(pk, row[1]))
+        pending.sort()
+        updated = _Snapshot(movies, watermark, snapshot.base, frozenset(stale), pending)
+        if updated.nbytes() > self.max_bytes:
+            return self._fit(movies, watermark)
+        return updated
+
+    def _fit(self, movies, watermark):
+        """Build a snapshot of the most popular movies that fits the count and memory budgets"""
+        keep = min(len(movies), self.max_movies)
+        while True:
+            if keep < len(movies):
+                movies = dict(heapq.nlargest(keep, movies.items(), key=lambda item: item[1][4]))
+            snapshot = _Snapshot(movies, watermark)
+            size = snapshot.nbytes()
+            if size <= self.max_bytes or not movies:
+                return snapshot
+            stats.incr('trimmed')
+            keep = int(len(movies) * self.max_bytes / size * 0.95)
+
+    def _refresh(self):
+        try:
+            close_old_connections()
+            snapshot = self.update(self._snapshot) if self._snapshot is not None else self.build()
+            with self._lock:
+                self._snapshot = snapshot
+        except Exception as e:
+            stats.incr('refresh_errors')
+            logger.error(f"Could not refresh the autocomplete index: {e}")
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._refreshed_at = time.monotonic()
+                self._refreshing = False
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name='autocomplete-refresh', daemon=True).start()
+
+    def _after_fork(self):
+        """A refresh thread running in the parent doesn't exist in a forked child; start over there"""
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def warm(self, background=True):
+        """
+        Build the index now instead of on the first lookup.
+
+        Call it from a started worker (the gunicorn configs do this in
+        post_worker_init), not at import: with ``--preload`` the build thread
+        would run in the master and never in the forked workers.
+        """
+        if not background:
+            self._refreshing = True
+            self._refresh()
+        elif self._snapshot is None:
+            self._start_refresh()
+
+    def snapshot(self):
+        """Current snapshot, or None while the first build is still running"""
+        if self._snapshot is None:
+            # Not warmed at startup (e.g. a management command): build off the request path
+            stats.incr('cold_lookups')
+            self._start_refresh()
+        elif time.monotonic() - self._refreshed_at >= self.refresh_interval and not self._refreshing:
+            self._start_refresh()
+        return self._snapshot
+
+    def suggest(self, query, limit=8, exclude=frozenset()):
+        """Up to ``limit`` movies whose title has a word sequence starting with ``query``, most popular first"""
+        prefix = normalize_title(query)
+        if not prefix:
+            return []
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return []
+        results = []
+        seen = set()
+        for pk in snapshot.ranked(prefix):
+            if pk in seen:
+                continue
+            seen.add(pk)
+            tmdb_id, title, year, poster_path, _ = snapshot.movies[pk]
+            if tmdb_id in exclude:
+                continue
+            results.append({'id': tmdb_id, 'title': title, 'year': year, 'poster_path': poster_path})
+            if len(results) == limit:
+                break
+        stats.incr('lookups')
+        return results
+
+    def describe(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {'built': False}
+        return {
+            'built': True,
+            'movies': len(snapshot.movies),
+            'keys': len(snapshot.base.keys),
+            'pending_movies': len(snapshot.stale),
+            'approx_bytes': snapshot.nbytes(),
+            **stats.snapshot(),
+        }
+
+
+title_index = PrefixIndex(
+    max_movies=getattr(settings, 'AUTOCOMPLETE_MAX_MOVIES', 50000),
+    max_bytes=getattr(settings, 'AUTOCOMPLETE_MAX_MB', 32) * 1024 * 1024,
+    refresh_interval=getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL', 300),
+)
+os.register_at_fork(after_in_child=title_index._after_fork)
@@ -0,0 +1,436 @@
+import re
+import time
+import asyncio
+import hashlib
+import json
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import get_counters
+from .singleflight import SingleFlight, AsyncSingleFlight
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('tmdb_cache')
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# First matching rule wins. A TTL of 0 disables caching for that endpoint.
+DEFAULT_TTL_RULES = [
+    (r'^/genre/', 12 * HOUR),
+    (r'^/trending/', 10 * MINUTE),
+    (r'^/movie/(popular|top_rated|now_playing|upcoming)$', 30 * MINUTE),
+    (r'^/movie/changes$', 5 * MINUTE),
+    (r'^/movie/\d+/videos$', DAY),
+    (r'^/movie/\d+$', DAY),
+    (r'^/discover/', 30 * MINUTE),
+    (r'^/search/', 15 * MINUTE),
+]
+DEFAULT_TTL = 10 * MINUTE
+
+# Never part of the cache key: credentials are identical for every caller
+IGNORED_PARAMS = {'api_key'}
+
+
+class LocalCacheBackend:
+    """Bounded in-process LRU store"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value, timeout):
+        self._data[key] = (value, time.time() + timeout)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            stats.incr('evictions')
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._set(key, value, timeout)
+
+    def add(self, key, value, timeout):
+        """Set key only if it is absent; returns True when the key was stored"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.time():
+                return False
+            self._set(key, value, timeout)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    # In memory, so the async variants never block the event loop
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value, timeout):
+        self.set(key, value, timeout)
+
+    async def aadd(self, key, value, timeout):
+        return self.add(key, value, timeout)
+
+    async def adelete(self, key):
+        self.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """Store entries in a Django cache alias; size bounds and eviction come from that backend"""
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+
+    def add(self, key, value, timeout):
+        return self.cache.add(key, value, timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    # Async variants for the event loop; with Redis the sync calls would block it
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, value, timeout):
+        await self.cache.aset(key, value, timeout)
+
+    async def aadd(self, key, value, timeout):
+        return await self.cache.aadd(key, value, timeout)
+
+    async def adelete(self, key):
+        await self.cache.adelete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class ResponseCache:
+    """
+    Endpoint-aware TTL cache for upstream JSON payloads.
+
+    Entries stay fresh for the endpoint's TTL. After that they are served stale
+    for up to ``stale_seconds`` while a single background refresh runs.
+    Concurrent misses for the same key are collapsed into one fetch. Entries
+    are kept ``fallback_seconds`` longer still, as the last good payload to
+    serve when upstream fails (or its circuit is open).
+    """
+
+    def __init__(self, backend, ttl_rules=None, default_ttl=DEFAULT_TTL, stale_seconds=HOUR, prefix='tmdb',
+                 flight=None, aflight=None, fallback_seconds=DAY):
+        self.backend = backend
+        self.ttl_rules = [(re.compile(pattern), ttl) for pattern, ttl in (ttl_rules or DEFAULT_TTL_RULES)]
+        self.default_ttl = default_ttl
+        self.stale_seconds = stale_seconds
+        self.fallback_seconds = fallback_seconds
+        self.prefix = prefix
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        self.flight = flight or SingleFlight()
+        self.aflight = aflight or AsyncSingleFlight()
+        self._async_refreshes = set()
+
+    def ttl_for(self, endpoint):
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(endpoint):
+                return ttl
+        return self.default_ttl
+
+    def make_key(self, endpoint, params=None):
+        """Build a stable key from the endpoint and params, ignoring order and value types"""
+        normalized = sorted(
+            (str(k), str(v)) for k, v in (params or {}).items()
+            if k not in IGNORED_PARAMS and v is not None
+        )
+        raw = json.dumps([endpoint, normalized], separators=(',', ':'))
+        return f"{self.prefix}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def get_entry(self, endpoint, params=None):
+        return self.backend.get(self.make_key(endpoint, params))
+
+    def _entry(self, data, ttl):
+        now = time.time()
+        return {'data': data, 'fresh_until': now + ttl, 'stored_at': now}
+
+    def _entry_timeout(self, ttl):
+        return ttl + self.stale_seconds + self.fallback_seconds
+
+    def store(self, key, data, ttl):
+        self.backend.set(key, self._entry(data, ttl), self._entry_timeout(ttl))
+
+    async def astore(self, key, data, ttl):
+        await self.backend.aset(key, self._entry(data, ttl), self._entry_timeout(ttl))
+
+    def _serve_fallback(self, key, entry, error):
+        """Serve the last good payload when a synchronous refetch fails"""
+        if entry is None:
+            raise error
+        stats.incr('fallbacks')
+        logger.warning(f"Serving last good payload for {key}: {error}")
+        return entry['data']
+
+    def fetch(self, endpoint, params, loader):
+        """Return a cached payload for endpoint/params, calling loader() on a miss"""
+        ttl = self.ttl_for(endpoint)
+        key = self.make_key(endpoint, params)
+        if not ttl:
+            stats.incr('bypass')
+            return self.flight.do(key, loader)
+
+        entry = self.backend.get(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry['fresh_until']:
+                stats.incr('hits')
+                return entry['data']
+            if now < entry['fresh_until'] + self.stale_seconds:
+                stats.incr('stale_hits')
+                self._refresh_in_background(key, ttl, loader)
+                return entry['data']
+
+        stats.incr('misses')
+        try:
+            return self.flight.do(
+                key,
+                lambda: self._load_and_store(key, ttl, loader),
+                lookup=lambda: self._lookup_fresh(key),
+            )
+        except Exception as e:
+            return self._serve_fallback(key, entry, e)
+
+    def _load_and_store(self, key, ttl, loader):
+        data = loader()
+        if data is not None:
+            self.store(key, data, ttl)
+        return data
+
+    def _fresh(self, entry):
+        if entry is not None and time.time() < entry['fresh_until']:
+            return True, entry['data']
+        return False, None
+
+    def _lookup_fresh(self, key):
+        return self._fresh(self.backend.get(key))
+
+    async def _alookup_fresh(self, key):
+        return self._fresh(await self.backend.aget(key))
+
+    def _claim_local_refresh(self, key):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_local_refresh(self, key):
+        with self._refresh_lock:
+            self._refreshing.discard(key)
+
+    def _claim_refresh(self, key, ttl):
+        if not self._claim_local_refresh(key):
+            return False
+        # Only one worker across the cluster refreshes a given key at a time
+        if not self.backend.add(f"{key}:refresh", 1, max(ttl, 30)):
+            self._release_local_refresh(key)
+            return False
+        return True
+
+    async def _aclaim_refresh(self, key, ttl):
+        if not self._claim_local_refresh(key):
+            return False
+        if not await self.backend.aadd(f"{key}:refresh", 1, max(ttl, 30)):
+            self._release_local_refresh(key)
+            return False
+        return True
+
+    def _release_refresh(self, key):
+        self.backend.delete(f"{key}:refresh")
+        self._release_local_refresh(key)
+
+    async def _arelease_refresh(self, key):
+        await self.backend.adelete(f"{key}:refresh")
+        self._release_local_refresh(key)
+
+    def _refresh_in_background(self, key, ttl, loader):
+        if self._claim_refresh(key, ttl):
+            self._executor.submit(self._refresh, key, ttl, loader)
+
+    def _refresh(self, key, ttl, loader):
+        try:
+            data = loader()
+            if data is not None:
+                self.store(key, data, ttl)
+            stats.incr('refreshes')
+        except Exception as e:
+            stats.incr('refresh_errors')
+            logger.warning(f"Background refresh failed for {key}: {e}")
+        finally:
+            self._release_refresh(key)
+
+    async def afetch(self, endpoint, params, loader):
+        """
+        Async variant of fetch(); loader is a zero-argument coroutine function.
+
+        Every backend call goes through the backend's async API so a shared
+        (Redis) cache never blocks the event loop.
+        """
+        ttl = self.ttl_for(endpoint)
+        key = self.make_key(endpoint, params)
+        if not ttl:
+            stats.incr('bypass')
+            return await self.aflight.do(key, loader)
+
+        entry = await self.backend.aget(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry['fresh_until']:
+                stats.incr('hits')
+                return entry['data']
+            if now < entry['fresh_until'] + self.stale_seconds:
+                stats.incr('stale_hits')
+                if await self._aclaim_refresh(key, ttl):
+                    task = asyncio.ensure_future(self._arefresh(key, ttl, loader))
+                    self._async_refreshes.add(task)
+                    task.add_done_callback(self._async_refreshes.discard)
+                return entry['data']
+
+        stats.incr('misses')
+        try:
+            return await self.aflight.do(
+                key,
+                lambda: self._aload_and_store(key, ttl, loader),
+                lookup=lambda: self._alookup_fresh(key),
+            )
+        except Exception as e:
+            return self._serve_fallback(key, entry, e)
+
+    async def _aload_and_store(self, key, ttl, loader):
+        data = await loader()
+        if data is not None:
+            await self.astore(key, data, ttl)
+        return data
+
+    async def _arefresh(self, key, ttl, loader):
+        try:
+            data = await loader()
+            if data is not None:
+                await self.astore(key, data, ttl)
+            stats.incr('refreshes')
+        except Exception as e:
+            stats.incr('refresh_errors')
+            logger.warning(f"Background refresh failed for {key}: {e}")
+        finally:
+            await self._arelease_refresh(key)
+
+    def invalidate(self, endpoint, params=None):
+        self.backend.delete(self.make_key(endpoint, params))
+
+    async def ainvalidate(self, endpoint, params=None):
+        await self.backend.adelete(self.make_key(endpoint, params))
+
+    def clear(self):
+        self.backend.clear()
+
+
+class NullResponseCache(ResponseCache):
+    """Cache that never stores anything (TMDB_CACHE_BACKEND=none)"""
+
+    def __init__(self):
+        super().__init__(backend=LocalCacheBackend(max_entries=0))
+
+    def fetch(self, endpoint, params, loader):
+        stats.incr('bypass')
+        return self.flight.do(self.make_key(endpoint, params), loader)
+
+    async def afetch(self, endpoint, params, loader):
+        stats.incr('bypass')
+        return await self.aflight.do(self.make_key(endpoint, params), loader)
+
+
+def build_response_cache():
+    """Build the response cache selected by settings"""
+    backend_name = getattr(settings, 'TMDB_CACHE_BACKEND', 'local')
+    if backend_name == 'none':
+        return NullResponseCache()
+    alias = getattr(settings, 'TMDB_CACHE_ALIAS', 'default')
+    if backend_name == 'django':
+        backend = DjangoCacheBackend(alias)
+    else:
+        backend = LocalCacheBackend(max_entries=getattr(settings, 'TMDB_CACHE_MAX_ENTRIES', 1000))
+    # Cross-process coalescing needs the result to land somewhere other workers can read
+    flight_options = {
+        'lock_alias': alias if backend_name == 'django' else None,
+        'lock_timeout': getattr(settings, 'TMDB_SINGLEFLIGHT_LOCK_TIMEOUT', 30),
+        'wait_timeout': getattr(settings, 'TMDB_SINGLEFLIGHT_WAIT_TIMEOUT', 10),
+    }
+    ttl_rules = list(getattr(settings, 'TMDB_CACHE_TTLS', {}).items()) + DEFAULT_TTL_RULES
+    return ResponseCache(
+        backend,
+        ttl_rules=ttl_rules,
+        stale_seconds=getattr(settings, 'TMDB_CACHE_STALE_SECONDS', HOUR),
+        fallback_seconds=getattr(settings, 'TMDB_CACHE_FALLBACK_SECONDS', DAY),
+        flight=SingleFlight(**flight_options),
+        aflight=AsyncSingleFlight(**flight_options),
+    )
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use"""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = build_response_cache()
+    return _response_cache
+
+
+def cache_stats():
+    """Return hit/miss counters plus the overall hit ratio"""
+    data = stats.snapshot()
+    served = data.get('hits', 0) + data.get('stale_hits', 0)
+    total = served + data.get('misses', 0)
+    data['hit_ratio'] = round(served / total, 3) if total else 0.0
+    return data
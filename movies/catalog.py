@@ -0,0 +1,261 @@
+import math
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Movie, CatalogRanking, SyncState
+from .page_cache import page_cache
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Mirrored TMDB lists: browse category -> TMDBService method
+CATALOG_LISTS = {
+    'popular': 'get_popular_movies',
+    'top_rated': 'get_top_rated_movies',
+    'now_playing': 'get_now_playing_movies',
+    'upcoming': 'get_upcoming_movies',
+    'trending': 'get_trending_movies',
+}
+
+TMDB_PAGE_SIZE = 20
+
+# Fields a list payload carries; detail-only fields (runtime, tagline, status)
+# and local state (is_hidden, youtube_trailer_key) are never overwritten by a sync.
+LIST_FIELDS = [
+    'title', 'overview', 'poster_path', 'backdrop_path', 'release_date',
+    'vote_average', 'vote_count', 'popularity', 'updated_at',
+]
+
+# Fields refreshed from the movie details endpoint by sync_changes()
+DETAIL_FIELDS = LIST_FIELDS + ['genres', 'runtime', 'tagline', 'status']
+
+# TMDB's changes feed covers at most 14 days per request
+CHANGES_MAX_DAYS = 14
+
+
+def list_state_name(list_name):
+    """SyncState row holding a mirrored list's TMDB totals"""
+    return f"catalog:{list_name}"
+
+
+def upsert_movies(service, results, genre_names=None, batch_size=500):
+    """
+    Insert or update Movie rows from TMDB list results in bulk.
+
+    Returns a {tmdb_id: Movie.pk} map for every movie in ``results``.
+    """
+    genre_names = genre_names or {}
+    rows = {}
+    for item in results:
+        data = service.parse_movie_data(item)
+        if not data or not data['tmdb_id']:
+            continue
+        if not data['genres'] and item.get('genre_ids'):
+            # List payloads only carry ids; store them in the same shape as movie details
+            data['genres'] = [{'id': gid, 'name': genre_names.get(gid, '')} for gid in item['genre_ids']]
+        rows.setdefault(data['tmdb_id'], Movie(**data))
+
+    if not rows:
+        return {}
+
+    Movie.objects.bulk_create(
+        rows.values(),
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['tmdb_id'],
+        update_fields=LIST_FIELDS,
+    )
+    return dict(Movie.objects.filter(tmdb_id__in=rows).values_list('tmdb_id', 'id'))
+
+
+def sync_list(service, list_name, pages, genre_names=None):
+    """Page through one TMDB list, upsert its movies and replace its stored ranking"""
+    fetch = getattr(service, CATALOG_LISTS[list_name])
+    results = []
+    totals = {}
+    for page in range(1, pages + 1):
+        data = fetch(page=page)
+        page_results = data.get('results', []) if data else []
+        results.extend(page_results)
+        if data and page == 1:
+            # TMDB's own totals, so pages past the mirrored slice stay reachable
+            totals = {key: data[key] for key in ('total_pages', 'total_results') if key in data}
+        if not data or page >= data.get('total_pages', 1):
+            break
+
+    ids = upsert_movies(service, results, genre_names)
+    now = timezone.now()
+    seen = set()
+    rankings = []
+    for item in results:
+        movie_pk = ids.get(item.get('id'))
+        # TMDB pages can shift while we read them, so one movie may show up twice
+        if movie_pk is None or movie_pk in seen:
+            continue
+        seen.add(movie_pk)
+        rankings.append(CatalogRanking(list_name=list_name, position=len(rankings), movie_id=movie_pk, synced_at=now))
+
+    with transaction.atomic():
+        CatalogRanking.objects.filter(list_name=list_name).delete()
+        CatalogRanking.objects.bulk_create(rankings, batch_size=500)
+        SyncState.objects.update_or_create(
+            name=list_state_name(list_name),
+            defaults={'last_run_at': now, 'last_result': {**totals, 'mirrored': len(rankings)}},
+        )
+    # Mirrored browse pages and rails changed; drop every cached page
+    page_cache.bump()
+    return len(rankings)
+
+
+def movie_payload(movie):
+    """Render a Movie row in the shape of a TMDB list result"""
+    return {
+        'id': movie.tmdb_id,
+        'title': movie.title,
+        'overview': movie.overview,
+        'poster_path': movie.poster_path,
+        'backdrop_path': movie.backdrop_path,
+        'release_date': movie.release_date.isoformat() if movie.release_date else '',
+        'vote_average': movie.vote_average,
+        'vote_count': movie.vote_count,
+        'popularity': movie.popularity,
+        'genre_ids': [g.get('id') for g in movie.genres if isinstance(g, dict)],
+    }
+
+
+def mirror_page(list_name, page, page_size=TMDB_PAGE_SIZE):
+    """
+    Serve one page of a mirrored list as a TMDB-shaped payload.
+
+    Returns None when mirroring is off, the list was never synced, the sync
+    is older than CATALOG_MIRROR_MAX_AGE or the page is past the mirrored
+    range, so callers can fall back to TMDB.
+    """
+    if not getattr(settings, 'CATALOG_MIRROR_BROWSE', False) or list_name not in CATALOG_LISTS:
+        return None
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        return None
+
+    rankings = CatalogRanking.objects.filter(list_name=list_name)
+    newest = rankings.order_by('-synced_at').values_list('synced_at', flat=True).first()
+    max_age = timedelta(seconds=getattr(settings, 'CATALOG_MIRROR_MAX_AGE', 6 * 3600))
+    if newest is None or timezone.now() - newest > max_age:
+        return None
+
+    mirrored = rankings.count()
+    if page < 1 or page > math.ceil(mirrored / page_size):
+        return None
+
+    # Report TMDB's totals, not the mirrored slice, so the paginator links on
+    # to the pages that are still fetched from TMDB
+    totals = SyncState.objects.filter(name=list_state_name(list_name)).values_list('last_result', flat=True).first() or {}
+    start = (page - 1) * page_size
+    page_rankings = rankings.select_related('movie').order_by('position')[start:start + page_size]
+    return {
+        'page': page,
+        'results': [movie_payload(r.movie) for r in page_rankings],
+        'total_pages': max(totals.get('total_pages', 0), math.ceil(mirrored / page_size)),
+        'total_results': max(totals.get('total_results', 0), mirrored),
+    }
+
+
+def changed_tmdb_ids(service, start, end):
+    """Collect the ids TMDB reports as changed between two datetimes"""
+    ids = set()
+    page = 1
+    while True:
+        data = service.get_movie_changes(start.date().isoformat(), end.date().isoformat(), page=page)
+        ids.update(item['id'] for item in data.get('results', []) if item.get('id'))
+        if page >= data.get('total_pages', 1):
+            return ids
+        page += 1
+
+
+def stored_movie_ids(tmdb_ids, chunk_size=500):
+    """Map the given TMDB ids to Movie pks for the ones we store (unique index lookups)"""
+    tmdb_ids = list(tmdb_ids)
+    stored = {}
+    for start in range(0, len(tmdb_ids), chunk_size):
+        chunk = tmdb_ids[start:start + chunk_size]
+        stored.update(Movie.objects.filter(tmdb_id__in=chunk).values_list('tmdb_id', 'id'))
+    return stored
+
+
+def refresh_movies(service, stored, workers=4, batch_size=500):
+    """
+    Refetch details for ``stored`` ({tmdb_id: pk}) and bulk-update the rows.
+
+    Details are fetched on ``workers`` threads; the database is only touched
+    from the calling thread. Returns (updated, failed_tmdb_ids).
+    """
+    def fetch(tmdb_id):
+        try:
+            return tmdb_id, service.get_movie_details(tmdb_id, refresh=True)
+        except Exception as e:
+            logger.error(f"Could not refresh movie {tmdb_id}: {e}")
+            return tmdb_id, None
+
+    now = timezone.now()
+    rows = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='catalog-refresh') as executor:
+        # Each task runs in a copy of our context so the upstream priority carries over
+        futures = [executor.submit(contextvars.copy_context().run, fetch, tmdb_id) for tmdb_id in stored]
+        for future in futures:
+            tmdb_id, movie_data = future.result()
+            data = service.parse_movie_data(movie_data) if movie_data else None
+            if not data:
+                failed.append(tmdb_id)
+                continue
+            rows.append(Movie(pk=stored[tmdb_id], updated_at=now, **data))
+
+    if rows:
+        Movie.objects.bulk_update(rows, DETAIL_FIELDS, batch_size=batch_size)
+    return len(rows), failed
+
+
+def sync_changes(service, name='movie_changes', since=None, workers=4):
+    """
+    Refresh stored movies that TMDB reports as changed since the last run.
+
+    Work is proportional to the number of changed movies we actually store,
+    not to catalog size. The watermark only advances when every refetch
+    succeeded, so failed rows are retried on the next run.
+    """
+    started = time.monotonic()
+    state, _ = SyncState.objects.get_or_create(name=name)
+    now = timezone.now()
+    start = since or state.watermark or now - timedelta(days=1)
+    if now - start > timedelta(days=CHANGES_MAX_DAYS):
+        logger.warning(f"{name} watermark {start} is older than {CHANGES_MAX_DAYS} days; run sync_catalog for a full refresh")
+        start = now - timedelta(days=CHANGES_MAX_DAYS)
+
+    changed = changed_tmdb_ids(service, start, now)
+    stored = stored_movie_ids(changed)
+    updated, failed = refresh_movies(service, stored, workers=workers)
+    if updated:
+        page_cache.bump()
+
+    result = {
+        'since': start.isoformat(),
+        'changed': len(changed),
+        'stored': len(stored),
+        'updated': updated,
+        'failed': len(failed),
+        'seconds': round(time.monotonic() - started, 2),
+    }
+    if not failed:
+        state.watermark = now
+    state.last_run_at = now
+    state.last_result = result
+    state.save()
+    logger.info(f"{name}: {result}")
+    return result
@@ -0,0 +1,90 @@
+import json
+import hashlib
+import logging
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from accounts.models import UserProfile
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('conditional')
+
+# view -> max-age (seconds) for anonymous responses. Responses to logged-in
+# users are private and always revalidated; None makes a view private for
+# everyone. HTTP_MAX_AGE entries override these.
+DEFAULT_MAX_AGE = {
+    'home': 60,
+    'browse': 300,
+    'movie_detail': 300,
+    'search': 300,
+    'search_suggestions': 300,
+    'movie_trailer': 0,
+    'watchlist': None,
+}
+
+
+def digest(*parts):
+    """Stable hash of the JSON-serializable inputs that shape a response"""
+    data = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+
+def etag(*parts):
+    """Strong ETag over ``parts``"""
+    return f'"{digest(*parts)}"'
+
+
+def user_state(request, *parts):
+    """
+    Digest of what a page shows about the requesting user: login, staff
+    status and avatar, plus view-specific ``parts`` (such as watchlist
+    membership). The embedded CSRF token is left out: pages read the
+    csrftoken cookie first, and logging in changes the digest anyway.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return digest('anonymous', *parts)
+    avatar = UserProfile.objects.filter(user=user).values_list('avatar', flat=True).first()
+    return digest(user.pk, user.username, user.is_staff, avatar, *parts)
+
+
+def _timestamp(last_modified):
+    return int(last_modified.timestamp()) if last_modified else None
+
+
+def respond(request, view, tag, render, last_modified=None):
+    """
+    Answer with 304 Not Modified when the client's copy matches ``tag`` (or
+    ``last_modified``), otherwise with ``render()``. Either way the response
+    carries the validators and the view's Cache-Control policy.
+
+    Callers compute ``tag`` from the page inputs, so a 304 skips template
+    rendering entirely. Pending messages always get a full page, since
+    showing them is what consumes them.
+    """
+    response = None
+    if not len(get_messages(request)):
+        response = get_conditional_response(request, etag=tag, last_modified=_timestamp(last_modified))
+    if response is not None:
+        stats.incr('not_modified')
+    else:
+        response = render()
+        stats.incr('full')
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = tag
+    if last_modified:
+        response['Last-Modified'] = http_date(_timestamp(last_modified))
+    max_age = {**DEFAULT_MAX_AGE, **getattr(settings, 'HTTP_MAX_AGE', {})}.get(view)
+    if max_age is None or request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
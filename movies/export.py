@@ -0,0 +1,148 @@
+import csv
+import json
+import zlib
+import logging
+from datetime import datetime, time as dt_time, timedelta
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from .metrics import get_counters
+from .models import MovieView, Watchlist
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('export')
+
+# Lines are joined into chunks of about this many bytes before being sent
+CHUNK_BYTES = 64 * 1024
+
+# dataset -> (model, timestamp field, [(column, lookup)])
+DATASETS = {
+    'views': (MovieView, 'viewed_at', [
+        ('id', 'id'),
+        ('tmdb_id', 'movie__tmdb_id'),
+        ('title', 'movie__title'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('ip_address', 'ip_address'),
+        ('viewed_at', 'viewed_at'),
+    ]),
+    'watchlist': (Watchlist, 'added_at', [
+        ('id', 'id'),
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('tmdb_id', 'movie__tmdb_id'),
+        ('title', 'movie__title'),
+        ('added_at', 'added_at'),
+    ]),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_rows(dataset, start=None, end=None, tmdb_id=None, chunk_size=2000):
+    """
+    Rows of a dataset as tuples, in id order, read through a chunked cursor.
+
+    ``start`` / ``end`` are inclusive local dates on the dataset's timestamp;
+    ``tmdb_id`` limits the export to one movie.
+    """
+    model, timestamp, columns = DATASETS[dataset]
+    rows = model.objects.all()
+    if start:
+        rows = rows.filter(**{f"{timestamp}__gte": timezone.make_aware(datetime.combine(start, dt_time.min))})
+    if end:
+        end_of_day = timezone.make_aware(datetime.combine(end + timedelta(days=1), dt_time.min))
+        rows = rows.filter(**{f"{timestamp}__lt": end_of_day})
+    if tmdb_id:
+        rows = rows.filter(movie__tmdb_id=tmdb_id)
+    # Server-side cursor on PostgreSQL; fetchmany() batches elsewhere. Either way
+    # only one chunk of rows is in memory at a time.
+    return rows.order_by('id').values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=chunk_size)
+
+
+class _Line:
+    """File-like target that hands back what csv.writer writes instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, header):
+    writer = csv.writer(_Line())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows, header):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + '\n'
+
+
+def _batched(lines):
+    """Join text lines into encoded chunks of about CHUNK_BYTES"""
+    batch, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        batch.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            yield b''.join(batch)
+            batch, size = [], 0
+    if batch:
+        yield b''.join(batch)
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into one gzip stream, chunk by chunk"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(dataset, fmt='csv', compress=False, chunk_size=2000, **filters):
+    """Byte chunks of a whole export, for a file or a StreamingHttpResponse"""
+    header = [column for column, _ in DATASETS[dataset][2]]
+    rows = _counted(export_rows(dataset, chunk_size=chunk_size, **filters))
+    lines = csv_lines(rows, header) if fmt == 'csv' else ndjson_lines(rows, header)
+    chunks = _batched(lines)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def _counted(rows):
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    stats.incr('rows', count)
+    stats.incr('exports')
+    logger.info(f"Exported {count} rows")
+
+
+async def aexport_chunks(chunks):
+    """
+    Serve a sync chunk generator to an ASGI response one chunk at a time.
+
+    StreamingHttpResponse would otherwise read a sync iterator to the end
+    before sending anything under ASGI.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def export_filename(dataset, fmt, compress):
+    name = f"{dataset}-{timezone.localdate().isoformat()}.{fmt}"
+    return f"{name}.gz" if compress else name
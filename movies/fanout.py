@@ -0,0 +1,144 @@
+import time
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('fanout')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Tasks per call name that missed their page deadline and are still running:
+# a started task cannot be cancelled and keeps its pool thread until the
+# upstream call returns
+_overdue = {}
+_overdue_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'UPSTREAM_FANOUT_WORKERS', 16),
+                    thread_name_prefix='upstream-fanout',
+                )
+    return _executor
+
+
+def _saturated(name, limit):
+    with _overdue_lock:
+        return _overdue.get(name, 0) >= limit
+
+
+def _abandon(future, name):
+    """Count a running task past its deadline until it finishes"""
+    with _overdue_lock:
+        _overdue[name] = _overdue.get(name, 0) + 1
+    future.add_done_callback(lambda _: _finish_overdue(name))
+
+
+def _finish_overdue(name):
+    with _overdue_lock:
+        _overdue[name] -= 1
+
+
+def overdue():
+    """Tasks per call name still running past their page deadline in this process"""
+    with _overdue_lock:
+        return {name: count for name, count in _overdue.items() if count}
+
+
+def fan_out(calls, timeout=None, default=None):
+    """
+    Run independent upstream calls concurrently on the shared bounded pool.
+
+    ``calls`` maps a name to a zero-argument callable. Returns a dict with the
+    same names; a call that raises or misses the overall deadline yields
+    ``default`` so each page section can degrade on its own.
+
+    A call that already started cannot be stopped at the deadline and keeps
+    running. Once UPSTREAM_FANOUT_MAX_IN_FLIGHT such overdue tasks per name
+    are still running, the call is skipped and yields ``default`` straight
+    away rather than letting one slow upstream fill the pool. Calls that are
+    merely in progress for other pages don't count.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'UPSTREAM_FANOUT_TIMEOUT', 8)
+    limit = getattr(settings, 'UPSTREAM_FANOUT_MAX_IN_FLIGHT', 4)
+
+    started = time.monotonic()
+    executor = _get_executor()
+    results = {}
+    futures = {}
+    for name, fn in calls.items():
+        if _saturated(name, limit):
+            stats.incr('shed')
+            logger.warning(f"Upstream call '{name}' skipped: {limit} earlier calls are still running past their deadline")
+            results[name] = default
+            continue
+        futures[executor.submit(fn)] = name
+    done, not_done = wait(futures, timeout=timeout)
+
+    for future, name in futures.items():
+        if future in not_done:
+            stats.incr('timeouts')
+            if not future.cancel():
+                # Already running: it keeps its pool thread until the upstream call returns
+                stats.incr('abandoned')
+                _abandon(future, name)
+            logger.error(f"Upstream call '{name}' missed the {timeout}s page deadline")
+            results[name] = default
+            continue
+        try:
+            results[name] = future.result()
+            stats.incr('succeeded')
+        except Exception as e:
+            stats.incr('failed')
+            logger.error(f"Upstream call '{name}' failed: {e}")
+            results[name] = default
+
+    stats.incr('batches')
+    logger.debug(f"Fan-out of {len(calls)} calls finished in {time.monotonic() - started:.3f}s")
+    return results
+
+
+async def afan_out(calls, timeout=None, default=None):
+    """
+    asyncio counterpart of fan_out().
+
+    ``calls`` maps a name to a zero-argument callable returning an awaitable.
+    Calls still pending at the deadline are cancelled.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'UPSTREAM_FANOUT_TIMEOUT', 8)
+
+    tasks = {asyncio.ensure_future(fn()): name for name, fn in calls.items()}
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    results = {}
+    for task, name in tasks.items():
+        if task in pending:
+            task.cancel()
+            stats.incr('timeouts')
+            logger.error(f"Upstream call '{name}' missed the {timeout}s page deadline")
+            results[name] = default
+            continue
+        try:
+            results[name] = task.result()
+            stats.incr('succeeded')
+        except Exception as e:
+            stats.incr('failed')
+            logger.error(f"Upstream call '{name}' failed: {e}")
+            results[name] = default
+
+    stats.incr('batches')
+    return results
@@ -1,6 +1,20 @@
+import re
+import unicodedata
 from django import forms
 
 
+def normalize_query(query):
+    """
+    Canonical form of a search query, used as its cache key and sent upstream.
+
+    NFKC (full-width and ligature forms), case folding, punctuation replaced
+    by spaces and whitespace collapsed: "  BATMAN! " and "batman" are the
+    same search.
+    """
+    query = unicodedata.normalize('NFKC', query or '').casefold()
+    query = re.sub(r"[^\w\s]|_", ' ', query)
+    return ' '.join(query.split())
+
 
 class SearchForm(forms.Form):
     """Form for advanced movie search"""
@@ -22,3 +36,29 @@ class SearchForm(forms.Form):
             # Remove extra whitespace
             query = ' '.join(query.split())
         return query
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # What the query is looked up and cached as; 'q' stays as typed for display
+        cleaned_data['normalized_q'] = normalize_query(cleaned_data.get('q'))
+        if 'q' in cleaned_data and not cleaned_data['normalized_q']:
+            self.add_error('q', 'Enter some letters or digits to search for.')
+        return cleaned_data
+
+
+class ExportForm(forms.Form):
+    """Filters and output options for a streamed analytics export"""
+
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], required=False)
+    gzip = forms.BooleanField(required=False)
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    movie = forms.IntegerField(required=False, min_value=1, label='TMDB id')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start'), cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError('start must not be after end')
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        return cleaned_data
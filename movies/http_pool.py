@@ -0,0 +1,116 @@
+import os
+import socket
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from django.conf import settings
+
+from .metrics import get_counters
+from . import upstream_stub
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('http')
+
+
+class _CountingPoolMixin:
+    """Count requests and freshly opened sockets so reuse can be derived"""
+
+    def _new_conn(self):
+        stats.incr('connections_opened')
+        return super()._new_conn()
+
+    def urlopen(self, *args, **kwargs):
+        stats.incr('requests')
+        return super().urlopen(*args, **kwargs)
+
+
+class CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive and instrumented connection pools"""
+
+    def __init__(self, keepalive=True, **kwargs):
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    adapter = PooledHTTPAdapter(
+        keepalive=getattr(settings, 'UPSTREAM_HTTP_KEEPALIVE', True),
+        pool_connections=getattr(settings, 'UPSTREAM_HTTP_POOL_CONNECTIONS', 10),
+        pool_maxsize=getattr(settings, 'UPSTREAM_HTTP_POOL_MAXSIZE', 20),
+        pool_block=getattr(settings, 'UPSTREAM_HTTP_POOL_BLOCK', False),
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # Offline record/replay (UPSTREAM_STUB_MODE); a no-op in normal operation
+    return upstream_stub.install(session)
+
+
+def get_session():
+    """
+    Return the pooled session shared by every upstream client in this worker.
+
+    The session is rebuilt after a fork so gunicorn workers never share sockets
+    inherited from a preloaded master process.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+            logger.info(f"Created pooled upstream HTTP session for pid {pid}")
+        return _session
+
+
+def reset_session():
+    """Close and drop the shared session (used by tests and on shutdown)"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def connection_stats():
+    """Return request / connection counters including how many requests reused a socket"""
+    data = stats.snapshot()
+    total = data.get('requests', 0)
+    opened = data.get('connections_opened', 0)
+    data.setdefault('requests', 0)
+    data.setdefault('connections_opened', 0)
+    data['connections_reused'] = max(total - opened, 0)
+    data['reuse_ratio'] = round(data['connections_reused'] / total, 3) if total else 0.0
+    return data
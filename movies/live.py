@@ -0,0 +1,170 @@
+import json
+import time
+import asyncio
+import logging
+from collections import Counter
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .metrics import get_counters
+from .models import Movie
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('live')
+
+LIVE_SEQ_KEY = 'live:views:seq'
+
+# Comment line sent when nothing happened for a while, so proxies keep the stream open
+KEEPALIVE_SECONDS = 15
+
+
+class LiveViewFeed:
+    """
+    Ring buffer of recent view batches in the shared cache.
+
+    Each flush of view events publishes one delta per day (views per movie)
+    into slot ``seq % size``; dashboards follow it over server-sent events by
+    reading the slots after the last sequence number they saw. Following the
+    feed costs cache reads only, never database queries. A reader that falls
+    more than ``size`` batches behind gets a reset and reloads the page.
+
+    The ring buffer is only as shared as its cache alias: with the LocMem
+    default (no REDIS_URL) every process keeps its own, and a dashboard sees
+    just the views flushed by the worker that answers it.
+    """
+
+    def __init__(self, alias='default', size=256, timeout=3600):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _slot(self, seq):
+        return f"live:views:{seq % self.size}"
+
+    def seq(self):
+        """Sequence number of the latest published batch"""
+        seq = self.cache.get(LIVE_SEQ_KEY)
+        if seq is None:
+            # Start from the clock so a lost counter never repeats an old sequence number
+            self.cache.add(LIVE_SEQ_KEY, int(time.time() * 1000), None)
+            seq = self.cache.get(LIVE_SEQ_KEY)
+        return seq
+
+    def publish(self, events):
+        """Publish a batch of written MovieView events; returns the number of deltas"""
+        by_day = {}
+        for event in events:
+            by_day.setdefault(timezone.localdate(event.viewed_at), Counter())[event.movie_id] += 1
+        if not by_day:
+            return 0
+        movie_ids = set().union(*by_day.values())
+        titles = dict(Movie.objects.filter(pk__in=movie_ids).values_list('pk', 'title'))
+        for day, counts in sorted(by_day.items()):
+            self.seq()
+            seq = self.cache.incr(LIVE_SEQ_KEY)
+            self.cache.set(self._slot(seq), {
+                'seq': seq,
+                'day': day.isoformat(),
+                'views': sum(counts.values()),
+                'movies': [
+                    {'id': movie_id, 'title': titles.get(movie_id, ''), 'views': views}
+                    for movie_id, views in counts.most_common()
+                ],
+            }, self.timeout)
+        stats.incr('published', len(by_day))
+        return len(by_day)
+
+    def since(self, seq):
+        """
+        Batches published after ``seq``, oldest first.
+
+        Returns (batches, complete); ``complete`` is False when some of them
+        were already overwritten or expired, or the counter was reset.
+        """
+        current = self.seq()
+        if current < seq:
+            return [], False
+        if current == seq:
+            return [], True
+        if current - seq > self.size:
+            return [], False
+        wanted = range(seq + 1, current + 1)
+        slots = self.cache.get_many([self._slot(s) for s in wanted])
+        batches = [slots.get(self._slot(s)) for s in wanted]
+        if any(batch is None or batch['seq'] != s for batch, s in zip(batches, wanted)):
+            return [], False
+        return batches, True
+
+
+def _event(name, data, event_id=None):
+    lines = [f"event: {name}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _poll(feed, seq, now, last_sent):
+    """One poll of the feed: (chunks to send, new seq, new last_sent, done)"""
+    batches, complete = feed.since(seq)
+    if not complete:
+        stats.incr('resets')
+        return [_event('reset', {'seq': feed.seq()})], seq, now, True
+    chunks = [_event('views', batch, batch['seq']) for batch in batches]
+    if batches:
+        seq = batches[-1]['seq']
+        last_sent = now
+    elif now - last_sent >= KEEPALIVE_SECONDS:
+        chunks.append(': keepalive\n\n')
+        last_sent = now
+    return chunks, seq, last_sent, False
+
+
+def poll(feed, seq):
+    """
+    One JSON poll of the feed for sync (WSGI) workers.
+
+    Returns the batches after ``seq`` and the sequence number to ask from
+    next time, or ``reset`` when the dashboard has to reload. Unlike a stream
+    it returns at once, so an open dashboard never holds a worker.
+    """
+    stats.incr('polls')
+    batches, complete = feed.since(seq)
+    if not complete:
+        stats.incr('resets')
+        return {'seq': feed.seq(), 'batches': [], 'reset': True}
+    if batches:
+        seq = batches[-1]['seq']
+    return {'seq': seq, 'batches': batches, 'reset': False}
+
+
+async def astream(feed, seq, poll_interval=1.0, max_seconds=3600):
+    """
+    Server-sent event stream of batches after ``seq``.
+
+    Only served by ASGI workers, where an idle stream costs no thread; the
+    browser's EventSource reconnects and resumes from Last-Event-ID.
+    """
+    stats.incr('streams')
+    yield 'retry: 2000\n\n'
+    started = last_sent = time.monotonic()
+    while time.monotonic() - started < max_seconds:
+        chunks, seq, last_sent, done = _poll(feed, seq, time.monotonic(), last_sent)
+        for chunk in chunks:
+            yield chunk
+        if done:
+            return
+        await asyncio.sleep(poll_interval)
+
+
+live_views = LiveViewFeed(
+    alias=getattr(settings, 'LIVE_FEED_CACHE_ALIAS', 'default'),
+    size=getattr(settings, 'LIVE_FEED_SIZE', 256),
+)
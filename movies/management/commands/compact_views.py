@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movies.archive import archive_dir, compact_day, compactable_days
+
+
+class Command(BaseCommand):
+    help = 'Archive raw MovieView rows older than the retention window into daily columnar files and delete them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'ANALYTICS_RETENTION_DAYS', 90),
+            help='Keep raw events for this many days',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Rows deleted per statement',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the days that would be compacted without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        days = compactable_days(options['days'])
+        if options['dry_run']:
+            for day in days:
+                self.stdout.write(f"would compact {day}")
+            self.stdout.write(f"{len(days)} days older than {options['days']} days")
+            return
+
+        started = time.monotonic()
+        deleted = 0
+        for day in days:
+            count = compact_day(day, chunk_size=options['chunk_size'])
+            deleted += count
+            self.stdout.write(f"{day}: {count} views archived")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {deleted} views from {len(days)} days into {archive_dir()} in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,45 @@
+import sys
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.export import DATASETS, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = 'Stream MovieView or Watchlist rows as CSV / NDJSON (optionally gzipped) to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to include (YYYY-MM-DD)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to include (YYYY-MM-DD)')
+        parser.add_argument('--movie', type=int, help='Only rows for this TMDB id')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per cursor round trip')
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and options['start'] > options['end']:
+            raise CommandError('--start must not be after --end')
+
+        chunks = export_chunks(
+            options['dataset'], options['format'], options['gzip'], chunk_size=options['chunk_size'],
+            start=options['start'], end=options['end'], tmdb_id=options['movie'],
+        )
+        started = time.monotonic()
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written} bytes to {options['output']} in {time.monotonic() - started:.1f}s"
+            ))
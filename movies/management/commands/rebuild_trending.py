@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+
+from movies.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the time-decayed trending scores from recent MovieView events and drop faded ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=72,
+            help='Only replay views from the last N hours (default: 72)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        movies = rebuild(hours=options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {movies} movies from the last {options['hours']}h in {time.monotonic() - started:.1f}s"
+        ))
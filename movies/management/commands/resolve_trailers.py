@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from movies.models import Movie
+from movies.ratelimit import BACKGROUND, upstream_priority
+from movies.services import TMDBService, YouTubeService
+from movies.trailers import resolve_trailer
+
+
+class Command(BaseCommand):
+    help = 'Look up YouTube trailers for stored movies that have none (skipping recent "none found" results)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=200,
+            help='Most popular pending movies to resolve in this run',
+        )
+
+    def handle(self, *args, **options):
+        pending = Movie.objects.filter(
+            Q(youtube_trailer_key__isnull=True) | Q(youtube_trailer_key=''),
+            Q(trailer_retry_after__isnull=True) | Q(trailer_retry_after__lte=timezone.now()),
+        ).order_by('-popularity')[:options['limit']]
+
+        tmdb, youtube = TMDBService(), YouTubeService()
+        started = time.monotonic()
+        found = checked = 0
+        with upstream_priority(BACKGROUND):
+            for movie in pending:
+                checked += 1
+                if resolve_trailer(movie, tmdb=tmdb, youtube=youtube):
+                    found += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Found trailers for {found}/{checked} movies in {time.monotonic() - started:.1f}s"
+        ))
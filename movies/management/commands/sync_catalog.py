@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.catalog import CATALOG_LISTS, sync_list
+from movies.ratelimit import BACKGROUND, upstream_priority
+from movies.services import TMDBService
+
+
+class Command(BaseCommand):
+    help = 'Mirror TMDB list endpoints (popular, top rated, now playing, upcoming, trending) into the local catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lists', default=','.join(CATALOG_LISTS),
+            help='Comma-separated lists to sync (default: all)',
+        )
+        parser.add_argument(
+            '--pages', type=int, default=5,
+            help='TMDB pages (20 movies each) to mirror per list',
+        )
+
+    def handle(self, *args, **options):
+        lists = [name.strip() for name in options['lists'].split(',') if name.strip()]
+        unknown = set(lists) - set(CATALOG_LISTS)
+        if unknown:
+            raise CommandError(f"Unknown lists: {', '.join(sorted(unknown))}")
+
+        service = TMDBService()
+        started = time.monotonic()
+        failed = []
+        with upstream_priority(BACKGROUND):
+            try:
+                genres_data = service.get_genres()
+                genre_names = {g['id']: g['name'] for g in genres_data.get('genres', [])}
+            except Exception as e:
+                self.stderr.write(f"Could not load genres, storing ids only: {e}")
+                genre_names = {}
+
+            for name in lists:
+                try:
+                    count = sync_list(service, name, options['pages'], genre_names)
+                    self.stdout.write(f"{name}: {count} movies ranked")
+                except Exception as e:
+                    failed.append(name)
+                    self.stderr.write(f"{name}: sync failed: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {len(lists) - len(failed)}/{len(lists)} lists in {time.monotonic() - started:.1f}s"
+        ))
+        if failed:
+            raise CommandError(f"Failed lists: {', '.join(failed)}")
@@ -0,0 +1,44 @@
+from datetime import datetime, time as dt_time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from movies.catalog import sync_changes
+from movies.ratelimit import BACKGROUND, upstream_priority
+from movies.services import TMDBService
+
+
+class Command(BaseCommand):
+    help = 'Refresh stored movies that TMDB reports as changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Start date (YYYY-MM-DD) instead of the stored watermark',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'CATALOG_CHANGES_WORKERS', 4),
+            help='Concurrent detail requests',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(datetime.strptime(options['since'], '%Y-%m-%d'), dt_time.min))
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        with upstream_priority(BACKGROUND):
+            try:
+                result = sync_changes(TMDBService(), since=since, workers=options['workers'])
+            except Exception as e:
+                raise CommandError(f"Could not read the TMDB changes feed: {e}")
+
+        self.stdout.write(
+            f"{result['changed']} changed on TMDB since {result['since']}, {result['stored']} stored locally"
+        )
+        style = self.style.WARNING if result['failed'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Updated {result['updated']} movies ({result['failed']} failed) in {result['seconds']:.1f}s"
+        ))
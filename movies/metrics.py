@@ -0,0 +1,46 @@
+import threading
+
+
+class Counters:
+    """Thread-safe named counters for per-process instrumentation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def get(self, name):
+        with self._lock:
+            return self._values.get(name, 0)
+
+    def snapshot(self):
+        """Return a plain dict copy of the current values"""
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_counters(name):
+    """Get (or create) the process-wide counter group registered under name"""
+    with _registry_lock:
+        counters = _registry.get(name)
+        if counters is None:
+            counters = _registry[name] = Counters()
+        return counters
+
+
+def snapshot_all():
+    """Snapshot every registered counter group, keyed by group name"""
+    with _registry_lock:
+        groups = dict(_registry)
+    return {name: counters.snapshot() for name, counters in groups.items()}
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_remove_rating_model'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('list_name', models.CharField(max_length=32)),
+                ('position', models.PositiveIntegerField()),
+                ('synced_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='movies.movie')),
+            ],
+            options={
+                'ordering': ['list_name', 'position'],
+                'unique_together': {('list_name', 'position')},
+            },
+        ),
+    ]
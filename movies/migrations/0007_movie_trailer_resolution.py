@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_syncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='trailer_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='trailer_retry_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:49
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_movie_trailer_resolution'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movieview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
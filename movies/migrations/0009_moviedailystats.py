@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_movieview_viewed_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('last_viewed_at', models.DateTimeField(blank=True, null=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='movies.movie')),
+            ],
+            options={
+                'ordering': ['-day', '-views'],
+                'indexes': [models.Index(fields=['day', '-views'], name='movies_movi_day_452530_idx')],
+                'unique_together': {('movie', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_moviedailystats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movieview',
+            index=models.Index(fields=['movie', 'viewed_at'], name='movies_movi_movie_i_cef17a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movieview',
+            index=models.Index(fields=['viewed_at'], name='movies_movi_viewed__731758_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_movieview_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('unique_viewers', models.PositiveIntegerField(default=0)),
+                ('viewer_sketch', models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddField(
+            model_name='moviedailystats',
+            name='viewer_sketch',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,127 @@
+import warnings
+from django.db import DatabaseError, migrations, transaction
+
+# Full-text and trigram indexes over Movie (movies/search.py). They are kept in
+# sync by the database itself, so Movie.save(), bulk_create/bulk_update from the
+# catalog sync and QuerySet.update() are all covered.
+#
+# Each index is created only where the database supports it: FTS5 needs an
+# SQLite build with it compiled in, its trigram tokenizer SQLite >= 3.34, and
+# pg_trgm the right to CREATE EXTENSION. Anything skipped is reported as a
+# warning, and movies/search.py falls back to a plain title match without it.
+
+SQLITE_FULL_TEXT = [
+    # External-content FTS5 tables: only the index is stored, the text stays in movies_movie
+    """CREATE VIRTUAL TABLE movies_movie_fts USING fts5(
+        title, tagline, overview,
+        content='movies_movie', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER movies_movie_search_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(rowid, title, tagline, overview)
+            VALUES (new.id, new.title, new.tagline, new.overview);
+    END""",
+    """CREATE TRIGGER movies_movie_search_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, tagline, overview)
+            VALUES ('delete', old.id, old.title, old.tagline, old.overview);
+    END""",
+    """CREATE TRIGGER movies_movie_search_au AFTER UPDATE OF title, tagline, overview ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, tagline, overview)
+            VALUES ('delete', old.id, old.title, old.tagline, old.overview);
+        INSERT INTO movies_movie_fts(rowid, title, tagline, overview)
+            VALUES (new.id, new.title, new.tagline, new.overview);
+    END""",
+    "INSERT INTO movies_movie_fts(movies_movie_fts) VALUES ('rebuild')",
+]
+
+SQLITE_TRIGRAM = [
+    """CREATE VIRTUAL TABLE movies_movie_trigram USING fts5(
+        title, content='movies_movie', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER movies_movie_trigram_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_trigram(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER movies_movie_trigram_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_trigram(movies_movie_trigram, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER movies_movie_trigram_au AFTER UPDATE OF title ON movies_movie BEGIN
+        INSERT INTO movies_movie_trigram(movies_movie_trigram, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO movies_movie_trigram(rowid, title) VALUES (new.id, new.title);
+    END""",
+    "INSERT INTO movies_movie_trigram(movies_movie_trigram) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS movies_movie_trigram_au',
+    'DROP TRIGGER IF EXISTS movies_movie_trigram_ad',
+    'DROP TRIGGER IF EXISTS movies_movie_trigram_ai',
+    'DROP TRIGGER IF EXISTS movies_movie_search_au',
+    'DROP TRIGGER IF EXISTS movies_movie_search_ad',
+    'DROP TRIGGER IF EXISTS movies_movie_search_ai',
+    'DROP TABLE IF EXISTS movies_movie_trigram',
+    'DROP TABLE IF EXISTS movies_movie_fts',
+]
+
+# Must match POSTGRES_VECTOR in movies/search.py for the index to be used
+POSTGRES_FULL_TEXT = [
+    """CREATE INDEX movies_movie_search_idx ON movies_movie USING GIN ((
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(tagline, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(overview, '')), 'C')
+    ))""",
+]
+
+POSTGRES_TRIGRAM = [
+    'CREATE INDEX movies_movie_title_trgm_idx ON movies_movie USING GIN (lower(title) gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS movies_movie_title_trgm_idx',
+    'DROP INDEX IF EXISTS movies_movie_search_idx',
+]
+
+
+def _try(schema_editor, statements, what, fallback):
+    """Run ``statements`` in a savepoint; if the database refuses them, roll back, warn and return False"""
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for statement in statements:
+                schema_editor.execute(statement)
+        return True
+    except DatabaseError as e:
+        warnings.warn(f"Skipping the {what} ({e}); local search will {fallback}", RuntimeWarning)
+        return False
+
+
+def forward(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        if _try(schema_editor, SQLITE_FULL_TEXT, 'FTS5 full-text index', 'match titles with LIKE'):
+            _try(schema_editor, SQLITE_TRIGRAM, 'FTS5 trigram index (needs SQLite 3.34+)', 'not correct typos')
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_FULL_TEXT:
+            schema_editor.execute(statement)
+        _try(
+            schema_editor, ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + POSTGRES_TRIGRAM,
+            'pg_trgm title index (CREATE EXTENSION was refused)', 'not correct typos',
+        )
+
+
+def reverse(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_trendingscore'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            forward,
+            reverse,
+        ),
+    ]
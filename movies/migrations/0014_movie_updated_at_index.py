@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['updated_at'], name='movies_movi_updated_0b75ca_idx'),
+        ),
+    ]
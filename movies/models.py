@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Movie(models.Model):
     """Model to store movie information from TMDB"""
@@ -17,12 +18,16 @@ class Movie(models.Model):
     tagline = models.CharField(max_length=500, blank=True)
     status = models.CharField(max_length=50, blank=True)
     youtube_trailer_key = models.CharField(max_length=100, blank=True, null=True)
+    trailer_checked_at = models.DateTimeField(null=True, blank=True)
+    trailer_retry_after = models.DateTimeField(null=True, blank=True)  # set when no embeddable trailer was found
     is_hidden = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-popularity']
+        # Latest change: the hidden-set version without a shared cache, and incremental index refreshes
+        indexes = [models.Index(fields=['updated_at'])]
 
     def __str__(self):
         return self.title
@@ -33,6 +38,13 @@ class Movie(models.Model):
             return f"https://image.tmdb.org/t/p/w500{self.poster_path}"
         return None
 
+    @property
+    def trailer_pending(self):
+        """No trailer stored yet and no recent "none found" result"""
+        if self.youtube_trailer_key:
+            return False
+        return self.trailer_retry_after is None or self.trailer_retry_after <= timezone.now()
+
     @property
     def backdrop_url(self):
         if self.backdrop_path:
@@ -60,10 +72,91 @@ class MovieView(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='views')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    viewed_at = models.DateTimeField(default=timezone.now)  # set when the view happens, not when it is flushed
 
     class Meta:
         ordering = ['-viewed_at']
+        indexes = [
+            models.Index(fields=['movie', 'viewed_at']),
+            models.Index(fields=['viewed_at']),
+        ]
 
     def __str__(self):
         return f"{self.movie.title} viewed at {self.viewed_at}"
+
+
+class CatalogRanking(models.Model):
+    """Position of a movie in a mirrored TMDB list (popular, trending, ...)"""
+    list_name = models.CharField(max_length=32)
+    position = models.PositiveIntegerField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='rankings')
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('list_name', 'position')
+        ordering = ['list_name', 'position']
+
+    def __str__(self):
+        return f"{self.list_name} #{self.position + 1}: {self.movie_id}"
+
+
+class SyncState(models.Model):
+    """Watermark and last outcome of an incremental sync job"""
+    name = models.CharField(max_length=64, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.watermark}"
+
+
+class MovieDailyStats(models.Model):
+    """Views and unique viewers of a movie on one day, maintained as views are recorded"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)  # estimated from viewer_sketch
+    viewer_sketch = models.BinaryField(null=True, blank=True)  # HyperLogLog of the day's viewers
+    last_viewed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('movie', 'day')
+        indexes = [models.Index(fields=['day', '-views'])]
+        ordering = ['-day', '-views']
+
+    def __str__(self):
+        return f"{self.movie_id} on {self.day}: {self.views} views"
+
+
+class SiteDailyStats(models.Model):
+    """Views and unique viewers across the whole site on one day"""
+    day = models.DateField(unique=True)
+    views = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)  # estimated from viewer_sketch
+    viewer_sketch = models.BinaryField(null=True, blank=True)  # HyperLogLog of the day's viewers
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.views} views, ~{self.unique_viewers} viewers"
+
+
+class TrendingScore(models.Model):
+    """
+    Exponentially decayed view score of a movie.
+
+    Stored as log2 of a forward-decayed sum (every view weighs 2 ** (hours since
+    a fixed epoch / half-life)), so scores never need rewriting as time passes
+    and ordering by log_score is the current trending order.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    log_score = models.FloatField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-log_score']
+
+    def __str__(self):
+        return f"{self.movie_id}: {self.log_score:.2f}"
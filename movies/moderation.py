@@ -0,0 +1,115 @@
+import time
+import threading
+import logging
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Max
+
+from .metrics import get_counters
+from .models import Movie
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('moderation')
+
+HIDDEN_VERSION_KEY = 'moderation:hidden:version'
+
+
+class HiddenMovieSet:
+    """
+    Per-process frozenset of hidden TMDB ids, reloaded only when it changes.
+
+    Every change bumps a version counter in the shared cache. Workers compare
+    it with the version they loaded (at most every ``check_interval`` seconds)
+    and rebuild the set from the database only on a mismatch, so steady-state
+    lookups cost no queries. ``max_age`` bounds staleness if the cache loses
+    the counter.
+
+    A LocMem (or dummy) alias is private to each process, so other workers
+    would never see a bump. With one of those the version also carries the
+    latest ``Movie.updated_at`` (hiding a movie saves it): one indexed query
+    per check rather than none. ``shared`` overrides the detection.
+    """
+
+    def __init__(self, alias='default', check_interval=1.0, max_age=300, shared=None):
+        self.alias = alias
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._shared = shared
+        self._ids = None
+        self._version = None
+        self._loaded_at = 0
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def shared(self):
+        """Whether every worker sees the version counter in this cache alias"""
+        if self._shared is None:
+            self._shared = not isinstance(self.cache, (LocMemCache, DummyCache))
+            if not self._shared:
+                logger.info(f"Cache alias '{self.alias}' is per-process; versioning hidden movies by Movie.updated_at")
+        return self._shared
+
+    def _current_version(self):
+        if not self.shared:
+            # The local counter still covers this process's own bumps after a QuerySet.update()
+            latest = Movie.objects.aggregate(latest=Max('updated_at'))['latest']
+            return f"{int(latest.timestamp() * 1_000_000) if latest else 0}-{self._counter()}"
+        return self._counter()
+
+    def _counter(self):
+        version = self.cache.get(HIDDEN_VERSION_KEY)
+        if version is None:
+            # Start from the clock so a lost counter never repeats an old version
+            self.cache.add(HIDDEN_VERSION_KEY, int(time.time() * 1000), None)
+            version = self.cache.get(HIDDEN_VERSION_KEY)
+        return version
+
+    def ids(self):
+        """Return the frozenset of hidden TMDB ids"""
+        now = time.monotonic()
+        if self._ids is not None and now - self._checked_at < self.check_interval:
+            return self._ids
+        with self._lock:
+            if self._ids is not None and now - self._checked_at < self.check_interval:
+                return self._ids
+            version = self._current_version()
+            if self._ids is None or version != self._version or now - self._loaded_at > self.max_age:
+                self._ids = frozenset(Movie.objects.filter(is_hidden=True).values_list('tmdb_id', flat=True))
+                self._version = version
+                self._loaded_at = now
+                stats.incr('reloads')
+                logger.debug(f"Loaded {len(self._ids)} hidden movie ids (version {version})")
+            self._checked_at = now
+            return self._ids
+
+    def version(self):
+        """Version of the set ids() currently returns, for keying anything derived from it"""
+        self.ids()
+        return self._version
+
+    def bump(self):
+        """Record that the hidden set changed so every worker reloads it"""
+        try:
+            self.cache.incr(HIDDEN_VERSION_KEY)
+        except ValueError:
+            self._counter()
+            self.cache.incr(HIDDEN_VERSION_KEY)
+        with self._lock:
+            # This worker sees its own change immediately
+            self._ids = None
+        stats.incr('bumps')
+
+
+hidden_movies = HiddenMovieSet(
+    alias=getattr(settings, 'HIDDEN_MOVIES_CACHE_ALIAS', 'default'),
+    check_interval=getattr(settings, 'HIDDEN_MOVIES_CHECK_INTERVAL', 1.0),
+)
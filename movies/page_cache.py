@@ -0,0 +1,173 @@
+import re
+import time
+import hashlib
+import logging
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+from .metrics import get_counters
+from .moderation import hidden_movies
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('page_cache')
+
+GENERATION_KEY = 'pagecache:generation'
+
+HOLE_PATTERN = re.compile(r'<!--hole:(\w+)-->')
+
+
+def hole_marker(name):
+    return f"<!--hole:{name}-->"
+
+
+def fragment_template(name):
+    return f"movies/fragments/{name}.html"
+
+
+def _csrf_token(request, context):
+    return get_token(request)
+
+
+def _messages(request, context):
+    if not len(get_messages(request)):
+        return ''
+    return render_to_string(fragment_template('messages'), context, request)
+
+
+# Holes that differ per request even for anonymous visitors. Everything else is
+# filled once for the anonymous variant when a page is stored.
+REQUEST_HOLES = {
+    'csrf_token': _csrf_token,
+    'messages': _messages,
+}
+
+
+def render_hole(name, request, context):
+    handler = REQUEST_HOLES.get(name)
+    if handler:
+        return handler(request, context)
+    return render_to_string(fragment_template(name), context, request)
+
+
+def fill(html, request, context=None):
+    """Replace every hole in ``html`` with its fragment rendered for ``request``"""
+    context = context or {}
+    return HOLE_PATTERN.sub(lambda match: render_hole(match.group(1), request, context), html)
+
+
+class PageCache:
+    """
+    Rendered catalog pages shared by every visitor, with per-user holes.
+
+    A page is rendered once with ``page_shell`` set, which turns each
+    ``{% hole %}`` (navbar user menu, messages, watchlist button, staff
+    controls, CSRF token) into a marker. The shell is stored together with an
+    anonymous variant whose holes are already filled except the CSRF token
+    and messages, so an anonymous hit is a cache read and a string
+    substitution. Logged-in hits render only the small fragment templates.
+
+    Keys include the path and query, the audience (staff see hidden movies),
+    the hidden-set version and a generation bumped after catalog syncs, so
+    moderation toggles and catalog refreshes invalidate every page at once.
+    """
+
+    def __init__(self, alias='default', timeout=120, enabled=True):
+        self.alias = alias
+        self.timeout = timeout
+        self.enabled = enabled
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self):
+        generation = self.cache.get(GENERATION_KEY)
+        if generation is None:
+            # Start from the clock so a lost counter never repeats an old generation
+            self.cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+            generation = self.cache.get(GENERATION_KEY)
+        return generation
+
+    def bump(self):
+        """Invalidate every stored page (after a catalog sync)"""
+        try:
+            self.cache.incr(GENERATION_KEY)
+        except ValueError:
+            self.generation()
+            self.cache.incr(GENERATION_KEY)
+        stats.incr('bumps')
+
+    def key(self, request, name):
+        """Cache key for this request to page ``name``, or None if it is not cacheable"""
+        if not self.enabled or request.method not in ('GET', 'HEAD'):
+            return None
+        audience = 'staff' if request.user.is_staff else 'public'
+        digest = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        return f"page:{name}:{audience}:{hidden_movies.version()}:{self.generation()}:{digest}"
+
+    def get(self, request, name):
+        key = self.key(request, name)
+        if key is None:
+            return None
+        entry = self.cache.get(key)
+        stats.incr('hits' if entry is not None else 'misses')
+        return entry
+
+    def _anonymous_variant(self, html, context):
+        anonymous = {**context, 'user': AnonymousUser()}
+        return HOLE_PATTERN.sub(
+            lambda match: match.group(0) if match.group(1) in REQUEST_HOLES
+            else render_to_string(fragment_template(match.group(1)), anonymous),
+            html,
+        )
+
+    def store(self, key, html, context=None, meta=None, timeout=None, anonymous=True):
+        """
+        Store a rendered shell and return its entry.
+
+        ``context`` is what the fragments need besides the request; ``meta``
+        is handed back to the view on hits. ``anonymous`` also prepares the
+        variant served to logged-out visitors (not for staff shells).
+        ``timeout`` can only shorten the configured TTL; 0 skips storing.
+        """
+        context = context or {}
+        entry = {
+            'html': html,
+            'anonymous': self._anonymous_variant(html, context) if anonymous else None,
+            'meta': meta or {},
+        }
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if timeout > 0:
+            self.cache.set(key, entry, timeout)
+            stats.incr('stores')
+        return entry
+
+    def respond(self, request, entry, context=None):
+        """The stored page with its holes filled for this request"""
+        if entry['anonymous'] is not None and not request.user.is_authenticated:
+            stats.incr('anonymous_fills')
+            return HttpResponse(fill(entry['anonymous'], request, context))
+        return HttpResponse(fill(entry['html'], request, context))
+
+    def describe(self):
+        counters = stats.snapshot()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'enabled': self.enabled,
+            'hit_rate': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+            **counters,
+        }
+
+
+page_cache = PageCache(
+    alias=getattr(settings, 'PAGE_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'PAGE_CACHE_TTL', 120),
+    enabled=getattr(settings, 'PAGE_CACHE', True),
+)
@@ -0,0 +1,311 @@
+import re
+import time
+import asyncio
+import contextvars
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('ratelimit')
+
+# Request priorities: page loads may use a bucket's full capacity, background
+# jobs (catalog sync, trailer resolution...) only a share of it.
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority = contextvars.ContextVar('upstream_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def upstream_priority(priority):
+    """Run the enclosed upstream calls (sync or async) at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class RateLimitExceeded(Exception):
+    """No capacity left in a shared bucket within the caller's wait budget"""
+
+
+class QuotaExceeded(RateLimitExceeded):
+    """The daily quota (or the share of it open to this priority) is used up"""
+
+
+ENDPOINT_CLASSES = {
+    'tmdb': [
+        (r'^/search/', 'search'),
+        (r'^/movie/\d+', 'details'),
+        (r'^/genre/', 'meta'),
+    ],
+    'youtube': [
+        (r'^/search', 'search'),
+        (r'^/videos', 'videos'),
+    ],
+}
+
+
+def endpoint_class(api, endpoint):
+    for pattern, name in ENDPOINT_CLASSES.get(api, []):
+        if re.search(pattern, endpoint):
+            return name
+    return 'lists'
+
+
+class RateLimiter:
+    """
+    Token buckets shared by every worker through a Django cache alias.
+
+    ``limits`` maps a bucket name to ``(limit, period)`` or ``(limit, period,
+    burst)``: the bucket refills continuously at ``limit / period`` tokens per
+    second and holds at most ``burst`` tokens (a quarter of ``limit`` by
+    default), so no period ever sees much more than ``limit`` calls. Each call
+    takes a token from the API-wide bucket and from its endpoint-class bucket
+    (e.g. ``tmdb`` and ``tmdb:search``) when those are configured.
+
+    A bucket is one atomic counter of tokens taken, measured against the
+    tokens refilled since the epoch (``now * rate``); the bucket is empty
+    when the counter is ``burst`` ahead of the refill. Topping up an idle
+    bucket is a plain set, so a call racing with it may get one extra token.
+    """
+
+    def __init__(self, limits, alias='default', background_share=0.5, interactive_wait=1.0, background_wait=30.0):
+        self.limits = limits
+        self.alias = alias
+        self.background_share = background_share
+        self.interactive_wait = interactive_wait
+        self.background_wait = background_wait
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def buckets_for(self, api, endpoint):
+        names = [api, f"{api}:{endpoint_class(api, endpoint)}"]
+        return [name for name in names if name in self.limits]
+
+    def _bucket(self, bucket):
+        """(refill rate per second, burst) of a configured bucket"""
+        limit, period, *burst = self.limits[bucket]
+        return limit / period, burst[0] if burst else max(1, limit // 4)
+
+    def _capacity(self, burst, priority):
+        # Background calls only use the top share of the bucket, leaving the rest for page loads
+        return burst if priority == INTERACTIVE else max(1, int(burst * self.background_share))
+
+    def _outcome(self, bucket, priority, taken, refilled):
+        """0 when the token at position ``taken`` is granted, else the seconds until one refills"""
+        rate, burst = self._bucket(bucket)
+        ahead = taken - refilled - self._capacity(burst, priority)
+        return 0 if ahead <= 0 else ahead / rate
+
+    def _try_take(self, bucket, priority):
+        """Take one token; returns 0 on success or the seconds until the bucket has one for this priority"""
+        key = f"ratelimit:{bucket}"
+        refilled = int(time.time() * self._bucket(bucket)[0])
+        self.cache.add(key, refilled, None)
+        try:
+            taken = self.cache.incr(key)
+        except ValueError:
+            taken = None
+        if taken is None or taken <= refilled:
+            # Missing, or idle long enough to be full: a full bucket holds only ``burst`` tokens
+            taken = refilled + 1
+            self.cache.set(key, taken, None)
+        wait = self._outcome(bucket, priority, taken, refilled)
+        if wait:
+            # Give the token back so rejected calls don't eat into higher-priority capacity
+            self._give_back(key, 1)
+        return wait
+
+    async def _atry_take(self, bucket, priority):
+        """Async variant of _try_take() on the cache's async API, so Redis never blocks the event loop"""
+        key = f"ratelimit:{bucket}"
+        refilled = int(time.time() * self._bucket(bucket)[0])
+        await self.cache.aadd(key, refilled, None)
+        try:
+            taken = await self.cache.aincr(key)
+        except ValueError:
+            taken = None
+        if taken is None or taken <= refilled:
+            taken = refilled + 1
+            await self.cache.aset(key, taken, None)
+        wait = self._outcome(bucket, priority, taken, refilled)
+        if wait:
+            await self._agive_back(key, 1)
+        return wait
+
+    def _give_back(self, key, amount):
+        try:
+            self.cache.decr(key, amount)
+        except ValueError:
+            pass
+
+    async def _agive_back(self, key, amount):
+        try:
+            await self.cache.adecr(key, amount)
+        except ValueError:
+            pass
+
+    def _max_wait(self, priority):
+        return self.interactive_wait if priority == INTERACTIVE else self.background_wait
+
+    def _reject(self, bucket, priority):
+        stats.incr(f'rejected_{priority}')
+        return RateLimitExceeded(f"Rate limit for '{bucket}' reached ({priority})")
+
+    def acquire(self, api, endpoint):
+        """Block until every bucket for this call has a token, or raise RateLimitExceeded"""
+        priority = current_priority()
+        deadline = time.monotonic() + self._max_wait(priority)
+        taken = []
+        for bucket in self.buckets_for(api, endpoint):
+            while True:
+                wait = self._try_take(bucket, priority)
+                if not wait:
+                    taken.append(bucket)
+                    break
+                if time.monotonic() + wait > deadline:
+                    # Return the tokens already taken from the earlier buckets
+                    for name in taken:
+                        self._give_back(f"ratelimit:{name}", 1)
+                    raise self._reject(bucket, priority)
+                stats.incr(f'waited_{priority}')
+                time.sleep(wait)
+        stats.incr(f'granted_{priority}')
+
+    async def aacquire(self, api, endpoint):
+        """Async variant of acquire()"""
+        priority = current_priority()
+        deadline = time.monotonic() + self._max_wait(priority)
+        taken = []
+        for bucket in self.buckets_for(api, endpoint):
+            while True:
+                wait = await self._atry_take(bucket, priority)
+                if not wait:
+                    taken.append(bucket)
+                    break
+                if time.monotonic() + wait > deadline:
+                    for name in taken:
+                        await self._agive_back(f"ratelimit:{name}", 1)
+                    raise self._reject(bucket, priority)
+                stats.incr(f'waited_{priority}')
+                await asyncio.sleep(wait)
+        stats.incr(f'granted_{priority}')
+
+
+class QuotaLedger:
+    """
+    Daily unit ledger for APIs with a hard quota (YouTube Data API).
+
+    Background calls stop once usage reaches ``1 - interactive_reserve`` of
+    the quota so the remainder is kept for page loads. The day rolls over in
+    ``reset_tz``, matching when the provider resets the quota.
+    """
+
+    def __init__(self, api, daily_quota, interactive_reserve=0.2, alias='default', reset_tz='America/Los_Angeles'):
+        self.api = api
+        self.daily_quota = daily_quota
+        self.interactive_reserve = interactive_reserve
+        self.alias = alias
+        self.reset_tz = ZoneInfo(reset_tz)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self):
+        return f"quota:{self.api}:{datetime.now(self.reset_tz).date().isoformat()}"
+
+    def limit_for(self, priority):
+        if priority == INTERACTIVE:
+            return self.daily_quota
+        return int(self.daily_quota * (1 - self.interactive_reserve))
+
+    def charge(self, units):
+        """Record units about to be spent, or raise QuotaExceeded without spending them"""
+        priority = current_priority()
+        key = self._key()
+        self.cache.add(key, 0, 2 * 24 * 3600)
+        try:
+            used = self.cache.incr(key, units)
+        except ValueError:
+            self.cache.set(key, units, 2 * 24 * 3600)
+            used = units
+        if used > self.limit_for(priority):
+            try:
+                self.cache.decr(key, units)
+            except ValueError:
+                pass
+            self._reject(priority, used - units)
+        return used
+
+    async def acharge(self, units):
+        """Async variant of charge() on the cache's async API"""
+        priority = current_priority()
+        key = self._key()
+        await self.cache.aadd(key, 0, 2 * 24 * 3600)
+        try:
+            used = await self.cache.aincr(key, units)
+        except ValueError:
+            await self.cache.aset(key, units, 2 * 24 * 3600)
+            used = units
+        if used > self.limit_for(priority):
+            try:
+                await self.cache.adecr(key, units)
+            except ValueError:
+                pass
+            self._reject(priority, used - units)
+        return used
+
+    def _reject(self, priority, used):
+        stats.incr(f'quota_rejected_{priority}')
+        raise QuotaExceeded(f"{self.api} daily quota reached for {priority} calls ({used}/{self.daily_quota})")
+
+    def usage(self):
+        used = self.cache.get(self._key(), 0)
+        return {
+            'api': self.api,
+            'used': used,
+            'quota': self.daily_quota,
+            'background_limit': self.limit_for(BACKGROUND),
+            'remaining': max(self.daily_quota - used, 0),
+        }
+
+
+# YouTube Data API unit costs per method
+YOUTUBE_COSTS = {
+    '/videos': 1,
+    '/search': 100,
+}
+
+_alias = getattr(settings, 'UPSTREAM_RATE_LIMIT_CACHE_ALIAS', 'default')
+
+rate_limiter = RateLimiter(
+    getattr(settings, 'UPSTREAM_RATE_LIMITS', {}),
+    alias=_alias,
+    background_share=getattr(settings, 'UPSTREAM_RATE_LIMIT_BACKGROUND_SHARE', 0.5),
+    interactive_wait=getattr(settings, 'UPSTREAM_RATE_LIMIT_INTERACTIVE_WAIT', 1.0),
+    background_wait=getattr(settings, 'UPSTREAM_RATE_LIMIT_BACKGROUND_WAIT', 30.0),
+)
+
+youtube_quota = QuotaLedger(
+    'youtube',
+    getattr(settings, 'YOUTUBE_DAILY_QUOTA', 10000),
+    interactive_reserve=getattr(settings, 'YOUTUBE_QUOTA_INTERACTIVE_RESERVE', 0.2),
+    alias=_alias,
+)
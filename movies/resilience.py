@@ -0,0 +1,233 @@
+import os
+import re
+import time
+import threading
+import logging
+import requests
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('breakers')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while a breaker is open"""
+
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"Circuit '{name}' is open; skipping upstream call")
+
+
+def endpoint_template(endpoint):
+    """Collapse ids so /movie/550 and /movie/551 share one breaker"""
+    return re.sub(r'/\d+', '/{id}', endpoint)
+
+
+def is_upstream_failure(exc):
+    """Connection problems, timeouts, 429 and 5xx count against upstream health; other 4xx don't"""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout, httpx.TransportError)):
+        return True
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, (requests.exceptions.RequestException, httpx.HTTPError))
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker whose state lives in a shared Django cache.
+
+    ``failure_threshold`` upstream failures within ``window`` seconds open the
+    circuit. While open, calls fail fast with CircuitOpenError. After
+    ``reset_timeout`` one worker at a time is allowed through as a probe: a
+    success closes the circuit, a failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, window=30, reset_timeout=30, alias='default'):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.alias = alias
+        self.state_key = f"breaker:{name}:state"
+        self.failures_key = f"breaker:{name}:failures"
+        self.probe_key = f"breaker:{name}:probe"
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def allow(self):
+        """Return True if a call may go upstream now"""
+        state = self.cache.get(self.state_key)
+        if state is None:
+            return True
+        if state['state'] == OPEN and time.time() - state['opened_at'] < self.reset_timeout:
+            stats.incr('rejected')
+            return False
+        # Cool-down is over: let exactly one probe through
+        if self.cache.add(self.probe_key, os.getpid(), max(self.reset_timeout, 10)):
+            self.cache.set(self.state_key, {'state': HALF_OPEN, 'opened_at': state['opened_at']}, None)
+            stats.incr('probes')
+            return True
+        stats.incr('rejected')
+        return False
+
+    def record_success(self):
+        if self.cache.get(self.state_key) is not None:
+            self.cache.delete_many([self.state_key, self.failures_key, self.probe_key])
+            stats.incr('closed')
+            logger.warning(f"Circuit '{self.name}' closed; upstream recovered")
+
+    def record_failure(self):
+        state = self.cache.get(self.state_key)
+        if state is not None:
+            self._open()
+            return
+        self.cache.add(self.failures_key, 0, self.window)
+        try:
+            failures = self.cache.incr(self.failures_key)
+        except ValueError:
+            # Counter expired between add() and incr()
+            self.cache.set(self.failures_key, 1, self.window)
+            failures = 1
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.cache.set(self.state_key, {'state': OPEN, 'opened_at': time.time()}, None)
+        self.cache.delete_many([self.failures_key, self.probe_key])
+        stats.incr('opened')
+        logger.error(f"Circuit '{self.name}' opened; failing fast for {self.reset_timeout}s")
+
+    def call(self, fn):
+        """Run fn() if the circuit allows it, recording the outcome"""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn()
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn):
+        """
+        Async variant of call(); fn is a zero-argument coroutine function.
+
+        The breaker state lives in the shared cache, so it is read and written
+        off the event loop.
+        """
+        if not await sync_to_async(self.allow)():
+            raise CircuitOpenError(self.name)
+        try:
+            result = await fn()
+        except Exception as e:
+            if is_upstream_failure(e):
+                await sync_to_async(self.record_failure)()
+            raise
+        await sync_to_async(self.record_success)()
+        return result
+
+    def describe(self):
+        state = self.cache.get(self.state_key)
+        if state is None:
+            return {'name': self.name, 'state': CLOSED, 'failures': self.cache.get(self.failures_key, 0)}
+        retry_in = max(0, round(state['opened_at'] + self.reset_timeout - time.time()))
+        return {'name': self.name, 'state': state['state'], 'opened_at': state['opened_at'], 'retry_in': retry_in}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+BREAKER_NAMES_KEY = 'breaker:names'
+
+
+def get_breaker(name):
+    """Return the breaker for name, registering it so supervisors can list it"""
+    breaker = _breakers.get(name)
+    if breaker is not None:
+        return breaker
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            alias = getattr(settings, 'UPSTREAM_BREAKER_CACHE_ALIAS', 'default')
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=getattr(settings, 'UPSTREAM_BREAKER_FAILURE_THRESHOLD', 5),
+                window=getattr(settings, 'UPSTREAM_BREAKER_WINDOW', 30),
+                reset_timeout=getattr(settings, 'UPSTREAM_BREAKER_RESET_TIMEOUT', 30),
+                alias=alias,
+            )
+            names = caches[alias].get(BREAKER_NAMES_KEY) or []
+            if name not in names:
+                caches[alias].set(BREAKER_NAMES_KEY, sorted(set(names) | {name}), None)
+            _breakers[name] = breaker
+    return breaker
+
+
+def breaker_states():
+    """Describe every breaker any worker has registered"""
+    alias = getattr(settings, 'UPSTREAM_BREAKER_CACHE_ALIAS', 'default')
+    names = set(caches[alias].get(BREAKER_NAMES_KEY) or []) | set(_breakers)
+    return [get_breaker(name).describe() for name in sorted(names)]
+
+
+class RetryBudget:
+    """
+    Cap retries at a share of recent traffic (per process).
+
+    Every logical request deposits ``ratio`` tokens and every retry spends one,
+    with a small time-based floor so quiet workers can still retry.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=0.5, max_tokens=10):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                stats.incr('retries')
+                return True
+        stats.incr('retries_denied')
+        return False
+
+
+retry_budget = RetryBudget(
+    ratio=getattr(settings, 'UPSTREAM_RETRY_BUDGET_RATIO', 0.1),
+)
+
+
+def should_retry(exc):
+    """tenacity predicate: retry transient upstream failures while the budget allows"""
+    return is_upstream_failure(exc) and retry_budget.try_spend()
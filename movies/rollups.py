@@ -0,0 +1,138 @@
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .metrics import get_counters
+from .models import MovieDailyStats, MovieView, SiteDailyStats
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('rollups')
+
+def viewer_id(user_id, ip_address):
+    """Signed-in users count once however many IPs they use; anonymous viewers by IP"""
+    if user_id:
+        return f"u{user_id}"
+    return f"ip{ip_address or ''}"
+
+
+def _group(events):
+    """Group MovieView events into {(movie_id, day): [views, viewers, last_viewed_at]}"""
+    groups = {}
+    for event in events:
+        day = timezone.localdate(event.viewed_at)
+        group = groups.setdefault((event.movie_id, day), [0, set(), event.viewed_at])
+        group[0] += 1
+        group[1].add(viewer_id(event.user_id, event.ip_address))
+        group[2] = max(group[2], event.viewed_at)
+    return groups
+
+
+def apply_views(events):
+    """
+    Add a batch of recorded views to the daily rollup.
+
+    Each (movie, day) row and each site-wide day row keeps a HyperLogLog
+    sketch of its viewers; the batch's viewers are merged into it under a
+    row lock and ``unique_viewers`` is re-estimated from the sketch.
+    """
+    groups = _group(events)
+    site = {}
+    for (movie_id, day), (views, viewers, last_viewed_at) in groups.items():
+        _merge(MovieDailyStats.objects, {'movie_id': movie_id, 'day': day}, views, viewers, last_viewed_at)
+        total = site.setdefault(day, [0, set()])
+        total[0] += views
+        total[1] |= viewers
+    for day, (views, viewers) in site.items():
+        _merge(SiteDailyStats.objects, {'day': day}, views, viewers)
+    stats.incr('applied', len(events))
+    return len(groups)
+
+
+def _merge(manager, lookup, views, viewers, last_viewed_at=None):
+    with transaction.atomic():
+        row, _ = manager.select_for_update().get_or_create(**lookup)
+        sketch = HyperLogLog.from_bytes(row.viewer_sketch).update(viewers)
+        row.views += views
+        row.viewer_sketch = sketch.to_bytes()
+        row.unique_viewers = sketch.count()
+        if last_viewed_at is not None:
+            row.last_viewed_at = max(row.last_viewed_at or last_viewed_at, last_viewed_at)
+        row.save()
+
+
+def rebuild(start=None, end=None, keep_days=(), chunk_size=5000):
+    """
+    Recompute the rollup from MovieView for days in [start, end] (all days if omitted).
+
+    Rows for ``keep_days`` (days whose raw events were compacted into an
+    archive) are left alone. Returns the number of (movie, day) rows written.
+    """
+    events = MovieView.objects.all()
+    rows = MovieDailyStats.objects.exclude(day__in=list(keep_days))
+    site_rows = SiteDailyStats.objects.exclude(day__in=list(keep_days))
+    if start:
+        events = events.filter(viewed_at__date__gte=start)
+        rows = rows.filter(day__gte=start)
+        site_rows = site_rows.filter(day__gte=start)
+    if end:
+        events = events.filter(viewed_at__date__lte=end)
+        rows = rows.filter(day__lte=end)
+        site_rows = site_rows.filter(day__lte=end)
+
+    totals = defaultdict(lambda: [0, HyperLogLog(), None])
+    site = defaultdict(lambda: [0, HyperLogLog()])
+    for movie_id, viewed_at, user_id, ip_address in events.values_list(
+        'movie_id', 'viewed_at', 'user_id', 'ip_address'
+    ).iterator(chunk_size=chunk_size):
+        day = timezone.localdate(viewed_at)
+        viewer = viewer_id(user_id, ip_address)
+        total = totals[(movie_id, day)]
+        total[0] += 1
+        total[1].add(viewer)
+        total[2] = viewed_at if total[2] is None else max(total[2], viewed_at)
+        site[day][0] += 1
+        site[day][1].add(viewer)
+
+    with transaction.atomic():
+        rows.delete()
+        site_rows.delete()
+        MovieDailyStats.objects.bulk_create([
+            MovieDailyStats(
+                movie_id=movie_id, day=day, views=views, unique_viewers=sketch.count(),
+                viewer_sketch=sketch.to_bytes(), last_viewed_at=last,
+            )
+            for (movie_id, day), (views, sketch, last) in totals.items()
+        ], batch_size=1000)
+        SiteDailyStats.objects.bulk_create([
+            SiteDailyStats(day=day, views=views, unique_viewers=sketch.count(), viewer_sketch=sketch.to_bytes())
+            for day, (views, sketch) in site.items()
+        ], batch_size=1000)
+    logger.info(f"Rebuilt {len(totals)} daily stats rows")
+    return len(totals)
+
+
+def view_total(day=None):
+    """All-time views, or views on one day"""
+    rows = MovieDailyStats.objects.all()
+    if day:
+        rows = rows.filter(day=day)
+    return rows.aggregate(total=Sum('views'))['total'] or 0
+
+
+def unique_viewers(start, end, movie_id=None):
+    """
+    Estimated distinct viewers over [start, end], site-wide or for one movie.
+
+    Unions the stored daily sketches, so the cost depends on the number of
+    days in the range, not on how many views they hold.
+    """
+    if movie_id is None:
+        rows = SiteDailyStats.objects.filter(day__gte=start, day__lte=end)
+    else:
+        rows = MovieDailyStats.objects.filter(movie_id=movie_id, day__gte=start, day__lte=end)
+    return HyperLogLog.union(rows.values_list('viewer_sketch', flat=True)).count()
@@ -0,0 +1,202 @@
+import re
+import math
+import logging
+from django.conf import settings
+from django.db import connection
+
+from .catalog import TMDB_PAGE_SIZE, movie_payload
+from .metrics import get_counters
+from .models import Movie
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('search')
+
+# Same expression as the GIN index created in migration 0013
+POSTGRES_VECTOR = """(
+    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(tagline, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(overview, '')), 'C')
+)"""
+
+# bm25 column weights: title, tagline, overview
+SQLITE_WEIGHTS = '10.0, 4.0, 1.0'
+
+# Candidates fetched from the trigram index before scoring them in Python
+TRIGRAM_CANDIDATES = 200
+
+
+def tokens(query):
+    return re.findall(r'\w+', query.casefold())
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two leading blanks and one trailing"""
+    grams = set()
+    for word in tokens(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+# {connection alias: {'full_text': bool, 'trigram': bool}}; see search_indexes()
+_indexes = {}
+
+
+def search_indexes():
+    """
+    Which search indexes migration 0013 could create on this database.
+
+    The migration skips the ones the database cannot build (no FTS5, SQLite
+    before 3.34, no right to create pg_trgm); searches then fall back to a
+    plain title match.
+    """
+    available = _indexes.get(connection.alias)
+    if available is None:
+        if connection.vendor == 'sqlite':
+            tables = set(connection.introspection.table_names())
+            available = {'full_text': 'movies_movie_fts' in tables, 'trigram': 'movies_movie_trigram' in tables}
+        elif connection.vendor == 'postgresql':
+            # The tsvector query works without its index, just slower; similarity() needs pg_trgm
+            trigram = bool(_fetch("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'", []))
+            available = {'full_text': True, 'trigram': trigram}
+        else:
+            available = {'full_text': False, 'trigram': False}
+        missing = [name for name, present in available.items() if not present]
+        if missing:
+            logger.warning(f"Search indexes missing on '{connection.alias}': {', '.join(missing)}; using title matches")
+        _indexes[connection.alias] = available
+    return available
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _title_ids(words, limit):
+    stats.incr('title_matches')
+    return list(
+        Movie.objects.filter(title__icontains=' '.join(words)).order_by('-popularity').values_list('id', flat=True)[:limit]
+    )
+
+
+def _full_text_ids(words, limit):
+    if not search_indexes()['full_text']:
+        return _title_ids(words, limit)
+    if connection.vendor == 'sqlite':
+        # Every word must match; the last may be a prefix of a longer word
+        match = ' '.join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT m.id, bm25(movies_movie_fts, {SQLITE_WEIGHTS}), m.popularity "
+                f"FROM movies_movie_fts JOIN movies_movie m ON m.id = movies_movie_fts.rowid "
+                f"WHERE movies_movie_fts MATCH %s ORDER BY 2 LIMIT %s",
+                [match.strip(), limit],
+            )
+            rows = cursor.fetchall()
+        # bm25 is negative (lower is better); popular movies get a boost
+        rows.sort(key=lambda row: row[1] * (1 + math.log10(1 + max(row[2], 0))))
+        return [row[0] for row in rows]
+    if connection.vendor == 'postgresql':
+        match = ' & '.join(words[:-1] + [f"{words[-1]}:*"])
+        return _fetch(
+            f"SELECT id FROM movies_movie, to_tsquery('simple', %s) query "
+            f"WHERE {POSTGRES_VECTOR} @@ query "
+            f"ORDER BY ts_rank({POSTGRES_VECTOR}, query) * (1 + log(1 + greatest(popularity, 0))) DESC LIMIT %s",
+            [match, limit],
+        )
+    return _title_ids(words, limit)
+
+
+def _trigram_ids(query, words, limit):
+    if not search_indexes()['trigram']:
+        return []
+    threshold = getattr(settings, 'SEARCH_TRIGRAM_THRESHOLD', 0.3)
+    if connection.vendor == 'postgresql':
+        return _fetch(
+            "SELECT id FROM movies_movie WHERE similarity(lower(title), lower(%s)) >= %s "
+            "ORDER BY similarity(lower(title), lower(%s)) DESC, popularity DESC LIMIT %s",
+            [query, threshold, query, limit],
+        )
+    # Titles sharing any trigram with the query, then scored like pg_trgm's similarity()
+    grams = {word[i:i + 3] for word in words for i in range(len(word) - 2)}
+    if not grams:
+        return []
+    candidates = Movie.objects.filter(id__in=_fetch(
+        "SELECT rowid FROM movies_movie_trigram WHERE movies_movie_trigram MATCH %s LIMIT %s",
+        [' OR '.join(f'"{gram}"' for gram in sorted(grams)), TRIGRAM_CANDIDATES],
+    )).values_list('id', 'title', 'popularity')
+    scored = [(similarity(query, title), popularity, movie_id) for movie_id, title, popularity in candidates]
+    scored = sorted((s for s in scored if s[0] >= threshold), reverse=True)
+    return [movie_id for _, _, movie_id in scored[:limit]]
+
+
+def search_local(query, limit=100):
+    """
+    Stored movies matching ``query``, best first.
+
+    Ranked full-text matching over title, tagline and overview, boosted by
+    popularity; the last word matches as a prefix. When that finds nothing,
+    titles within trigram similarity SEARCH_TRIGRAM_THRESHOLD of the query,
+    so typos still match.
+    """
+    words = tokens(query)
+    if not words:
+        return []
+    ids = _full_text_ids(words, limit)
+    if not ids:
+        ids = _trigram_ids(query, words, limit)
+        stats.incr('trigram_fallbacks')
+    movies = Movie.objects.in_bulk(ids)
+    return [movies[movie_id] for movie_id in ids if movie_id in movies]
+
+
+def local_search_page(query, page, page_size=TMDB_PAGE_SIZE):
+    """
+    One page of local search results as a TMDB-shaped payload.
+
+    Returns None when the catalog has too few matches to answer on its own
+    (fewer than SEARCH_LOCAL_MIN_RESULTS and no exact title match), so the
+    caller asks TMDB instead.
+    """
+    if not getattr(settings, 'SEARCH_LOCAL', True):
+        return None
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        return None
+
+    try:
+        movies = search_local(query, limit=getattr(settings, 'SEARCH_LOCAL_LIMIT', 100))
+    except Exception as e:
+        stats.incr('errors')
+        logger.error(f"Local search failed for '{query}': {e}")
+        return None
+
+    wanted = ' '.join(tokens(query))
+    exact = any(' '.join(tokens(movie.title)) == wanted for movie in movies[:page_size])
+    if len(movies) < getattr(settings, 'SEARCH_LOCAL_MIN_RESULTS', 5) and not exact:
+        stats.incr('upstream')
+        return None
+
+    total_pages = max(1, math.ceil(len(movies) / page_size))
+    if page < 1 or page > total_pages:
+        return None
+    stats.incr('local')
+    start = (page - 1) * page_size
+    return {
+        'page': page,
+        'results': [movie_payload(movie) for movie in movies[start:start + page_size]],
+        'total_pages': total_pages,
+        'total_results': len(movies),
+    }
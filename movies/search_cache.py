@@ -0,0 +1,131 @@
+import math
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .metrics import get_counters
+from .ratelimit import BACKGROUND, upstream_priority
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('search_cache')
+
+# Page-2 prefetches run here instead of on the request path
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='search-prefetch')
+    return _executor
+
+
+class SearchResultCache:
+    """
+    Search result pages by (normalized query, page) in the shared cache.
+
+    Each search bumps its query's count for the current ``window``, and a
+    page is kept for ``base_ttl`` doubled for every doubling of that count
+    (up to ``max_ttl``), so head queries stay cached while one-off searches
+    expire quickly. Once a query has been searched ``head_after`` times, a
+    first page served to it also prefetches page 2 in the background.
+    """
+
+    def __init__(self, alias='default', base_ttl=600, max_ttl=6 * 3600, head_after=5, window=24 * 3600):
+        self.alias = alias
+        self.base_ttl = base_ttl
+        self.max_ttl = max_ttl
+        self.head_after = head_after
+        self.window = window
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _digest(self, query):
+        return hashlib.md5(query.encode('utf-8')).hexdigest()
+
+    def _key(self, query, page):
+        return f"search:results:{self._digest(query)}:{page}"
+
+    def record(self, query):
+        """Count one search for ``query``; returns how often it was searched in this window"""
+        key = f"search:count:{self._digest(query)}"
+        self.cache.add(key, 0, self.window)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(key, 1, self.window)
+            return 1
+
+    def ttl(self, count):
+        return min(self.max_ttl, self.base_ttl * 2 ** int(math.log2(max(count, 1))))
+
+    def get(self, query, page):
+        entry = self.cache.get(self._key(query, page))
+        if entry is None:
+            stats.incr('misses')
+            return None
+        stats.incr('hits')
+        if entry.get('prefetched'):
+            stats.incr('prefetch_hits')
+        return entry['data']
+
+    def set(self, query, page, data, count=1, prefetched=False):
+        self.cache.set(self._key(query, page), {'data': data, 'prefetched': prefetched}, self.ttl(count))
+        stats.incr('stores')
+
+    def prefetch(self, query, page, fetch, count):
+        """
+        Fetch and store ``page`` of a head query in the background, unless it is cached.
+
+        ``fetch(query, page)`` must be a sync callable returning the payload.
+        A claim in the shared cache keeps workers from prefetching it twice.
+        """
+        if count < self.head_after:
+            return False
+        key = self._key(query, page)
+        if key in self.cache or not self.cache.add(f"{key}:prefetching", 1, 60):
+            return False
+        stats.incr('prefetches')
+        _get_executor().submit(self._prefetch, query, page, fetch, count)
+        return True
+
+    def _prefetch(self, query, page, fetch, count):
+        try:
+            with upstream_priority(BACKGROUND):
+                data = fetch(query, page)
+            if data:
+                self.set(query, page, data, count, prefetched=True)
+        except Exception as e:
+            stats.incr('prefetch_errors')
+            logger.error(f"Prefetching page {page} of '{query}' failed: {e}")
+        finally:
+            self.cache.delete(f"{self._key(query, page)}:prefetching")
+            close_old_connections()
+
+    def describe(self):
+        counters = stats.snapshot()
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        return {
+            'hit_rate': round(counters.get('hits', 0) / lookups, 3) if lookups else None,
+            **counters,
+        }
+
+
+search_results = SearchResultCache(
+    alias=getattr(settings, 'SEARCH_CACHE_ALIAS', 'default'),
+    base_ttl=getattr(settings, 'SEARCH_CACHE_TTL', 600),
+    max_ttl=getattr(settings, 'SEARCH_CACHE_MAX_TTL', 6 * 3600),
+    head_after=getattr(settings, 'SEARCH_HEAD_QUERY_MIN', 5),
+)
@@ -1,39 +1,67 @@
 import requests
 import logging
 from django.conf import settings
+from django.core.cache import caches
 from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+
+from .http_pool import get_session
+from .metrics import get_counters
+from .cache import get_response_cache
+from .ratelimit import YOUTUBE_COSTS, QuotaExceeded, RateLimitExceeded, rate_limiter, youtube_quota
+from .resilience import CircuitOpenError, endpoint_template, get_breaker, retry_budget, should_retry
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+stats = get_counters('youtube')
+
 class TMDBService:
     """Service to interact with TMDB API"""
     BASE_URL = "https://api.themoviedb.org/3"
     IMAGE_BASE_URL = "https://image.tmdb.org/t/p"
     
-    def __init__(self):
+    def __init__(self, cache=None):
         self.api_key = settings.TMDB_API_KEY
         self.headers = {
             'Authorization': f'Bearer {settings.TMDB_ACCESS_TOKEN}',
             'Content-Type': 'application/json;charset=utf-8'
         }
-    
+        self._cache = cache
+
+    @property
+    def cache(self):
+        """Response cache (resolved lazily so settings are read at first use)"""
+        if self._cache is None:
+            self._cache = get_response_cache()
+        return self._cache
+
+    def _make_request(self, endpoint, params=None):
+        """Make a request to TMDB API, served from the response cache when possible"""
+        params = dict(params or {})
+        return self.cache.fetch(endpoint, params, lambda: self._guarded_fetch(endpoint, params))
+
+    def _guarded_fetch(self, endpoint, params):
+        """Fetch through the endpoint's circuit breaker so an unhealthy upstream fails fast"""
+        retry_budget.deposit()
+        breaker = get_breaker(f"tmdb:{endpoint_template(endpoint)}")
+        return breaker.call(lambda: self._fetch(endpoint, params))
+
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, requests.exceptions.SSLError, requests.exceptions.RequestException)),
+        wait=wait_exponential(multiplier=0.25, max=2),
+        retry=retry_if_exception(should_retry),
         reraise=True
     )
-    def _make_request(self, endpoint, params=None):
-        """Make a request to TMDB API with retry logic"""
+    def _fetch(self, endpoint, params):
+        """Fetch an endpoint from TMDB API with budgeted retries"""
+        rate_limiter.acquire('tmdb', endpoint)
         url = f"{self.BASE_URL}{endpoint}"
-        if params is None:
-            params = {}
+        params = dict(params)
         params['api_key'] = self.api_key
         
         try:
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
+            response = get_session().get(url, params=params, headers=self.headers, timeout=10)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -60,10 +88,20 @@ class TMDBService:
         """Get upcoming movies"""
         return self._make_request("/movie/upcoming", {"page": page})
     
-    def get_movie_details(self, movie_id):
-        """Get detailed information about a movie"""
-        return self._make_request(f"/movie/{movie_id}", {
-            "append_to_response": "videos,credits,similar,recommendations"
+    def get_movie_details(self, movie_id, refresh=False):
+        """Get detailed information about a movie (refresh=True skips the cached copy)"""
+        endpoint = f"/movie/{movie_id}"
+        params = {"append_to_response": "videos,credits,similar,recommendations"}
+        if refresh:
+            self.cache.invalidate(endpoint, params)
+        return self._make_request(endpoint, params)
+
+    def get_movie_changes(self, start_date, end_date, page=1):
+        """Get ids of movies changed between two dates (at most 14 days apart)"""
+        return self._make_request("/movie/changes", {
+            "start_date": start_date,
+            "end_date": end_date,
+            "page": page
         })
     
     def search_movies(self, query, page=1):
@@ -116,47 +154,107 @@ class TMDBService:
 
 
 
+# The videos endpoint accepts up to 50 ids per call, for 1 quota unit
+YOUTUBE_VIDEOS_BATCH = 50
+
+
+def _embed_cache():
+    return caches[getattr(settings, 'YOUTUBE_EMBED_CACHE_ALIAS', 'default')]
+
+
+def cached_embeddable(video_ids):
+    """Split video ids into ({id: cached status}, [ids still to check])"""
+    video_ids = list(dict.fromkeys(video_ids))
+    cached = _embed_cache().get_many([f"yt:embeddable:{video_id}" for video_id in video_ids])
+    statuses = {}
+    missing = []
+    for video_id in video_ids:
+        status = cached.get(f"yt:embeddable:{video_id}")
+        if status is None:
+            missing.append(video_id)
+        else:
+            statuses[video_id] = status
+    stats.incr('embed_cache_hits', len(statuses))
+    stats.incr('embed_cache_misses', len(missing))
+    return statuses, missing
+
+
+def embeddable_chunks(video_ids):
+    return [video_ids[i:i + YOUTUBE_VIDEOS_BATCH] for i in range(0, len(video_ids), YOUTUBE_VIDEOS_BATCH)]
+
+
+def store_embeddable(video_ids, data):
+    """Read statuses from a /videos response and cache them; unknown ids (deleted, private) are not embeddable"""
+    embeddable = {
+        item['id']: bool(item.get('status', {}).get('embeddable', False))
+        for item in data.get('items', [])
+    }
+    statuses = {video_id: embeddable.get(video_id, False) for video_id in video_ids}
+    _embed_cache().set_many(
+        {f"yt:embeddable:{video_id}": status for video_id, status in statuses.items()},
+        getattr(settings, 'YOUTUBE_EMBED_CACHE_TTL', 24 * 3600),
+    )
+    return statuses
+
+
 class YouTubeService:
     """Service to interact with YouTube API"""
     BASE_URL = "https://www.googleapis.com/youtube/v3"
     
     def __init__(self):
         self.api_key = settings.YOUTUBE_API_KEY
-    
+
+    def _request(self, path, params):
+        """Call the YouTube API through the endpoint's circuit breaker"""
+        retry_budget.deposit()
+        return get_breaker(f"youtube:{path}").call(lambda: self._get(path, params))
+
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, requests.exceptions.SSLError, requests.exceptions.RequestException))
+        wait=wait_exponential(multiplier=0.25, max=2),
+        retry=retry_if_exception(should_retry),
+        reraise=True
     )
-    def is_embeddable(self, video_id):
-        """Check if a YouTube video is embeddable with retry logic"""
-        url = f"{self.BASE_URL}/videos"
-        params = {
-            "part": "status",
-            "id": video_id,
-            "key": self.api_key
-        }
+    def _get(self, path, params):
+        """GET a YouTube API path with budgeted retries"""
+        rate_limiter.acquire('youtube', path)
+        youtube_quota.charge(YOUTUBE_COSTS.get(path, 1))
+        response = get_session().get(f"{self.BASE_URL}{path}", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
 
-        try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+    def is_embeddable(self, video_id):
+        """Check if a YouTube video is embeddable"""
+        return self.is_embeddable_many([video_id]).get(video_id, False)
 
-            if data.get("items"):
-                return data["items"][0]["status"].get("embeddable", False)
+    def is_embeddable_many(self, video_ids, raise_errors=False):
+        """
+        Check several YouTube videos in one /videos call.
 
-            return False
-        except Exception as e:
-            logger.error(f"Error checking YouTube embeddability: {e}")
-            return False
+        Returns {video_id: bool}. Answers are cached per video for
+        YOUTUBE_EMBED_CACHE_TTL; ids that could not be checked come back False
+        and are not cached, or raise_errors=True re-raises the failure.
+        """
+        statuses, missing = cached_embeddable(video_ids)
+        for chunk in embeddable_chunks(missing):
+            params = {
+                "part": "status",
+                "id": ",".join(chunk),
+                "key": self.api_key
+            }
+            try:
+                data = self._request("/videos", params)
+            except Exception as e:
+                logger.error(f"Error checking YouTube embeddability: {e}")
+                if raise_errors:
+                    raise
+                statuses.update({video_id: False for video_id in chunk})
+                continue
+            statuses.update(store_embeddable(chunk, data))
+        return statuses
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout, requests.exceptions.SSLError, requests.exceptions.RequestException))
-    )
     def search_trailer(self, movie_title, year=None):
-        """Search for movie trailer on YouTube with retry logic"""
+        """Search for movie trailer on YouTube"""
         query = f"{movie_title} official trailer"
         if year:
             query += f" {year}"
@@ -171,13 +269,11 @@ class YouTubeService:
         }
         
         try:
-            response = requests.get(f"{self.BASE_URL}/search", params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request("/search", params)
             
             if data.get('items'):
                 return data['items'][0]['id']['videoId']
             return None
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, CircuitOpenError, RateLimitExceeded, QuotaExceeded) as e:
             logger.error(f"Error searching YouTube: {e}")
             return None
@@ -0,0 +1,174 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+from django.core.cache import caches
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('singleflight')
+
+
+class _Call:
+    """An in-flight call that followers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one upstream fetch.
+
+    Within a process, the first caller runs ``fn`` and concurrent callers wait
+    for its result (or exception). When ``lock_alias`` names a shared Django
+    cache, the in-process leader also takes a cache lock; if another process
+    already holds it, the leader polls ``lookup()`` for that process's result
+    instead of fetching, and falls back to fetching itself after
+    ``wait_timeout`` or once the lock is released without a result.
+    """
+
+    def __init__(self, lock_alias=None, lock_timeout=30, wait_timeout=10, poll_interval=0.05):
+        self.lock_alias = lock_alias
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, lookup=None):
+        """Run fn() once per key across concurrent callers and return its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            stats.incr('coalesced_local')
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, lookup)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def _lead(self, key, fn, lookup):
+        stats.incr('leaders')
+        if self.lock_alias is None or lookup is None:
+            return fn()
+
+        cache = caches[self.lock_alias]
+        lock_key = f"{key}:flight"
+        if cache.add(lock_key, os.getpid(), self.lock_timeout):
+            try:
+                return fn()
+            finally:
+                cache.delete(lock_key)
+
+        # Another process is already fetching: wait for its result to land in the shared cache
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            found, value = lookup()
+            if found:
+                stats.incr('coalesced_remote')
+                return value
+            if cache.get(lock_key) is None:
+                stats.incr('remote_fallbacks')
+                break
+        else:
+            stats.incr('remote_wait_timeouts')
+            logger.warning(f"Timed out waiting for another worker to fetch {key}")
+        return fn()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight(SingleFlight):
+    """asyncio counterpart of SingleFlight; followers await the leader's future"""
+
+    async def do(self, key, fn, lookup=None):
+        """Await fn() once per key across concurrent callers on this event loop"""
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        with self._lock:
+            future = self._calls.get(call_key)
+            leader = future is None
+            if leader:
+                future = self._calls[call_key] = loop.create_future()
+
+        if not leader:
+            stats.incr('coalesced_local')
+            return await asyncio.shield(future)
+
+        try:
+            result = await self._lead(key, fn, lookup)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # followers re-raise it; don't warn about it being unretrieved
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(call_key, None)
+            if not future.done():
+                future.cancel()
+
+    async def _lead(self, key, fn, lookup):
+        """Like SingleFlight._lead, but ``lookup`` is a coroutine function and the lock uses the async cache API"""
+        stats.incr('leaders')
+        if self.lock_alias is None or lookup is None:
+            return await fn()
+
+        cache = caches[self.lock_alias]
+        lock_key = f"{key}:flight"
+        if await cache.aadd(lock_key, os.getpid(), self.lock_timeout):
+            try:
+                return await fn()
+            finally:
+                await cache.adelete(lock_key)
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            found, value = await lookup()
+            if found:
+                stats.incr('coalesced_remote')
+                return value
+            if await cache.aget(lock_key) is None:
+                stats.incr('remote_fallbacks')
+                break
+        else:
+            stats.incr('remote_wait_timeouts')
+            logger.warning(f"Timed out waiting for another worker to fetch {key}")
+        return await fn()
+
+
+def flight_stats():
+    """Return leader/coalesced counters plus the share of calls that were collapsed"""
+    data = stats.snapshot()
+    collapsed = data.get('coalesced_local', 0) + data.get('coalesced_remote', 0)
+    total = collapsed + data.get('leaders', 0)
+    data['collapsed'] = collapsed
+    data['collapse_ratio'] = round(collapsed / total, 3) if total else 0.0
+    return data
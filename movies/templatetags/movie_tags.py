@@ -1,4 +1,7 @@
 from django import template
+from django.utils.safestring import mark_safe
+
+from movies.page_cache import fragment_template, hole_marker
 
 register = template.Library()
 
@@ -8,3 +11,11 @@ def get_item(dictionary, key):
     if isinstance(dictionary, dict):
         return dictionary.get(key)
     return None
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name):
+    """Per-user fragment: a placeholder when rendering a cached page shell, the fragment otherwise"""
+    if context.get('page_shell'):
+        return mark_safe(hole_marker(name))
+    return context.template.engine.get_template(fragment_template(name)).render(context)
@@ -1,3 +1,1366 @@
-from django.test import TestCase
+import io
+import os
+import time
+import csv
+import gzip
+import json
+import asyncio
+import tempfile
+import threading
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time, timedelta
+from unittest.mock import patch
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .cache import (
+    DjangoCacheBackend, LocalCacheBackend, NullResponseCache, ResponseCache, cache_stats, get_response_cache,
+)
+from .analytics import ViewEventBuffer, view_events
+from .autocomplete import PrefixIndex, title_index
+from .export import export_chunks
+from .fanout import fan_out, overdue, stats as fanout_stats
+from .hll import HyperLogLog
+from .ratelimit import BACKGROUND, QuotaExceeded, QuotaLedger, RateLimiter, RateLimitExceeded, upstream_priority
+from .live import LiveViewFeed, live_views, poll as live_poll
+from .catalog import mirror_page, sync_changes, sync_list
+from .archive import compact_day, compactable_days, daily_totals, read_day, write_day
+from .models import Movie, MovieDailyStats, MovieView, SiteDailyStats, SyncState, Watchlist
+from .metrics import get_counters
+from .moderation import HiddenMovieSet, hidden_movies
+from .page_cache import page_cache, stats as page_cache_stats
+from .rollups import apply_views, rebuild, unique_viewers
+from .http_pool import PooledHTTPAdapter, get_session, reset_session
+from .resilience import CircuitOpenError, RetryBudget, get_breaker
+from .services import TMDBService, YouTubeService
+from .singleflight import SingleFlight, flight_stats
+from .forms import normalize_query
+from .search import local_search_page, search_local
+from .search_cache import SearchResultCache, stats as search_cache_stats
+from .trailers import resolve_trailer, schedule_trailer
+from .trending import TrendingSnapshot, rebuild as rebuild_trending, record_views
+from .upstream_stub import (
+    AsyncReplayTransport, Corpus, FaultProfile, ReplayAdapter, check_corpus, get_corpus, request_key,
+)
+
+TMDB = 'https://api.themoviedb.org/3'
+YOUTUBE = 'https://www.googleapis.com/youtube/v3'
+
+
+def tmdb_key(path, **params):
+    return request_key('GET', f"{TMDB}{path}", params)
+
+
+def popular_page(title='Offline Movie'):
+    return {
+        'page': 1,
+        'total_pages': 1,
+        'results': [{'id': 1, 'title': title, 'overview': '', 'vote_average': 7.5, 'genre_ids': []}],
+    }
+
+
+class HTTPPoolTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_session()
+        self.addCleanup(reset_session)
+
+    def test_services_share_one_pooled_session(self):
+        session = get_session()
+        adapter = session.get_adapter(f"{TMDB}/movie/popular")
+        self.assertIsInstance(adapter, PooledHTTPAdapter)
+        self.assertIs(session.get_adapter(f"{YOUTUBE}/search"), adapter)
+        self.assertIs(session.get_adapter('http://example.com/'), adapter)
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({'results': [], 'items': [{'id': {'videoId': 'v'}}]}).encode()
+        with patch.object(session, 'get', return_value=response) as get:
+            TMDBService(cache=NullResponseCache()).get_popular_movies()
+            self.assertEqual(YouTubeService().search_trailer('Offline Movie'), 'v')
+        self.assertEqual([call.args[0] for call in get.call_args_list], [f"{TMDB}/movie/popular", f"{YOUTUBE}/search"])
+        self.assertIs(get_session(), session)
+
+    def test_reset_session_replaces_it(self):
+        session = get_session()
+        reset_session()
+        fresh = get_session()
+        self.assertIsNot(fresh, session)
+        self.assertIsNot(fresh.get_adapter(TMDB), session.get_adapter(TMDB))
+        self.assertIs(get_session(), fresh)
+
+
+class RequestKeyTests(TestCase):
+    def test_ignores_credentials_and_param_order(self):
+        a = request_key('GET', f"{TMDB}/search/movie?query=alien&page=1&api_key=secret")
+        b = request_key('get', f"{TMDB}/search/movie", {'page': 1, 'query': 'alien'})
+        self.assertEqual(a, b)
+        self.assertNotIn('secret', a)
+
+
+class CorpusTests(TestCase):
+    def test_round_trips_through_compressed_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corpus.json.gz')
+            corpus = Corpus(path)
+            corpus.add(tmdb_key('/movie/popular', page=1), 200, popular_page())
+            corpus.save()
+
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(2), b'\x1f\x8b')  # gzip magic
+            self.assertEqual(Corpus(path).get(tmdb_key('/movie/popular', page=1))['body'], popular_page())
+
+
+class StubCorpusCheckTests(TestCase):
+    def test_replay_without_a_corpus_fails_loudly(self):
+        missing = os.path.join(tempfile.gettempdir(), 'no-such-corpus.json.gz')
+        with override_settings(UPSTREAM_STUB_MODE='replay', UPSTREAM_STUB_CORPUS=missing), \
+                patch('movies.upstream_stub._corpus', None):
+            self.assertEqual([error.id for error in check_corpus()], ['movies.E001'])
+            with self.assertRaises(ImproperlyConfigured):
+                get_corpus()
+
+    def test_recorded_corpus_passes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corpus.json.gz')
+            with override_settings(UPSTREAM_STUB_MODE='record', UPSTREAM_STUB_CORPUS=path):
+                self.assertEqual(check_corpus(), [])
+            corpus = Corpus(path)
+            corpus.add(tmdb_key('/movie/popular', page=1), 200, popular_page())
+            corpus.save()
+            with override_settings(UPSTREAM_STUB_MODE='replay', UPSTREAM_STUB_CORPUS=path):
+                self.assertEqual(check_corpus(), [])
+
+
+class FaultProfileTests(TestCase):
+    def test_burst_window_answers_429(self):
+        faults = FaultProfile(burst_every=60, burst_seconds=5, clock=lambda: 120 + 2)
+        self.assertEqual(faults.decide(), (0, 429))
+        self.assertEqual(faults.retry_after(), 4)
+
+    def test_outside_burst_and_without_errors_passes_through(self):
+        faults = FaultProfile(latency_ms=20, burst_every=60, burst_seconds=5, clock=lambda: 130)
+        self.assertEqual(faults.decide(), (0.02, None))
+
+    def test_error_rate_is_repeatable_with_a_seed(self):
+        runs = [
+            [profile.decide()[1] for _ in range(20)]
+            for profile in (FaultProfile(error_rate=0.5, seed=7), FaultProfile(error_rate=0.5, seed=7))
+        ]
+        self.assertEqual(runs[0], runs[1])
+        self.assertIn(503, runs[0])
+        self.assertIn(None, runs[0])
+
+
+class ReplayTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.corpus = Corpus()
+        self.corpus.add(tmdb_key('/movie/popular', page=1), 200, popular_page())
+
+    def tearDown(self):
+        reset_session()
+        get_response_cache().clear()
+        cache.clear()
+
+    def replay(self, faults=None):
+        get_session().mount('https://', ReplayAdapter(self.corpus, faults))
+
+    def test_tmdb_service_reads_recorded_response(self):
+        self.replay()
+        data = TMDBService(cache=NullResponseCache()).get_popular_movies()
+        self.assertEqual(data['results'][0]['title'], 'Offline Movie')
+
+    def test_unrecorded_request_is_a_404(self):
+        self.replay()
+        with self.assertRaises(requests.HTTPError) as ctx:
+            TMDBService(cache=NullResponseCache()).get_top_rated_movies()
+        self.assertEqual(ctx.exception.response.status_code, 404)
+
+    def test_injected_burst_reaches_the_client_as_429(self):
+        self.replay(FaultProfile(burst_every=60, burst_seconds=60))
+        response = get_session().get(f"{TMDB}/movie/popular", params={'page': 1})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_async_transport_replays_the_same_corpus(self):
+        async def fetch():
+            async with httpx.AsyncClient(transport=AsyncReplayTransport(self.corpus)) as client:
+                return await client.get(f"{TMDB}/movie/popular", params={'page': 1, 'api_key': 'x'})
+
+        response = asyncio.run(fetch())
+        self.assertEqual(response.json(), popular_page())
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_home_renders_offline(self):
+        for path in ('/trending/movie/week', '/movie/top_rated', '/movie/upcoming'):
+            self.corpus.add(tmdb_key(path, page=1), 200, popular_page('Replayed Rail'))
+        # No network is touched: every rail comes from the corpus
+        self.replay()
+        get_response_cache().clear()
+
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Replayed Rail')
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = patch('movies.cache.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.response_cache = ResponseCache(LocalCacheBackend(), stale_seconds=600)
+
+    def fetch(self, endpoint, value, params=None):
+        return self.response_cache.fetch(endpoint, params or {}, lambda: value)
+
+    def test_ttl_follows_the_endpoint(self):
+        self.assertEqual(self.response_cache.ttl_for('/genre/movie/list'), 12 * 3600)
+        self.assertEqual(self.response_cache.ttl_for('/movie/popular'), 30 * 60)
+        self.assertEqual(self.response_cache.ttl_for('/movie/550'), 24 * 3600)
+        self.assertEqual(self.response_cache.ttl_for('/collection/10'), 10 * 60)
+
+        self.fetch('/trending/movie/week', 'trending v1')
+        self.fetch('/movie/550', 'details v1')
+        self.now += 11 * 60
+        # Trending (10 minutes) is stale by now, details (a day) are not
+        self.assertEqual(self.response_cache.get_entry('/movie/550')['data'], 'details v1')
+        self.assertLess(self.response_cache.get_entry('/trending/movie/week')['fresh_until'], self.now)
+
+    def test_hits_and_misses_are_counted(self):
+        before = cache_stats()
+        self.assertEqual(self.fetch('/movie/popular', 'v1', {'page': 1}), 'v1')
+        self.assertEqual(self.fetch('/movie/popular', 'v2', {'page': 1, 'api_key': 'x'}), 'v1')
+        self.assertEqual(self.fetch('/movie/popular', 'v2', {'page': 2}), 'v2')
+        after = cache_stats()
+        self.assertEqual(after['misses'] - before.get('misses', 0), 2)
+        self.assertEqual(after['hits'] - before.get('hits', 0), 1)
+
+    def test_expired_entries_are_fetched_again(self):
+        self.fetch('/movie/popular', 'v1')
+        self.now += 30 * 60 + 600 + 1
+        self.assertEqual(self.fetch('/movie/popular', 'v2'), 'v2')
+
+    def test_stale_entry_is_served_while_one_refresh_runs(self):
+        self.fetch('/movie/popular', 'v1')
+        self.now += 31 * 60
+        release = threading.Event()
+        self.addCleanup(release.set)
+        loads = []
+
+        def slow_load():
+            loads.append(1)
+            release.wait(5)
+            return 'v2'
+
+        stale_hits = cache_stats().get('stale_hits', 0)
+        for _ in range(3):
+            self.assertEqual(self.response_cache.fetch('/movie/popular', {}, slow_load), 'v1')
+        self.assertEqual(cache_stats()['stale_hits'], stale_hits + 3)
+        release.set()
+        deadline = time.monotonic() + 5
+        while self.response_cache.get_entry('/movie/popular')['data'] != 'v2' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(self.fetch('/movie/popular', 'v3'), 'v2')
+
+    def test_local_backend_evicts_least_recently_used(self):
+        backend = LocalCacheBackend(max_entries=2)
+        evictions = cache_stats().get('evictions', 0)
+        backend.set('a', 1, 60)
+        backend.set('b', 2, 60)
+        self.assertEqual(backend.get('a'), 1)
+        backend.set('c', 3, 60)
+        self.assertEqual(len(backend), 2)
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual((backend.get('a'), backend.get('c')), (1, 3))
+        self.assertEqual(cache_stats()['evictions'], evictions + 1)
+
+        self.now += 61
+        self.assertIsNone(backend.get('a'))
+        self.assertTrue(backend.add('a', 4, 60))
+        self.assertFalse(backend.add('a', 5, 60))
+
+
+class CountingReplayAdapter(ReplayAdapter):
+    """ReplayAdapter that counts the requests reaching it"""
+
+    def __init__(self, corpus, faults=None):
+        super().__init__(corpus, faults)
+        self.hits = 0
+        self._hits_lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._hits_lock:
+            self.hits += 1
+        return super().send(request, **kwargs)
+
+
+@override_settings(UPSTREAM_BREAKER_FAILURE_THRESHOLD=2, UPSTREAM_BREAKER_RESET_TIMEOUT=30)
+class ResilienceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        self.corpus = Corpus()
+        self.corpus.add(tmdb_key('/movie/popular', page=1), 200, popular_page())
+        for target in ('movies.resilience.time.time', 'movies.resilience.time.monotonic'):
+            clock = patch(target, side_effect=lambda: self.now)
+            clock.start()
+            self.addCleanup(clock.stop)
+        # Fresh breakers built from the settings above, and no retries unless a test grants some
+        for patcher in (
+            patch.dict('movies.resilience._breakers', clear=True),
+            patch('movies.resilience.retry_budget', RetryBudget(ratio=0, min_per_second=0, max_tokens=0)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(reset_session)
+
+    def replay(self, faults=None):
+        adapter = CountingReplayAdapter(self.corpus, faults)
+        get_session().mount('https://', adapter)
+        return adapter
+
+    def breaker(self):
+        return get_breaker('tmdb:/movie/popular')
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        upstream = self.replay(FaultProfile(error_rate=1))
+        service = TMDBService(cache=NullResponseCache())
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                service.get_popular_movies()
+        self.assertEqual(self.breaker().describe()['state'], 'open')
+
+        with self.assertRaises(CircuitOpenError):
+            service.get_popular_movies()
+        self.assertEqual(upstream.hits, 2)
+
+    def test_half_open_trial_success_closes_the_circuit(self):
+        self.replay(FaultProfile(error_rate=1))
+        service = TMDBService(cache=NullResponseCache())
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                service.get_popular_movies()
+
+        self.now += 31
+        upstream = self.replay()
+        self.assertEqual(service.get_popular_movies(), popular_page())
+        self.assertEqual(upstream.hits, 1)
+        self.assertEqual(self.breaker().describe()['state'], 'closed')
+        self.assertEqual(service.get_popular_movies(), popular_page())
+
+    def test_half_open_allows_one_trial_and_a_failure_reopens(self):
+        upstream = self.replay(FaultProfile(error_rate=1))
+        service = TMDBService(cache=NullResponseCache())
+        for _ in range(2):
+            with self.assertRaises(requests.HTTPError):
+                service.get_popular_movies()
+
+        self.now += 31
+        breaker = self.breaker()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.describe()['state'], 'half_open')
+        # The trial is in flight: everyone else keeps failing fast
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            service.get_popular_movies()
+        self.assertEqual(breaker.describe(), {
+            'name': 'tmdb:/movie/popular', 'state': 'open', 'opened_at': self.now, 'retry_in': 30,
+        })
+        self.assertEqual(upstream.hits, 2)
+
+    def test_last_good_payload_is_served_while_open(self):
+        service = TMDBService(cache=ResponseCache(LocalCacheBackend(), stale_seconds=0))
+        self.replay()
+        self.assertEqual(service.get_popular_movies(), popular_page())
+
+        # Past the popular list's TTL, upstream starts failing
+        self.now += 31 * 60
+        upstream = self.replay(FaultProfile(error_rate=1))
+        fallbacks = cache_stats().get('fallbacks', 0)
+        for _ in range(4):
+            self.assertEqual(service.get_popular_movies(), popular_page())
+        self.assertEqual(self.breaker().describe()['state'], 'open')
+        self.assertEqual(upstream.hits, 2)
+        self.assertEqual(cache_stats()['fallbacks'], fallbacks + 4)
+
+    def test_retries_stop_when_the_budget_is_spent(self):
+        budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=1)
+        upstream = self.replay(FaultProfile(error_rate=1))
+        service = TMDBService(cache=NullResponseCache())
+        with patch('movies.resilience.retry_budget', budget):
+            with self.assertRaises(requests.HTTPError):
+                service.get_popular_movies()
+            # One retry was granted, the next failure goes straight to the breaker
+            self.assertEqual(upstream.hits, 2)
+            with self.assertRaises(requests.HTTPError):
+                service.get_popular_movies()
+        self.assertEqual(upstream.hits, 3)
+
+    def test_retry_budget_refills_from_traffic_and_time(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0.1, max_tokens=2)
+        self.assertEqual([budget.try_spend() for _ in range(3)], [True, True, False])
+        budget.deposit()
+        self.assertFalse(budget.try_spend())
+        budget.deposit()
+        self.assertTrue(budget.try_spend())
+        self.now += 10
+        self.assertEqual([budget.try_spend() for _ in range(2)], [True, False])
+        # Idle time never banks more than max_tokens
+        self.now += 3600
+        self.assertEqual([budget.try_spend() for _ in range(3)], [True, True, False])
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.corpus = Corpus()
+        self.corpus.add(tmdb_key('/movie/popular', page=1), 200, popular_page())
+        # Slow enough that every caller arrives while the first fetch is still running
+        self.upstream = CountingReplayAdapter(self.corpus, FaultProfile(latency_ms=200))
+        get_session().mount('https://', self.upstream)
+        self.addCleanup(reset_session)
+
+    def run_together(self, calls):
+        barrier = threading.Barrier(len(calls))
+
+        def run(fn):
+            barrier.wait()
+            return fn()
+
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            return list(pool.map(run, calls))
+
+    def test_concurrent_misses_make_one_upstream_call(self):
+        service = TMDBService(cache=ResponseCache(LocalCacheBackend()))
+        results = self.run_together([service.get_popular_movies] * 8)
+        self.assertEqual(results, [popular_page()] * 8)
+        self.assertEqual(self.upstream.hits, 1)
+
+    def test_workers_sharing_the_django_cache_make_one_upstream_call(self):
+        # Two workers: separate in-process flights, one shared cache for locks and results
+        workers = [
+            TMDBService(cache=ResponseCache(
+                DjangoCacheBackend(), flight=SingleFlight(lock_alias='default', poll_interval=0.01),
+            ))
+            for _ in range(2)
+        ]
+        remote = flight_stats().get('coalesced_remote', 0)
+        results = self.run_together([worker.get_popular_movies for worker in workers * 4])
+        self.assertEqual(results, [popular_page()] * 8)
+        self.assertEqual(self.upstream.hits, 1)
+        self.assertEqual(flight_stats()['coalesced_remote'], remote + 1)
+
+    def test_followers_share_the_leaders_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def failing():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            raise requests.ConnectionError('upstream down')
+
+        def follow():
+            started.wait(5)
+            return flight.do('key', lambda: 'not called')
+
+        coalesced = flight_stats().get('coalesced_local', 0)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            leader = pool.submit(flight.do, 'key', failing)
+            followers = [pool.submit(follow) for _ in range(3)]
+            deadline = time.monotonic() + 5
+            while flight_stats().get('coalesced_local', 0) < coalesced + 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            for future in [leader] + followers:
+                with self.assertRaises(requests.ConnectionError):
+                    future.result(5)
+        self.assertEqual(len(calls), 1)
+        # The failed call is forgotten, so the next caller tries again
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_worker_fetches_itself_when_the_remote_leader_fails(self):
+        flight = SingleFlight(lock_alias='default', poll_interval=0.01)
+        cache.set('key:flight', 'other-worker', 30)
+        fallbacks = flight_stats().get('remote_fallbacks', 0)
+
+        def remote_leader_gives_up():
+            time.sleep(0.05)
+            cache.delete('key:flight')
+
+        threading.Thread(target=remote_leader_gives_up).start()
+        self.assertEqual(flight.do('key', lambda: 'own fetch', lookup=lambda: (False, None)), 'own fetch')
+        self.assertEqual(flight_stats()['remote_fallbacks'], fallbacks + 1)
+
+    def test_worker_fetches_itself_after_waiting_too_long(self):
+        flight = SingleFlight(lock_alias='default', wait_timeout=0.1, poll_interval=0.01)
+        cache.set('key:flight', 'stuck-worker', 30)
+        timeouts = flight_stats().get('remote_wait_timeouts', 0)
+
+        started = time.monotonic()
+        self.assertEqual(flight.do('key', lambda: 'own fetch', lookup=lambda: (False, None)), 'own fetch')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(flight_stats()['remote_wait_timeouts'], timeouts + 1)
+
+
+class ListService(TMDBService):
+    """TMDB list pages without the network: 20 movies per page, 500 pages"""
+
+    def get_popular_movies(self, page=1):
+        return {
+            'page': page,
+            'total_pages': 500,
+            'total_results': 10000,
+            'results': [{'id': page * 100 + i, 'title': f'Movie {page}.{i}', 'genre_ids': []} for i in range(20)],
+        }
+
+
+class CatalogMirrorTests(TestCase):
+    def test_mirrored_pages_report_tmdb_totals(self):
+        self.assertEqual(sync_list(ListService(), 'popular', pages=2), 40)
+
+        data = mirror_page('popular', 2)
+        self.assertEqual(data['results'][0]['title'], 'Movie 2.0')
+        self.assertEqual((data['total_pages'], data['total_results']), (500, 10000))
+        # Past the mirrored slice, browse falls back to TMDB
+        self.assertIsNone(mirror_page('popular', 3))
+
+
+class ChangesSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        clock = patch('movies.catalog.timezone.now', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.watermark = self.now - timedelta(hours=2)
+        SyncState.objects.create(name='movie_changes', watermark=self.watermark)
+        for tmdb_id in (1, 2, 3):
+            Movie.objects.create(tmdb_id=tmdb_id, title=f'Old {tmdb_id}')
+
+        # Recorded feed: two pages, with ids 99 and 100 not in our catalog
+        day = self.now.date().isoformat()
+        self.corpus = Corpus()
+        for page, ids in ((1, [1, 2, 99]), (2, [3, 100])):
+            self.corpus.add(
+                tmdb_key('/movie/changes', start_date=day, end_date=day, page=page), 200,
+                {'page': page, 'total_pages': 2, 'results': [{'id': i, 'adult': False} for i in ids]},
+            )
+        for tmdb_id in (1, 2, 3):
+            self.add_details(tmdb_id)
+        self.upstream = CountingReplayAdapter(self.corpus)
+        get_session().mount('https://', self.upstream)
+        self.addCleanup(reset_session)
+        self.service = TMDBService(cache=NullResponseCache())
+
+    def add_details(self, tmdb_id):
+        self.corpus.add(
+            tmdb_key(f'/movie/{tmdb_id}', append_to_response='videos,credits,similar,recommendations'), 200,
+            {'id': tmdb_id, 'title': f'New {tmdb_id}', 'runtime': 100, 'genres': [{'id': 18, 'name': 'Drama'}]},
+        )
+
+    def titles(self):
+        return dict(Movie.objects.values_list('tmdb_id', 'title'))
+
+    def watermark_now(self):
+        return SyncState.objects.get(name='movie_changes').watermark
+
+    def test_refreshes_stored_movies_and_advances_the_watermark(self):
+        result = sync_changes(self.service, workers=2)
+        self.assertEqual({k: result[k] for k in ('changed', 'stored', 'updated', 'failed')},
+                         {'changed': 5, 'stored': 3, 'updated': 3, 'failed': 0})
+        self.assertEqual(self.titles(), {1: 'New 1', 2: 'New 2', 3: 'New 3'})
+        self.assertEqual(Movie.objects.get(tmdb_id=1).runtime, 100)
+        self.assertEqual(self.watermark_now(), self.now)
+        # Two feed pages plus one detail call per stored movie; 99 and 100 are never fetched
+        self.assertEqual(self.upstream.hits, 5)
+
+    def test_failed_detail_keeps_the_watermark(self):
+        del self.corpus.entries[tmdb_key('/movie/3', append_to_response='videos,credits,similar,recommendations')]
+        result = sync_changes(self.service, workers=2)
+        self.assertEqual((result['updated'], result['failed']), (2, 1))
+        self.assertEqual(self.titles(), {1: 'New 1', 2: 'New 2', 3: 'Old 3'})
+        self.assertEqual(self.watermark_now(), self.watermark)
+
+        # The next run picks up from the old watermark and finishes the job
+        self.add_details(3)
+        sync_changes(self.service, workers=2)
+        self.assertEqual(self.titles()[3], 'New 3')
+        self.assertEqual(self.watermark_now(), self.now)
+
+    def test_failed_feed_page_keeps_the_watermark(self):
+        day = self.now.date().isoformat()
+        del self.corpus.entries[tmdb_key('/movie/changes', start_date=day, end_date=day, page=2)]
+        with self.assertRaises(requests.HTTPError):
+            sync_changes(self.service, workers=2)
+        self.assertEqual(self.watermark_now(), self.watermark)
+        self.assertEqual(self.titles(), {1: 'Old 1', 2: 'Old 2', 3: 'Old 3'})
+
+
+class FanOutTests(TestCase):
+    @override_settings(UPSTREAM_FANOUT_MAX_IN_FLIGHT=1)
+    def test_concurrent_pages_within_their_deadline_are_not_skipped(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        shed = fanout_stats.get('shed')
+
+        def page():
+            return fan_out({'rail': lambda: release.wait(5) and 'ok'}, timeout=5)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            pages = [pool.submit(page) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            self.assertEqual([p.result() for p in pages], [{'rail': 'ok'}] * 4)
+        self.assertEqual(fanout_stats.get('shed'), shed)
+
+    @override_settings(UPSTREAM_FANOUT_MAX_IN_FLIGHT=1)
+    def test_abandoned_calls_are_counted_and_bounded(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        abandoned = fanout_stats.get('abandoned')
+
+        def slow():
+            release.wait(5)
+            return 'late'
+
+        self.assertEqual(fan_out({'slow': slow, 'fast': lambda: 'ok'}, timeout=0.05), {'slow': None, 'fast': 'ok'})
+        self.assertEqual(fanout_stats.get('abandoned'), abandoned + 1)
+        self.assertEqual(overdue(), {'slow': 1})
+
+        # The abandoned call still holds its slot, so the next page skips it without waiting
+        started = time.monotonic()
+        self.assertEqual(fan_out({'slow': slow}, timeout=5), {'slow': None})
+        self.assertLess(time.monotonic() - started, 1)
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while overdue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(fan_out({'slow': slow}), {'slow': 'late'})
+
+
+class RateLimiterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_000.0
+        clock = patch('movies.ratelimit.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        # 4 tokens per second, at most 2 at once; one search a minute
+        self.limiter = RateLimiter({'tmdb': (4, 1, 2), 'tmdb:search': (1, 60)}, interactive_wait=0, background_wait=0)
+
+    def take(self, endpoint='/movie/popular'):
+        try:
+            self.limiter.acquire('tmdb', endpoint)
+            return True
+        except RateLimitExceeded:
+            return False
+
+    def test_bucket_refills_continuously_up_to_its_burst(self):
+        self.assertEqual([self.take() for _ in range(3)], [True, True, False])
+        self.now += 0.25
+        self.assertEqual([self.take() for _ in range(2)], [True, False])
+        # A long idle period refills no more than the burst
+        self.now += 60
+        self.assertEqual([self.take() for _ in range(3)], [True, True, False])
+
+    def test_background_calls_keep_part_of_the_bucket_for_page_loads(self):
+        with upstream_priority(BACKGROUND):
+            self.assertEqual([self.take() for _ in range(2)], [True, False])
+        self.assertTrue(self.take())
+
+    def test_rejection_returns_tokens_taken_from_earlier_buckets(self):
+        self.assertTrue(self.take('/search/movie'))
+        self.assertFalse(self.take('/search/movie'))
+        # The API-wide token of the rejected search was given back
+        self.assertEqual([self.take() for _ in range(2)], [True, False])
+
+    def test_trailer_search_gives_up_when_limited(self):
+        for error in (RateLimitExceeded('busy'), QuotaExceeded('spent')):
+            with patch.object(YouTubeService, '_request', side_effect=error):
+                self.assertIsNone(YouTubeService().search_trailer('Offline Movie'))
+
+
+class SyncCallsBlocked:
+    """Django cache wrapper whose blocking methods fail, so only the async API may be used"""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def __getattr__(self, name):
+        if name in ('get', 'set', 'add', 'delete', 'incr', 'decr', 'get_many', 'set_many'):
+            raise AssertionError(f"blocking cache.{name}() called on the event loop")
+        return getattr(self._cache, name)
+
+
+class AsyncCacheCallTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_async_paths_use_the_async_cache_api(self):
+        blocked = SyncCallsBlocked(cache)
+        response_cache = ResponseCache(DjangoCacheBackend())
+        limiter = RateLimiter({'tmdb': (10, 60)})
+        quota = QuotaLedger('youtube', 100)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            return {'results': []}
+
+        async def run():
+            with patch.object(DjangoCacheBackend, 'cache', blocked), \
+                    patch.object(RateLimiter, 'cache', blocked), patch.object(QuotaLedger, 'cache', blocked):
+                await response_cache.afetch('/movie/popular', {'page': 1}, loader)
+                await response_cache.afetch('/movie/popular', {'page': 1}, loader)
+                await limiter.aacquire('tmdb', '/movie/popular')
+                await quota.acharge(1)
+
+        asyncio.run(run())
+        self.assertEqual(loads, [1])
+        self.assertEqual(quota.usage()['used'], 1)
+
+
+class EmbeddableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        corpus = Corpus()
+        corpus.add(request_key('GET', f"{YOUTUBE}/videos", {'part': 'status', 'id': 'a,b,c'}), 200, {
+            'items': [
+                {'id': 'a', 'status': {'embeddable': False}},
+                {'id': 'b', 'status': {'embeddable': True}},
+            ],
+        })
+        self.adapter = ReplayAdapter(corpus)
+        get_session().mount('https://', self.adapter)
+
+    def tearDown(self):
+        reset_session()
+        cache.clear()
+
+    def test_checks_all_keys_in_one_call_and_caches_them(self):
+        service = YouTubeService()
+        self.assertEqual(service.is_embeddable_many(['a', 'b', 'c']), {'a': False, 'b': True, 'c': False})
+
+        # Served from the per-video cache: an unrecorded request would 404 and read as False
+        get_session().mount('https://', ReplayAdapter(Corpus()))
+        self.assertTrue(service.is_embeddable('b'))
+        self.assertEqual(service.is_embeddable_many(['c', 'a']), {'c': False, 'a': False})
+
+
+class TrailerResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.corpus = Corpus()
+        self.corpus.add(request_key('GET', f"{YOUTUBE}/videos", {'part': 'status', 'id': 'a,b'}), 200, {
+            'items': [{'id': 'a', 'status': {'embeddable': False}}, {'id': 'b', 'status': {'embeddable': True}}],
+        })
+        self.corpus.add(request_key('GET', f"{YOUTUBE}/videos", {'part': 'status', 'id': 'c'}), 200, {'items': []})
+        get_session().mount('https://', ReplayAdapter(self.corpus))
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie')
+
+    def tearDown(self):
+        reset_session()
+        cache.clear()
+
+    def test_stores_first_embeddable_trailer(self):
+        self.assertEqual(resolve_trailer(self.movie, ['a', 'b']), 'b')
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.youtube_trailer_key, 'b')
+        self.assertFalse(self.movie.trailer_pending)
+
+    def test_remembers_that_no_trailer_was_found(self):
+        self.assertIsNone(resolve_trailer(self.movie, ['c']))
+        self.movie.refresh_from_db()
+        self.assertGreater(self.movie.trailer_retry_after, self.movie.trailer_checked_at + timedelta(days=1))
+        self.assertFalse(self.movie.trailer_pending)
+
+        response = self.client.get(reverse('movie_trailer', args=[1]))
+        self.assertEqual(response.json()['status'], 'none')
+        self.assertIsNone(cache.get('trailer:resolving:1'))  # nothing re-queued
+
+    def test_upstream_error_retries_sooner(self):
+        get_session().mount('https://', ReplayAdapter(Corpus(), FaultProfile(error_rate=1)))
+        self.assertIsNone(resolve_trailer(self.movie, ['c']))
+        self.movie.refresh_from_db()
+        self.assertLess(self.movie.trailer_retry_after, self.movie.trailer_checked_at + timedelta(days=1))
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'local'},
+            'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shared'},
+        },
+        YOUTUBE_EMBED_CACHE_ALIAS='shared',
+    )
+    def test_lookup_claim_uses_the_youtube_cache_alias(self):
+        with patch('movies.trailers._get_executor') as executor:
+            self.assertTrue(schedule_trailer(self.movie))
+            self.assertTrue(schedule_trailer(self.movie))
+        self.assertEqual(executor.return_value.submit.call_count, 1)
+        self.assertEqual(caches['shared'].get('trailer:resolving:1'), 1)
+        self.assertIsNone(caches['default'].get('trailer:resolving:1'))
+
+
+class HiddenMovieSetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Movie.objects.create(tmdb_id=1, title='Hidden', is_hidden=True)
+        Movie.objects.create(tmdb_id=2, title='Visible')
+
+    def test_lookups_need_no_queries_until_the_version_changes(self):
+        hidden = HiddenMovieSet(check_interval=0, shared=True)
+        self.assertEqual(hidden.ids(), frozenset({1}))
+        with self.assertNumQueries(0):
+            self.assertIn(1, hidden.ids())
+
+        # Another worker hides a movie and bumps the shared version
+        Movie.objects.filter(tmdb_id=2).update(is_hidden=True)
+        HiddenMovieSet().bump()
+        with self.assertNumQueries(1):
+            self.assertEqual(hidden.ids(), frozenset({1, 2}))
+
+    def test_per_process_cache_versions_by_the_latest_change(self):
+        hidden = HiddenMovieSet(check_interval=0)
+        self.assertFalse(hidden.shared)
+        self.assertEqual(hidden.ids(), frozenset({1}))
+        with self.assertNumQueries(1):
+            self.assertIn(1, hidden.ids())
+
+        # Another worker hides a movie; its bump lands in its own LocMem cache only
+        movie = Movie.objects.get(tmdb_id=2)
+        movie.is_hidden = True
+        movie.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(hidden.ids(), frozenset({1, 2}))
+
+
+class ViewEventBufferTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie')
+
+    def test_flush_writes_queued_views_in_one_batch(self):
+        events = ViewEventBuffer(batch_size=100, flush_interval=3600)
+        for _ in range(3):
+            events.record(self.movie.pk, ip_address='127.0.0.1')
+        self.assertEqual(MovieView.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(events.flush(), 3)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "movies_movieview"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(MovieView.objects.filter(movie=self.movie).count(), 3)
+        self.assertEqual(MovieDailyStats.objects.get(movie=self.movie).views, 3)
+
+    def test_full_buffer_drops_instead_of_blocking(self):
+        events = ViewEventBuffer(batch_size=100, flush_interval=3600, max_size=2)
+        results = [events.record(self.movie.pk) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(events.describe()['buffered'], 2)
+        events._take()
+
+
+class DailyStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie')
+
+    def views(self, *ips):
+        return [MovieView.objects.create(movie=self.movie, ip_address=ip) for ip in ips]
+
+    def test_batches_are_added_incrementally(self):
+        apply_views(self.views('10.0.0.1', '10.0.0.2'))
+        apply_views(self.views('10.0.0.1'))
+
+        day_stats = MovieDailyStats.objects.get(movie=self.movie)
+        self.assertEqual((day_stats.views, day_stats.unique_viewers), (3, 2))
+
+    def test_rebuild_matches_raw_events(self):
+        self.views('10.0.0.1', '10.0.0.1', '10.0.0.3')
+        self.assertEqual(rebuild(), 1)
+
+        day_stats = MovieDailyStats.objects.get(movie=self.movie)
+        self.assertEqual((day_stats.views, day_stats.unique_viewers), (3, 2))
+
+    def test_unique_viewers_union_across_days(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        apply_views([
+            MovieView.objects.create(movie=self.movie, ip_address=ip, viewed_at=yesterday)
+            for ip in ('10.0.0.1', '10.0.0.2')
+        ])
+        apply_views(self.views('10.0.0.2', '10.0.0.3'))
+
+        today = timezone.localdate()
+        self.assertEqual(SiteDailyStats.objects.get(day=today).unique_viewers, 2)
+        self.assertEqual(unique_viewers(today - timedelta(days=1), today), 3)
+        self.assertEqual(unique_viewers(today, today, movie_id=self.movie.pk), 2)
+
+
+class LiveViewFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie')
+        self.feed = LiveViewFeed(size=4)
+
+    def views(self, count):
+        return [MovieView(movie=self.movie, viewed_at=timezone.now()) for _ in range(count)]
+
+    def test_followers_get_deltas_without_queries(self):
+        start = self.feed.seq()
+        self.feed.publish(self.views(3))
+
+        with self.assertNumQueries(0):
+            batches, complete = self.feed.since(start)
+            delta = live_poll(self.feed, start)
+        self.assertTrue(complete)
+        self.assertEqual(batches[0]['views'], 3)
+        self.assertEqual(batches[0]['movies'], [{'id': self.movie.pk, 'title': 'Offline Movie', 'views': 3}])
+        self.assertEqual(delta, {'seq': start + 1, 'batches': batches, 'reset': False})
+        self.assertEqual(live_poll(self.feed, start + 1), {'seq': start + 1, 'batches': [], 'reset': False})
+
+    def test_falling_behind_the_ring_asks_for_a_reload(self):
+        start = self.feed.seq()
+        for _ in range(5):
+            self.feed.publish(self.views(1))
+
+        self.assertEqual(self.feed.since(start), ([], False))
+        self.assertEqual(len(self.feed.since(start + 1)[0]), 4)
+        self.assertEqual(live_poll(self.feed, start), {'seq': start + 5, 'batches': [], 'reset': True})
+
+    def test_sync_workers_answer_a_json_poll(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        start = live_views.seq()
+        live_views.publish(self.views(2))
+
+        response = self.client.get(reverse('live_view_feed'), {'since': start})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertEqual((data['seq'], data['reset']), (start + 1, False))
+        self.assertEqual(data['batches'][0]['views'], 2)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old_hit = Movie.objects.create(tmdb_id=1, title='Old Hit')
+        self.new_hit = Movie.objects.create(tmdb_id=2, title='New Hit')
+
+    def views(self, movie, count, hours_ago=0):
+        at = timezone.now() - timedelta(hours=hours_ago)
+        return [MovieView(movie=movie, viewed_at=at) for _ in range(count)]
+
+    def test_recent_views_outrank_older_ones(self):
+        with override_settings(TRENDING_HALF_LIFE_HOURS=6):
+            record_views(self.views(self.old_hit, 8, hours_ago=24))
+            record_views(self.views(self.new_hit, 1))
+            record_views(self.views(self.new_hit, 1))
+
+            movies = TrendingSnapshot().movies()
+        self.assertEqual([movie['title'] for movie in movies], ['New Hit', 'Old Hit'])
+        self.assertAlmostEqual(movies[0]['score'], 2, places=2)
+        self.assertAlmostEqual(movies[1]['score'], 8 / 16, places=2)
+
+    def test_snapshot_is_shared_and_read_without_queries(self):
+        record_views(self.views(self.new_hit, 3))
+
+        with self.assertNumQueries(0):
+            movies = TrendingSnapshot().movies(limit=5)
+        self.assertEqual(movies[0]['id'], self.new_hit.tmdb_id)
+
+    def test_rebuild_replays_recent_views(self):
+        for event in self.views(self.old_hit, 2, hours_ago=1) + self.views(self.new_hit, 1, hours_ago=200):
+            event.save()
+        self.assertEqual(rebuild_trending(hours=72), 1)
+        self.assertEqual([movie['id'] for movie in TrendingSnapshot().movies()], [self.old_hit.tmdb_id])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ExportTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline, "Quoted" Movie')
+        self.other = Movie.objects.create(tmdb_id=2, title='Other Movie')
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            MovieView.objects.create(movie=self.movie, ip_address=ip)
+        MovieView.objects.create(movie=self.other, viewed_at=timezone.now() - timedelta(days=10))
+        self.staff = User.objects.create_user('supervisor', password='x', is_staff=True)
+
+    def test_csv_export_filters_by_movie_and_date(self):
+        data = b''.join(export_chunks('views', tmdb_id=1, start=timezone.localdate())).decode()
+        rows = list(csv.reader(io.StringIO(data)))
+        self.assertEqual(rows[0][:3], ['id', 'tmdb_id', 'title'])
+        self.assertEqual([row[2] for row in rows[1:]], [self.movie.title] * 2)
+
+        older = b''.join(export_chunks('views', end=timezone.localdate() - timedelta(days=1))).decode()
+        self.assertEqual(len(older.splitlines()), 2)
+
+    def test_endpoint_streams_gzipped_ndjson_to_staff_only(self):
+        url = reverse('export_data', args=['views'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'format': 'ndjson', 'gzip': 'on', 'movie': 2})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Other Movie'])
+
+        self.assertEqual(self.client.get(url, {'start': '2026-02-01', 'end': '2026-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['users'])).status_code, 404)
+
+
+class LocalSearchTests(TestCase):
+    def setUp(self):
+        self.knight = Movie.objects.create(tmdb_id=1, title='The Dark Knight', popularity=80)
+        Movie.objects.create(tmdb_id=2, title='Dark Waters', popularity=10)
+        Movie.objects.create(tmdb_id=3, title='Knight and Day', tagline='Dark secrets', popularity=30)
+        Movie.objects.create(tmdb_id=4, title='Batman', popularity=50)
+
+    def titles(self, query):
+        return [movie.title for movie in search_local(query)]
+
+    def test_ranked_prefix_matching(self):
+        self.assertEqual(self.titles('dark kni'), ['The Dark Knight', 'Knight and Day'])
+        self.assertEqual(self.titles('DARK')[0], 'The Dark Knight')
+
+    def test_index_follows_updates_and_bulk_writes(self):
+        Movie.objects.filter(tmdb_id=4).update(title='The Batman')
+        Movie.objects.bulk_create([Movie(tmdb_id=5, title='Batman Begins')])
+        self.assertEqual(sorted(self.titles('batman')), ['Batman Begins', 'The Batman'])
+
+        self.knight.delete()
+        self.assertEqual(self.titles('knight'), ['Knight and Day'])
+
+    def test_typos_fall_back_to_trigrams(self):
+        self.assertEqual(self.titles('batmn'), ['Batman'])
+
+    def test_databases_without_search_indexes_match_titles(self):
+        with patch.dict('movies.search._indexes', {connection.alias: {'full_text': False, 'trigram': False}}):
+            self.assertEqual(self.titles('dark'), ['The Dark Knight', 'Dark Waters'])
+            self.assertEqual(self.titles('batmn'), [])
+
+    def test_upstream_only_when_too_few_local_matches(self):
+        with override_settings(SEARCH_LOCAL_MIN_RESULTS=2):
+            self.assertIsNone(local_search_page('waters', 1))
+            self.assertEqual(local_search_page('dark', 1)['total_results'], 3)
+            # An exact title is enough on its own
+            self.assertEqual(local_search_page(' batman ', 1)['results'][0]['id'], 4)
+
+    @override_settings(
+        STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage', SEARCH_LOCAL_MIN_RESULTS=2
+    )
+    def test_search_page_is_answered_locally(self):
+        get_session().mount('https://', ReplayAdapter(Corpus()))
+        self.addCleanup(reset_session)
+        response = self.client.get(reverse('search'), {'q': 'dark'})
+        self.assertContains(response, 'The Dark Knight')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage', SEARCH_LOCAL=False)
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(get_response_cache().clear)
+        corpus = Corpus()
+        corpus.add(tmdb_key('/search/movie', query='batman', page=1), 200, popular_page('Batman'))
+        get_session().mount('https://', ReplayAdapter(corpus))
+        self.addCleanup(reset_session)
+
+    def test_query_variants_share_one_cached_result(self):
+        self.assertEqual(normalize_query('  ＢＡＴＭＡＮ!! '), 'batman')
+        before = search_cache_stats.snapshot()
+        for query in ('Batman', ' batman ', 'BATMAN!'):
+            self.assertContains(self.client.get(reverse('search'), {'q': query}), 'Batman')
+        after = search_cache_stats.snapshot()
+        self.assertEqual(after.get('misses', 0) - before.get('misses', 0), 1)
+        self.assertEqual(after.get('hits', 0) - before.get('hits', 0), 2)
+
+    def test_head_queries_live_longer_and_prefetch_page_two(self):
+        results = SearchResultCache(base_ttl=60, max_ttl=600, head_after=3)
+        self.assertEqual([results.ttl(count) for count in (1, 2, 5, 100)], [60, 120, 240, 600])
+
+        fetched = []
+        def fetch(query, page):
+            fetched.append((query, page))
+            return {'page': page, 'results': []}
+
+        self.assertFalse(results.prefetch('batman', 2, fetch, count=2))
+        self.assertTrue(results.prefetch('batman', 2, fetch, count=3))
+        for _ in range(100):
+            if results.get('batman', 2):
+                break
+            time.sleep(0.01)
+        self.assertEqual(fetched, [('batman', 2)])
+        self.assertEqual(results.get('batman', 2), {'page': 2, 'results': []})
+        self.assertFalse(results.prefetch('batman', 2, fetch, count=4))
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Movie.objects.create(tmdb_id=1, title='The Dark Knight', popularity=80)
+        Movie.objects.create(tmdb_id=2, title='Dark Waters', popularity=10)
+        Movie.objects.create(tmdb_id=3, title='Amélie', popularity=30)
+        self.index = PrefixIndex()
+        self.index.warm(background=False)
+
+    def titles(self, query):
+        return [movie['title'] for movie in self.index.suggest(query)]
+
+    def test_prefixes_match_any_word_by_popularity(self):
+        self.assertEqual(self.titles('dar'), ['The Dark Knight', 'Dark Waters'])
+        self.assertEqual(self.titles('D'), ['The Dark Knight', 'Dark Waters'])
+        self.assertEqual(self.titles('knig'), ['The Dark Knight'])
+        self.assertEqual(self.titles('  AMELIE'), ['Amélie'])
+        self.assertEqual(self.titles('dark w'), ['Dark Waters'])
+
+    def test_popular_titles_win_however_many_keys_share_the_prefix(self):
+        Movie.objects.bulk_create(
+            Movie(tmdb_id=100 + i, title=f'The Adventure {i}', popularity=1) for i in range(500)
+        )
+        Movie.objects.create(tmdb_id=99, title='The Zone', popularity=90)
+        self.index.warm(background=False)
+        self.assertEqual(self.titles('the')[:2], ['The Zone', 'The Dark Knight'])
+        self.assertEqual(len(self.titles('the adv')), 8)
+
+    def test_forked_worker_is_not_stuck_behind_the_parents_refresh(self):
+        cold = PrefixIndex()
+        # As if the parent had started a build thread just before forking
+        cold._refreshing = True
+        cold._after_fork()
+        with patch.object(threading, 'Thread') as thread:
+            self.assertIsNone(cold.snapshot())
+        thread.return_value.start.assert_called_once_with()
+
+    def test_incremental_update_and_memory_budget(self):
+        snapshot = self.index.snapshot()
+        Movie.objects.create(tmdb_id=4, title='Darkest Hour', popularity=50)
+        Movie.objects.filter(tmdb_id=1).update(is_hidden=True, updated_at=timezone.now())
+        self.index._snapshot = self.index.update(snapshot)
+        # Applied through the overlay; the sorted keys were not rebuilt
+        self.assertIs(self.index._snapshot.base, snapshot.base)
+        self.assertEqual(self.titles('dark'), ['Darkest Hour', 'Dark Waters'])
+
+        small = PrefixIndex(max_bytes=snapshot.nbytes() // 2)
+        self.assertLess(len(small.build().movies), 3)
+
+    def test_lookups_do_not_build_the_index(self):
+        cold = PrefixIndex()
+        cold._start_refresh = lambda: None
+        with self.assertNumQueries(0):
+            self.assertEqual(cold.suggest('dark'), [])
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_endpoint_skips_hidden_movies(self):
+        title_index._snapshot = None
+        self.addCleanup(setattr, title_index, '_snapshot', None)
+        title_index.warm(background=False)
+        # Hidden after the index was built: filtered at lookup time
+        Movie.objects.filter(tmdb_id=1).update(is_hidden=True)
+        hidden_movies.bump()
+        self.addCleanup(hidden_movies.bump)
+        response = self.client.get(reverse('search_suggestions'), {'q': 'dark'})
+        self.assertEqual([movie['id'] for movie in response.json()['results']], [2])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(reset_session)
+        self.addCleanup(get_response_cache().clear)
+        self.corpus = Corpus()
+        for path in ('/movie/popular', '/trending/movie/week', '/movie/top_rated', '/movie/upcoming'):
+            self.corpus.add(tmdb_key(path, page=1), 200, popular_page('Cached Rail'))
+        self.corpus.add(
+            tmdb_key('/movie/1', append_to_response='videos,credits,similar,recommendations'),
+            200, {'id': 1, 'title': 'Offline Movie'},
+        )
+        get_session().mount('https://', ReplayAdapter(self.corpus))
+        self.movie = Movie.objects.create(
+            tmdb_id=1, title='Offline Movie', overview='Shell text', youtube_trailer_key='abc'
+        )
+        self.user = User.objects.create_user('viewer', password='pw')
+
+    def go_offline(self):
+        """Later pages can only come from the page cache"""
+        get_session().mount('https://', ReplayAdapter(Corpus()))
+        get_response_cache().clear()
+
+    def test_anonymous_and_logged_in_share_the_shell(self):
+        self.assertContains(self.client.get(reverse('home')), 'Cached Rail')
+        self.go_offline()
+        hits = page_cache_stats.get('hits')
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Cached Rail')
+        self.assertContains(response, 'Sign Up')
+        self.assertNotContains(response, '<!--hole:')
+        self.assertIn('csrftoken', response.cookies)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Cached Rail')
+        self.assertContains(response, 'viewer')
+        self.assertNotContains(response, 'Sign Up')
+        self.assertEqual(page_cache_stats.get('hits'), hits + 2)
+
+    def test_moderation_and_catalog_changes_invalidate(self):
+        self.addCleanup(hidden_movies.bump)
+        self.client.get(reverse('home'))
+        Movie.objects.filter(tmdb_id=1).update(is_hidden=True)
+        hidden_movies.bump()
+        self.assertNotContains(self.client.get(reverse('home')), 'Cached Rail')
+
+        misses = page_cache_stats.get('misses')
+        self.client.get(reverse('home'))
+        page_cache.bump()
+        self.client.get(reverse('home'))
+        self.assertEqual(page_cache_stats.get('misses'), misses + 1)
+
+    def test_cached_detail_keeps_per_user_parts(self):
+        self.assertContains(self.client.get(reverse('movie_detail', args=[1])), 'Shell text')
+        self.go_offline()
+        recorded = get_counters('analytics').get('recorded')
+
+        Watchlist.objects.create(user=self.user, movie=self.movie)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('movie_detail', args=[1]))
+        self.assertContains(response, 'Shell text')
+        self.assertContains(response, 'In Watchlist')
+        self.assertNotContains(response, 'id="admin-hide-btn"')
+        # Cache hits still count as views
+        self.assertEqual(get_counters('analytics').get('recorded'), recorded + 1)
+        view_events.flush()
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(reset_session)
+        self.addCleanup(get_response_cache().clear)
+        self.addCleanup(view_events.flush)
+        corpus = Corpus()
+        for path in ('/movie/popular', '/trending/movie/week', '/movie/top_rated', '/movie/upcoming'):
+            corpus.add(tmdb_key(path, page=1), 200, popular_page('Cached Rail'))
+        corpus.add(tmdb_key('/movie/1', append_to_response='videos,credits,similar,recommendations'), 200, {'id': 1})
+        get_session().mount('https://', ReplayAdapter(corpus))
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie', youtube_trailer_key='abc')
+        self.user = User.objects.create_user('viewer', password='pw')
+
+    def test_repeat_visit_is_not_modified(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        tag = response['ETag']
+
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], tag)
+
+        # Same shared page, but a logged-in user sees a different navbar
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_detail_validators_follow_user_state(self):
+        self.client.force_login(self.user)
+        url = reverse('movie_detail', args=[1])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        tag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=tag).status_code, 304)
+
+        Watchlist.objects.create(user=self.user, movie=self.movie)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=tag)
+        self.assertContains(response, 'In Watchlist')
+        self.assertNotEqual(response['ETag'], tag)
+
+    def test_json_endpoints_revalidate(self):
+        response = self.client.get(reverse('movie_trailer', args=[1]))
+        self.assertEqual(response.json()['key'], 'abc')
+        response = self.client.get(reverse('movie_trailer', args=[1]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate_is_close(self):
+        sketch = HyperLogLog().update(f"ip{i}" for i in range(20000))
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+        self.assertLess(len(sketch.to_bytes()), 5000)
+
+    def test_merge_is_the_union(self):
+        a = HyperLogLog().update(range(0, 6000))
+        b = HyperLogLog().update(range(4000, 10000))
+        merged = HyperLogLog.union([a.to_bytes(), b.to_bytes()])
+        self.assertEqual(merged.registers, HyperLogLog().update(range(10000)).registers)
+        self.assertEqual(HyperLogLog.from_bytes(None).count(), 0)
+
+
+class CompactionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.movie = Movie.objects.create(tmdb_id=1, title='Offline Movie')
+        self.old = timezone.now() - timedelta(days=100)
+        for ip in ('10.0.0.1', '10.0.0.1', '10.0.0.2'):
+            MovieView.objects.create(movie=self.movie, ip_address=ip, viewed_at=self.old)
+        MovieView.objects.create(movie=self.movie, ip_address='10.0.0.3')
+
+    def test_old_days_move_to_archive_and_keep_their_rollup(self):
+        with override_settings(ANALYTICS_ARCHIVE_DIR=self.tmp.name):
+            days = compactable_days(90)
+            self.assertEqual(days, [timezone.localdate(self.old)])
+            self.assertEqual(compact_day(days[0], chunk_size=2), 3)
+
+            self.assertEqual(MovieView.objects.count(), 1)
+            archived = read_day(days[0])
+            self.assertEqual(archived['movie_id'], [self.movie.pk] * 3)
+            self.assertEqual(archived['ip_address'], ['10.0.0.1', '10.0.0.1', '10.0.0.2'])
+            self.assertEqual(daily_totals(days[0], days[0]), {days[0]: 3})
+
+            day_stats = MovieDailyStats.objects.get(movie=self.movie, day=days[0])
+            self.assertEqual((day_stats.views, day_stats.unique_viewers), (3, 2))
+
+            # Re-running (e.g. after an interruption) doesn't duplicate or undercount
+            self.assertEqual(compact_day(days[0]), 0)
+            self.assertEqual(len(read_day(days[0])['id']), 3)
+            self.assertEqual(MovieDailyStats.objects.get(movie=self.movie, day=days[0]).views, 3)
+
+    def test_rewrite_merges_by_movie_and_counts_viewers_per_movie(self):
+        day = timezone.localdate(self.old)
+        at = timezone.make_aware(datetime.combine(day, dt_time(12)))
+        with override_settings(ANALYTICS_ARCHIVE_DIR=self.tmp.name):
+            write_day(day, [(1, 7, at, None, '10.0.0.1'), (4, 7, at, None, '10.0.0.1'), (2, 9, at, 5, '')])
+            # A re-run repeats rows 1 and 2 and brings two late ones
+            header = write_day(day, [(1, 7, at, None, '10.0.0.1'), (6, 7, at, None, '10.0.0.2'),
+                                     (2, 9, at, 5, ''), (3, 9, at, None, '')])
+
+            self.assertEqual(header['movies'], {'7': 3, '9': 2})
+            self.assertEqual(header['unique_viewers'], 4)
+            archived = read_day(day)
+            self.assertEqual(archived['id'], [1, 4, 6, 2, 3])
+            self.assertEqual(archived['user_id'], [0, 0, 0, 5, 0])
+            self.assertEqual(archived['second'], [12 * 3600] * 5)
+            self.assertEqual(archived['ip_address'], ['10.0.0.1', '10.0.0.1', '10.0.0.2', '', ''])
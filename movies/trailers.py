@@ -0,0 +1,119 @@
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .metrics import get_counters
+from .models import Movie
+from .ratelimit import BACKGROUND, upstream_priority
+from .services import TMDBService, YouTubeService
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('trailers')
+
+# Trailer lookups run here instead of on the request path
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TRAILER_WORKERS', 2),
+                    thread_name_prefix='trailer-resolve',
+                )
+    return _executor
+
+
+def _claim_cache():
+    # Same alias as the YouTube embeddability cache, so the claim is cluster-wide when that cache is shared
+    return caches[getattr(settings, 'YOUTUBE_EMBED_CACHE_ALIAS', 'default')]
+
+
+def trailer_candidates(movie_data):
+    """YouTube trailer keys from TMDB videos (details with appended videos, or /videos), in TMDB order"""
+    videos = movie_data.get('videos', movie_data).get('results', [])
+    return [
+        v['key'] for v in videos
+        if v.get('site') == 'YouTube'
+        and v.get('type') == 'Trailer'
+        and v.get('key')
+    ]
+
+
+def resolve_trailer(movie, candidates=None, tmdb=None, youtube=None):
+    """
+    Find and store the first embeddable trailer for a movie.
+
+    When none is found the miss is stored too: the movie is skipped until
+    TRAILER_RETRY_AFTER has passed (TRAILER_ERROR_RETRY_AFTER after an
+    upstream error). Returns the trailer key or None.
+    """
+    now = timezone.now()
+    try:
+        if candidates is None:
+            candidates = trailer_candidates((tmdb or TMDBService()).get_movie_videos(movie.tmdb_id) or {})
+        embeddable = (youtube or YouTubeService()).is_embeddable_many(candidates, raise_errors=True) if candidates else {}
+    except Exception as e:
+        stats.incr('errors')
+        logger.error(f"Trailer lookup failed for movie {movie.tmdb_id}: {e}")
+        retry_after = now + timedelta(seconds=getattr(settings, 'TRAILER_ERROR_RETRY_AFTER', 3600))
+        Movie.objects.filter(pk=movie.pk).update(trailer_checked_at=now, trailer_retry_after=retry_after)
+        return None
+
+    key = next((key for key in candidates if embeddable.get(key)), None)
+    if key:
+        stats.incr('found')
+        Movie.objects.filter(pk=movie.pk).update(youtube_trailer_key=key, trailer_checked_at=now, trailer_retry_after=None)
+    else:
+        stats.incr('none_found')
+        retry_after = now + timedelta(seconds=getattr(settings, 'TRAILER_RETRY_AFTER', 7 * 24 * 3600))
+        Movie.objects.filter(pk=movie.pk).update(trailer_checked_at=now, trailer_retry_after=retry_after)
+    return key
+
+
+def _resolve_in_background(movie, candidates, claim_key):
+    try:
+        with upstream_priority(BACKGROUND):
+            resolve_trailer(movie, candidates)
+    except Exception as e:
+        logger.error(f"Background trailer resolution failed for movie {movie.tmdb_id}: {e}")
+    finally:
+        _claim_cache().delete(claim_key)
+        close_old_connections()
+
+
+def schedule_trailer(movie, movie_data=None):
+    """
+    Queue a trailer lookup for a movie that still needs one.
+
+    Returns True when a lookup is queued or already running. The claim in the
+    shared cache keeps concurrent views (in any worker) from queuing it twice.
+    """
+    if not movie.trailer_pending:
+        return False
+    claim_key = f"trailer:resolving:{movie.tmdb_id}"
+    if not _claim_cache().add(claim_key, 1, getattr(settings, 'TRAILER_CLAIM_TIMEOUT', 120)):
+        return True
+    candidates = trailer_candidates(movie_data) if movie_data else None
+    stats.incr('scheduled')
+    _get_executor().submit(_resolve_in_background, movie, candidates, claim_key)
+    return True
+
+
+def trailer_status(movie):
+    """JSON-friendly trailer state used by the detail page placeholder"""
+    if movie.youtube_trailer_key:
+        return {'status': 'found', 'key': movie.youtube_trailer_key}
+    if movie.trailer_pending:
+        return {'status': 'pending'}
+    return {'status': 'none', 'retry_after': movie.trailer_retry_after.isoformat()}
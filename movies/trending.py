@@ -0,0 +1,167 @@
+import math
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import get_counters
+from .models import MovieView, TrendingScore
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('trending')
+
+TRENDING_SNAPSHOT_KEY = 'trending:snapshot'
+
+# Origin of the forward-decay weights; any fixed instant works as long as it never changes
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def half_life_hours():
+    return getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 6.0)
+
+
+def log_weight(at):
+    """log2 of the weight of a view at ``at``: one more per half-life since EPOCH"""
+    return (at - EPOCH).total_seconds() / 3600 / half_life_hours()
+
+
+def log_add(a, b):
+    """log2(2 ** a + 2 ** b) without overflowing; ``a`` may be None"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(log_score, now=None):
+    """Decayed score at ``now``: a fresh view counts 1, half that one half-life later"""
+    return 2 ** (log_score - log_weight(now or timezone.now()))
+
+
+def record_views(events):
+    """
+    Add a batch of written MovieView events to the trending scores.
+
+    Each view is one log_add into its movie's score, with no decay pass over
+    other movies; afterwards the shared top-K snapshot is rebuilt. Returns
+    the number of movies touched.
+    """
+    increments = {}
+    for event in events:
+        increments[event.movie_id] = log_add(increments.get(event.movie_id), log_weight(event.viewed_at))
+    for movie_id, increment in increments.items():
+        with transaction.atomic():
+            row, created = TrendingScore.objects.select_for_update().get_or_create(
+                movie_id=movie_id, defaults={'log_score': increment}
+            )
+            if not created:
+                row.log_score = log_add(row.log_score, increment)
+                row.save(update_fields=['log_score', 'updated_at'])
+    stats.incr('views', len(events))
+    if increments:
+        trending_snapshot.publish()
+    return len(increments)
+
+
+def rebuild(hours=72, min_score=0.01):
+    """
+    Recompute every score from the raw MovieView rows of the last ``hours``.
+
+    Older views would weigh less than 2 ** -(hours / half-life), and movies
+    whose score has decayed below ``min_score`` are dropped. Returns the
+    number of movies scored.
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    scores = {}
+    for movie_id, viewed_at in MovieView.objects.filter(viewed_at__gte=since).values_list(
+        'movie_id', 'viewed_at'
+    ).iterator(chunk_size=5000):
+        scores[movie_id] = log_add(scores.get(movie_id), log_weight(viewed_at))
+    floor = log_weight(timezone.now()) + math.log2(min_score)
+
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create([
+            TrendingScore(movie_id=movie_id, log_score=log_score)
+            for movie_id, log_score in scores.items() if log_score >= floor
+        ], batch_size=1000)
+    trending_snapshot.publish()
+    logger.info(f"Rebuilt trending scores for {len(scores)} movies")
+    return len(scores)
+
+
+class TrendingSnapshot:
+    """
+    Top-K trending movies, shared through the cache and memoized per process.
+
+    Whichever worker flushes views rebuilds the list with one indexed
+    ``ORDER BY log_score LIMIT size`` query and stores it in the cache; the
+    others pick it up at most every ``check_interval`` seconds. Reading the
+    rail is a dict lookup in between and never runs aggregate SQL.
+    """
+
+    def __init__(self, alias='default', size=50, check_interval=5.0):
+        self.alias = alias
+        self.size = size
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def build(self):
+        rows = TrendingScore.objects.filter(movie__is_hidden=False).select_related('movie')[:self.size]
+        return {
+            'built_at': time.time(),
+            'movies': [
+                {
+                    'id': row.movie.tmdb_id,
+                    'title': row.movie.title,
+                    'overview': row.movie.overview,
+                    'poster_path': row.movie.poster_path,
+                    'backdrop_path': row.movie.backdrop_path,
+                    'log_score': row.log_score,
+                }
+                for row in rows
+            ],
+        }
+
+    def publish(self):
+        """Rebuild the snapshot and share it with every worker"""
+        snapshot = self.build()
+        self.cache.set(TRENDING_SNAPSHOT_KEY, snapshot, None)
+        with self._lock:
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+        stats.incr('snapshots')
+        return snapshot
+
+    def movies(self, limit=None):
+        """Trending movies, best first, each with its current decayed ``score``"""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is None or now - self._checked_at >= self.check_interval:
+            with self._lock:
+                snapshot = self.cache.get(TRENDING_SNAPSHOT_KEY) or self._snapshot
+                self._snapshot = snapshot
+                self._checked_at = now
+            if snapshot is None:
+                snapshot = self.publish()
+        at = timezone.now()
+        return [{**movie, 'score': current_score(movie['log_score'], at)} for movie in snapshot['movies'][:limit]]
+
+
+trending_snapshot = TrendingSnapshot(
+    alias=getattr(settings, 'TRENDING_CACHE_ALIAS', 'default'),
+    size=getattr(settings, 'TRENDING_SIZE', 50),
+    check_interval=getattr(settings, 'TRENDING_CHECK_INTERVAL', 5.0),
+)
@@ -0,0 +1,296 @@
+import os
+import json
+import gzip
+import time
+import random
+import atexit
+import asyncio
+import threading
+import logging
+import httpx
+import requests
+from urllib.parse import urlsplit, parse_qsl
+from requests.adapters import BaseAdapter
+from django.conf import settings
+from django.core.checks import Error
+from django.core.exceptions import ImproperlyConfigured
+
+from .metrics import get_counters
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+stats = get_counters('stub')
+
+# Credentials are never part of a corpus key (TMDB api_key, YouTube key)
+CREDENTIAL_PARAMS = {'api_key', 'key'}
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+def request_key(method, url, params=None):
+    """Stable corpus key: method, host, path and sorted query without credentials"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + [(str(k), str(v)) for k, v in (params or {}).items()]
+    query = sorted((k, v) for k, v in query if k not in CREDENTIAL_PARAMS)
+    encoded = '&'.join(f"{k}={v}" for k, v in query)
+    return f"{method.upper()} {parts.netloc}{parts.path}?{encoded}"
+
+
+class Corpus:
+    """Recorded upstream responses stored as one gzip-compressed JSON file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                self.entries = json.load(f).get('entries', {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, status, body, headers=None):
+        with self._lock:
+            self.entries[key] = {'status': status, 'body': body, 'headers': headers or {}}
+            self._dirty = True
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            if not path or not self._dirty:
+                return
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            tmp = f"{path}.tmp"
+            with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+                json.dump({'entries': self.entries}, f, sort_keys=True)
+            os.replace(tmp, path)
+            self._dirty = False
+        logger.info(f"Saved {len(self.entries)} upstream responses to {path}")
+
+
+class FaultProfile:
+    """
+    Latency and failure injection for replayed responses.
+
+    Each call waits ``latency_ms`` plus up to ``jitter_ms``. ``error_rate`` of
+    calls get a 503. Every ``burst_every`` seconds the first ``burst_seconds``
+    answer 429 with a Retry-After header, like a provider-side throttle.
+    """
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, burst_every=0, burst_seconds=0, seed=None, clock=time.time):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self):
+        """Return (delay_seconds, injected_status or None) for the next call"""
+        with self._lock:
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if self.burst_every and self.clock() % self.burst_every < self.burst_seconds:
+            stats.incr('throttled')
+            return delay, 429
+        if failed:
+            stats.incr('injected_errors')
+            return delay, 503
+        return delay, None
+
+    def retry_after(self):
+        if not self.burst_every:
+            return 1
+        return max(1, int(self.burst_seconds - self.clock() % self.burst_every) + 1)
+
+
+NOT_RECORDED = {'status_code': 34, 'status_message': 'Not recorded in the upstream corpus'}
+
+
+def _replay(corpus, faults, key):
+    """Resolve a key to (delay, status, body, headers)"""
+    delay, injected = faults.decide()
+    if injected == 429:
+        return delay, 429, {'status_message': 'Too many requests (stub burst)'}, {'Retry-After': str(faults.retry_after())}
+    if injected:
+        return delay, injected, {'status_message': 'Service unavailable (stub)'}, {}
+    entry = corpus.get(key)
+    if entry is None:
+        stats.incr('misses')
+        logger.warning(f"No recorded response for {key}")
+        return delay, 404, NOT_RECORDED, {}
+    stats.incr('hits')
+    return delay, entry['status'], entry['body'], entry.get('headers', {})
+
+
+class ReplayAdapter(BaseAdapter):
+    """requests transport adapter answering from a corpus instead of the network"""
+
+    def __init__(self, corpus, faults=None):
+        super().__init__()
+        self.corpus = corpus
+        self.faults = faults or FaultProfile()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        delay, status, body, headers = _replay(self.corpus, self.faults, request_key(request.method, request.url))
+        if delay:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode('utf-8')
+        response.headers.update({'Content-Type': 'application/json', **headers})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'Stub'
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(BaseAdapter):
+    """Wraps the real adapter and stores every JSON response in a corpus"""
+
+    def __init__(self, corpus, adapter):
+        super().__init__()
+        self.corpus = corpus
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        try:
+            self.corpus.add(request_key(request.method, request.url), response.status_code, response.json())
+            stats.incr('recorded')
+        except ValueError:
+            pass
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport answering from a corpus instead of the network"""
+
+    def __init__(self, corpus, faults=None):
+        self.corpus = corpus
+        self.faults = faults or FaultProfile()
+
+    async def handle_async_request(self, request):
+        delay, status, body, headers = _replay(self.corpus, self.faults, request_key(request.method, str(request.url)))
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(status, json=body, headers=headers, request=request)
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Wraps the real httpx transport and stores every JSON response in a corpus"""
+
+    def __init__(self, corpus, transport):
+        self.corpus = corpus
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        response = await self.transport.handle_async_request(request)
+        await response.aread()
+        try:
+            self.corpus.add(request_key(request.method, str(request.url)), response.status_code, response.json())
+            stats.incr('recorded')
+        except ValueError:
+            pass
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def stub_mode():
+    return getattr(settings, 'UPSTREAM_STUB_MODE', '') or ''
+
+
+def fault_profile_from_settings():
+    return FaultProfile(
+        latency_ms=getattr(settings, 'UPSTREAM_STUB_LATENCY_MS', 0),
+        jitter_ms=getattr(settings, 'UPSTREAM_STUB_JITTER_MS', 0),
+        error_rate=getattr(settings, 'UPSTREAM_STUB_ERROR_RATE', 0.0),
+        burst_every=getattr(settings, 'UPSTREAM_STUB_429_EVERY', 0),
+        burst_seconds=getattr(settings, 'UPSTREAM_STUB_429_SECONDS', 0),
+        seed=getattr(settings, 'UPSTREAM_STUB_SEED', None),
+    )
+
+
+RECORD_HINT = "record one with `UPSTREAM_STUB_MODE=record python manage.py runserver --noreload` (see README)"
+
+
+def _missing_corpus():
+    """Path of the replay corpus if replay mode is on and it doesn't exist, else None"""
+    path = getattr(settings, 'UPSTREAM_STUB_CORPUS', None) or ''
+    if stub_mode() == REPLAY and not os.path.exists(path):
+        return path or '(UPSTREAM_STUB_CORPUS is empty)'
+    return None
+
+
+def check_corpus(app_configs=None, **kwargs):
+    """System check: replaying without a corpus would answer every upstream call with a 404"""
+    path = _missing_corpus()
+    if path is None:
+        return []
+    return [Error(
+        f"UPSTREAM_STUB_MODE=replay but the corpus {path} does not exist",
+        hint=f"Set UPSTREAM_STUB_CORPUS to a recorded corpus, or {RECORD_HINT}.",
+        id='movies.E001',
+    )]
+
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus():
+    """Corpus at UPSTREAM_STUB_CORPUS, loaded once per process and saved at exit when recording"""
+    global _corpus
+    if _corpus is None:
+        with _corpus_lock:
+            if _corpus is None:
+                missing = _missing_corpus()
+                if missing is not None:
+                    raise ImproperlyConfigured(f"Replay corpus {missing} does not exist; {RECORD_HINT}")
+                _corpus = Corpus(getattr(settings, 'UPSTREAM_STUB_CORPUS', None))
+                if stub_mode() == RECORD:
+                    atexit.register(_corpus.save)
+                logger.info(f"Loaded {len(_corpus)} upstream responses ({stub_mode()} mode)")
+    return _corpus
+
+
+def install(session):
+    """Mount the record/replay adapter on a requests session when UPSTREAM_STUB_MODE is set"""
+    mode = stub_mode()
+    if mode == REPLAY:
+        adapter = ReplayAdapter(get_corpus(), fault_profile_from_settings())
+    elif mode == RECORD:
+        adapter = RecordingAdapter(get_corpus(), session.get_adapter('https://'))
+    else:
+        return session
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def async_transport(limits):
+    """httpx transport for UPSTREAM_STUB_MODE, or None to use the network"""
+    mode = stub_mode()
+    if mode == REPLAY:
+        return AsyncReplayTransport(get_corpus(), fault_profile_from_settings())
+    if mode == RECORD:
+        return AsyncRecordingTransport(get_corpus(), httpx.AsyncHTTPTransport(limits=limits))
+    return None
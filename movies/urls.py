@@ -1,15 +1,27 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Catalog pages are served by the async variants when running under ASGI
+if settings.ASYNC_VIEWS:
+    from . import async_views as catalog_views
+else:
+    catalog_views = views
+
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('browse/', views.browse_movies, name='browse'),
-    path('search/', views.search_movies, name='search'),
-    path('movie/<int:movie_id>/', views.movie_detail, name='movie_detail'),
+    path('', catalog_views.home, name='home'),
+    path('browse/', catalog_views.browse_movies, name='browse'),
+    path('search/', catalog_views.search_movies, name='search'),
+    path('search/suggest/', views.search_suggestions, name='search_suggestions'),
+    path('movie/<int:movie_id>/', catalog_views.movie_detail, name='movie_detail'),
+    path('movie/<int:movie_id>/trailer/', views.movie_trailer, name='movie_trailer'),
     path('watchlist/', views.watchlist, name='watchlist'),
     path('watchlist/add/<int:movie_id>/', views.add_to_watchlist, name='add_to_watchlist'),
     path('watchlist/remove/<int:movie_id>/', views.remove_from_watchlist, name='remove_from_watchlist'),
     path('profile/', views.profile, name='profile'),
     path('movie/toggle-hide/<int:movie_id>/', views.toggle_hide_movie, name='toggle_hide_movie'),
     path('supervisor-portal/', views.supervisor_dashboard, name='supervisor_dashboard'),
+    path('supervisor-portal/live/', views.live_view_feed, name='live_view_feed'),
+    path('supervisor-portal/export/<str:dataset>/', views.export_data, name='export_data'),
+    path('supervisor-portal/upstream/', views.upstream_status, name='upstream_status'),
 ]
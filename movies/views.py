@@ -1,10 +1,30 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Max
-from .models import Movie, Watchlist, MovieView
-from .services import TMDBService, YouTubeService
+from django.db.models import Q, Sum
+from .models import Movie, Watchlist, MovieDailyStats, SiteDailyStats
+from .services import TMDBService
+from .analytics import view_events
+from .autocomplete import title_index
+from .archive import daily_totals as archived_view_totals
+from .catalog import mirror_page
+from .export import FORMATS, DATASETS as EXPORT_DATASETS, aexport_chunks, export_chunks, export_filename
+from .fanout import fan_out, overdue as fanout_overdue
+from .forms import ExportForm, SearchForm
+from .live import live_views, poll as live_poll, astream as live_astream
+from .trailers import schedule_trailer, trailer_status
+from .trending import trending_snapshot
+from .metrics import snapshot_all
+from .moderation import hidden_movies
+from .page_cache import page_cache
+from . import conditional
+from .ratelimit import youtube_quota
+from .resilience import breaker_states
+from .search import local_search_page
+from .search_cache import search_results
+from .rollups import view_total, unique_viewers
 import logging
 
 from django.contrib.admin.views.decorators import staff_member_required
@@ -15,7 +35,6 @@ from datetime import timedelta
 logger = logging.getLogger(__name__)
 
 tmdb_service = TMDBService()
-youtube_service = YouTubeService()
 
 def _filter_hidden_movies(request, movies_list):
     """Helper to filter out hidden movies from API results for regular users"""
@@ -23,89 +42,141 @@ def _filter_hidden_movies(request, movies_list):
         # Supervisors can see everything
         return movies_list
     
-    hidden_ids = Movie.objects.filter(is_hidden=True).values_list('tmdb_id', flat=True)
+    hidden_ids = hidden_movies.ids()
     return [m for m in movies_list if m.get('id') not in hidden_ids]
 
-def home(request):
-    """Home page with featured movies"""
-    # Get trending movies with error handling
-    try:
-        trending_data = tmdb_service.get_trending_movies()
-        popular_data = tmdb_service.get_popular_movies()
-        top_rated_data = tmdb_service.get_top_rated_movies()
-    except Exception as e:
-        logger.error(f"Error fetching home page movies: {e}")
-        trending_data = None
-        popular_data = None
-        top_rated_data = None
-    
-    trending = trending_data.get('results', []) if trending_data else []
-    popular = popular_data.get('results', []) if popular_data else []
-    top_rated = top_rated_data.get('results', []) if top_rated_data else []
+def _results(data):
+    """Return the 'results' list of a TMDB list payload, or [] if the call failed"""
+    return data.get('results', []) if data else []
+
+
+def _hidden_ids_for_staff(request):
+    """Hidden TMDB ids used to badge movies in supervisor views"""
+    if request.user.is_staff:
+        return hidden_movies.ids()
+    return frozenset()
+
+
+def _render_page(request, name, template_name, context, page_digest, fragments=None, meta=None,
+                 timeout=None, user_state=(), last_modified=None):
+    """
+    Render a catalog page through the page cache, or answer 304.
+
+    ``page_digest`` hashes the inputs the shared part of the page was built
+    from; with the user state it forms the ETag, checked before anything is
+    rendered. Otherwise the page is rendered once as a shared shell with its
+    per-user holes left open, stored, and then filled for this request.
+    ``fragments`` is the part of the context the holes need; ``meta`` comes
+    back on cache hits.
+    """
+    fragments = fragments or {}
+    tag = conditional.etag(page_digest, conditional.user_state(request, *user_state))
+
+    def render_page():
+        key = page_cache.key(request, name)
+        if key is None:
+            return render(request, template_name, {**context, **fragments})
+        response = render(request, template_name, {**context, **fragments, 'page_shell': True})
+        entry = page_cache.store(
+            key, response.content.decode('utf-8'), fragments,
+            {**(meta or {}), 'digest': page_digest, 'last_modified': last_modified},
+            timeout, anonymous=not request.user.is_staff,
+        )
+        return page_cache.respond(request, entry, fragments)
+
+    return conditional.respond(request, name, tag, render_page, last_modified)
 
-    # Get upcoming movies for "New Trailer" section
-    try:
-        upcoming_data = tmdb_service.get_upcoming_movies()
-        upcoming = upcoming_data.get('results', []) if upcoming_data else []
-    except Exception as e:
-        logger.error(f"Error fetching upcoming movies: {e}")
-        upcoming = []
-
-    # Top 5 Viewed Movies Today
-    today = timezone.now().date()
-    top_today = Movie.objects.filter(
-        views__viewed_at__date=today,
-        is_hidden=False
-    ).annotate(
-        today_views=Count('views')
-    ).order_by('-today_views')[:5]
+
+def _respond_cached(request, name, cached, fragments=None, user_state=()):
+    """Serve a page cache hit, or 304 when the client already has it"""
+    meta = cached['meta']
+    tag = conditional.etag(meta['digest'], conditional.user_state(request, *user_state))
+    return conditional.respond(
+        request, name, tag, lambda: page_cache.respond(request, cached, fragments), meta['last_modified']
+    )
+
+
+def _home_rails(service):
+    """The independent upstream calls behind the home page rails"""
+    return {
+        'trending': service.get_trending_movies,
+        'popular': service.get_popular_movies,
+        'top_rated': service.get_top_rated_movies,
+        'upcoming': service.get_upcoming_movies,  # "New Trailer" section
+    }
+
+
+def _render_home(request, rails):
+    # Top 5 Viewed Movies Today, from the daily rollup
+    top_today = []
+    for day_stats in MovieDailyStats.objects.filter(
+        day=timezone.localdate(),
+        movie__is_hidden=False
+    ).select_related('movie').order_by('-views')[:5]:
+        day_stats.movie.today_views = day_stats.views
+        top_today.append(day_stats.movie)
 
     context = {
-        'trending_movies': _filter_hidden_movies(request, trending)[:24],
-        'popular_movies': _filter_hidden_movies(request, popular)[:24],
-        'top_rated_movies': _filter_hidden_movies(request, top_rated)[:24],
-        'new_trailers': _filter_hidden_movies(request, upcoming)[:5],
+        'trending_movies': _filter_hidden_movies(request, _results(rails['trending']))[:24],
+        'popular_movies': _filter_hidden_movies(request, _results(rails['popular']))[:24],
+        'top_rated_movies': _filter_hidden_movies(request, _results(rails['top_rated']))[:24],
+        'new_trailers': _filter_hidden_movies(request, _results(rails['upcoming']))[:5],
         'top_today': top_today,
-        'hidden_movies_ids': list(Movie.objects.filter(is_hidden=True).values_list('tmdb_id', flat=True)) if request.user.is_staff else []
+        # "Trending on Aura": decayed local view scores, read from the per-process snapshot
+        'aura_trending': _filter_hidden_movies(request, trending_snapshot.movies(limit=24))[:12],
+        'hidden_movies_ids': _hidden_ids_for_staff(request),
     }
-    
-    return render(request, 'movies/home.html', context)
+
+    page_digest = conditional.digest(
+        rails,
+        [(movie.tmdb_id, movie.today_views) for movie in top_today],
+        [movie['id'] for movie in context['aura_trending']],
+        hidden_movies.version(),
+    )
+    return _render_page(request, 'home', 'movies/home.html', context, page_digest)
 
 
-def browse_movies(request):
-    """Browse all movies with filters"""
-    page = request.GET.get('page', 1)
-    category = request.GET.get('category', 'popular')
-    genre_id = request.GET.get('genre')
+def home(request):
+    """Home page with featured movies"""
+    cached = page_cache.get(request, 'home')
+    if cached:
+        return _respond_cached(request, 'home', cached)
 
-    # Fetch available genres for the UI
-    try:
-        genres_data = tmdb_service.get_genres()
-        genres = genres_data.get('genres', []) if genres_data else []
-    except Exception as e:
-        logger.error(f"Error fetching genres: {e}")
-        genres = []
-    
-    # Determine which API to call based on filters
+    # Fetch all rails concurrently; a failed rail is simply rendered empty
+    rails = fan_out(_home_rails(tmdb_service))
+    return _render_home(request, rails)
+
+
+def _browse_params(request):
+    return (
+        request.GET.get('page', 1),
+        request.GET.get('category', 'popular'),
+        request.GET.get('genre'),
+    )
+
+
+def _browse_movies_call(service, category, genre_id, page):
+    """Pick the list endpoint for the selected filters (works for sync and async services)"""
     if genre_id:
         # If genre is selected, use discover endpoint
-        data = tmdb_service.discover_movies(with_genres=genre_id, page=page)
+        return lambda: service.discover_movies(with_genres=genre_id, page=page)
     elif category == 'trending':
-        data = tmdb_service.get_trending_movies(page=page)
+        return lambda: service.get_trending_movies(page=page)
     elif category == 'top_rated':
-        data = tmdb_service.get_top_rated_movies(page=page)
+        return lambda: service.get_top_rated_movies(page=page)
     elif category == 'upcoming':
-        data = tmdb_service.get_upcoming_movies(page=page)
+        return lambda: service.get_upcoming_movies(page=page)
     elif category == 'now_playing':
-        data = tmdb_service.get_now_playing_movies(page=page)
-    else:
-        # Default to popular
-        data = tmdb_service.get_popular_movies(page=page)
-    
-    movies = data.get('results', []) if data else []
-    filtered_movies = _filter_hidden_movies(request, movies)
+        return lambda: service.get_now_playing_movies(page=page)
+    # Default to popular
+    return lambda: service.get_popular_movies(page=page)
+
+
+def _render_browse(request, page, category, genre_id, genres_data, data):
+    genres = genres_data.get('genres', []) if genres_data else []
+    filtered_movies = _filter_hidden_movies(request, _results(data))
     total_pages = data.get('total_pages', 1) if data else 1
-    
+
     context = {
         'movies': filtered_movies,
         'category': category,
@@ -114,27 +185,38 @@ def browse_movies(request):
         'current_page': int(page),
         'total_pages': min(total_pages, 500),  # TMDB limits to 500 pages
         'page_range': _get_page_range(int(page), min(total_pages, 500)),
-        'hidden_movies_ids': list(Movie.objects.filter(is_hidden=True).values_list('tmdb_id', flat=True)) if request.user.is_staff else []
+        'hidden_movies_ids': _hidden_ids_for_staff(request),
     }
-    
-    return render(request, 'movies/browse.html', context)
 
+    page_digest = conditional.digest(data, genres, hidden_movies.version())
+    return _render_page(request, 'browse', 'movies/browse.html', context, page_digest)
 
-def movie_detail(request, movie_id):
-    """Movie detail page"""
-    # Get movie details from TMDB with error handling for SSL and network issues
-    try:
-        movie_data = tmdb_service.get_movie_details(movie_id)
-    except Exception as e:
-        logger.error(f"Error fetching movie details for {movie_id}: {e}")
-        return render(request, 'movies/error.html', {
-            'message': 'Unable to load movie details. The movie database is temporarily unavailable. Please try again in a few moments.'
-        })
-    
-    if not movie_data:
-        return render(request, 'movies/error.html', {'message': 'Movie not found'})
-    
-    # Get or create movie in database
+
+def browse_movies(request):
+    """Browse all movies with filters"""
+    cached = page_cache.get(request, 'browse')
+    if cached:
+        return _respond_cached(request, 'browse', cached)
+
+    page, category, genre_id = _browse_params(request)
+
+    # Category lists are served from the local mirror when it is fresh (see sync_catalog)
+    data = None if genre_id else mirror_page(category, page)
+
+    # Genres (for the UI) and the movie list are independent, so fetch them together
+    calls = {'genres': tmdb_service.get_genres}
+    if data is None:
+        calls['movies'] = _browse_movies_call(tmdb_service, category, genre_id, page)
+    results = fan_out(calls)
+    return _render_browse(request, page, category, genre_id, results['genres'], data or results['movies'])
+
+
+def _detail_error(request, message):
+    return render(request, 'movies/error.html', {'message': message})
+
+
+def _get_visible_movie(request, movie_id, movie_data):
+    """Get or create the local Movie row; returns (movie, error_response)"""
     movie, created = Movie.objects.get_or_create(
         tmdb_id=movie_id,
         defaults=tmdb_service.parse_movie_data(movie_data)
@@ -142,87 +224,190 @@ def movie_detail(request, movie_id):
 
     # Check if movie is hidden and user is not staff
     if movie.is_hidden and not (request.user.is_authenticated and request.user.is_staff):
-        return render(request, 'movies/error.html', {'message': 'This movie is currently restricted.'})
-    
-    # Get YouTube trailer
-   # Only check and save trailer if not already saved
-    if not movie.youtube_trailer_key:
+        return movie, _detail_error(request, 'This movie is currently restricted.')
+    return movie, None
 
-        videos = movie_data.get('videos', {}).get('results', [])
 
-        youtube_trailers = [
-            v for v in videos
-            if v.get('site') == 'YouTube'
-            and v.get('type') == 'Trailer'
-        ]
-
-        selected_trailer = None
-
-        for v in youtube_trailers:
-            if youtube_service.is_embeddable(v['key']):
-                selected_trailer = v
-                break
-
-        if selected_trailer:
-            movie.youtube_trailer_key = selected_trailer['key']
-            movie.save()
-
-    # Check if movie is in user's watchlist
-    in_watchlist = False
-    if request.user.is_authenticated:
-        in_watchlist = Watchlist.objects.filter(user=request.user, movie=movie).exists()
-            
+def _record_view(request, movie_pk):
     # Track view for analytics
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
         ip = x_forwarded_for.split(',')[0]
     else:
         ip = request.META.get('REMOTE_ADDR')
-        
-    MovieView.objects.create(
-        movie=movie,
-        user=request.user if request.user.is_authenticated else None,
+
+    # Buffered: written in batches by the analytics flusher, off the request path
+    view_events.record(
+        movie_id=movie_pk,
+        user_id=request.user.pk if request.user.is_authenticated else None,
         ip_address=ip
     )
-    
+
+
+def _detail_fragments(request, movie):
+    """Context for the per-user holes of the detail page (watchlist button, staff controls)"""
+    # Check if movie is in user's watchlist
+    in_watchlist = False
+    if request.user.is_authenticated:
+        in_watchlist = Watchlist.objects.filter(user=request.user, movie_id=movie.pk).exists()
+    return {'movie': movie, 'in_watchlist': in_watchlist}
+
+
+def _render_detail(request, movie, movie_data):
+    _record_view(request, movie.pk)
+
     context = {
         'movie': movie,
         'movie_data': movie_data,
-        'in_watchlist': in_watchlist,
         'cast': movie_data.get('credits', {}).get('cast', [])[:10],
         'similar_movies': movie_data.get('similar', {}).get('results', [])[:6],
+        'trailer_pending': movie.trailer_pending,
     }
-    
-    return render(request, 'movies/detail.html', context)
 
+    # A page still waiting on its trailer shows a placeholder, so it is only cached
+    # once the lookup settled, and no longer than until a "none found" is retried
+    timeout = None
+    if movie.trailer_pending:
+        timeout = 0
+    elif movie.trailer_retry_after:
+        timeout = max(0, int((movie.trailer_retry_after - timezone.now()).total_seconds()))
+
+    # Trailer lookups write with update(), which leaves updated_at alone
+    page_digest = conditional.digest(
+        movie_data, movie.updated_at, movie.youtube_trailer_key, movie.trailer_pending, hidden_movies.version()
+    )
+    fragments = _detail_fragments(request, movie)
+    return _render_page(
+        request, 'movie_detail', 'movies/detail.html', context, page_digest,
+        fragments=fragments,
+        meta={'movie': {'pk': movie.pk, 'tmdb_id': movie.tmdb_id, 'is_hidden': movie.is_hidden}},
+        timeout=timeout,
+        user_state=(fragments['in_watchlist'],),
+        last_modified=max(filter(None, [movie.updated_at, movie.trailer_checked_at])),
+    )
 
-def search_movies(request):
-    """Search movies"""
-    query = request.GET.get('q', '')
-    page = request.GET.get('page', 1)
-    
+
+def _respond_detail(request, cached):
+    """Serve a cached detail page: record the view and fill its holes without TMDB"""
+    movie = Movie(**cached['meta']['movie'])
+    _record_view(request, movie.pk)
+    fragments = _detail_fragments(request, movie)
+    return _respond_cached(request, 'movie_detail', cached, fragments, user_state=(fragments['in_watchlist'],))
+
+
+DETAIL_UNAVAILABLE = 'Unable to load movie details. The movie database is temporarily unavailable. Please try again in a few moments.'
+
+
+def movie_detail(request, movie_id):
+    """Movie detail page"""
+    cached = page_cache.get(request, 'movie_detail')
+    if cached:
+        return _respond_detail(request, cached)
+
+    # Get movie details from TMDB with error handling for SSL and network issues
+    try:
+        movie_data = tmdb_service.get_movie_details(movie_id)
+    except Exception as e:
+        logger.error(f"Error fetching movie details for {movie_id}: {e}")
+        return _detail_error(request, DETAIL_UNAVAILABLE)
+
+    if not movie_data:
+        return _detail_error(request, 'Movie not found')
+
+    movie, error_response = _get_visible_movie(request, movie_id, movie_data)
+    if error_response:
+        return error_response
+
+    # Resolve a missing trailer in the background; the page shows a placeholder meanwhile
+    schedule_trailer(movie, movie_data)
+
+    return _render_detail(request, movie, movie_data)
+
+
+def movie_trailer(request, movie_id):
+    """Trailer state polled by the detail page placeholder"""
+    movie = Movie.objects.filter(tmdb_id=movie_id).first()
+    if movie is None or (movie.is_hidden and not request.user.is_staff):
+        return JsonResponse({'status': 'error', 'message': 'Movie not found'}, status=404)
+    # Re-queue the lookup if the worker that claimed it went away
+    schedule_trailer(movie)
+    status = trailer_status(movie)
+    return conditional.respond(request, 'movie_trailer', conditional.etag(status), lambda: JsonResponse(status))
+
+
+def _render_search(request, query, page, data):
     if query:
-        data = tmdb_service.search_movies(query, page=page)
-        movies = data.get('results', []) if data else []
-        filtered_movies = _filter_hidden_movies(request, movies)
+        filtered_movies = _filter_hidden_movies(request, _results(data))
         total_pages = data.get('total_pages', 1) if data else 1
-        total_results = data.get('total_results', 0) if data else 0
+        total_results = data.get('total_results', len(filtered_movies)) if data else 0
     else:
         filtered_movies = []
         total_pages = 1
         total_results = 0
-    
+
     context = {
         'movies': filtered_movies,
         'query': query,
         'current_page': int(page),
         'total_pages': min(total_pages, 500),
-        'total_results': data.get('total_results', len(filtered_movies)) if query else 0,
+        'total_results': total_results,
         'page_range': _get_page_range(int(page), min(total_pages, 500)),
-        'hidden_movies_ids': list(Movie.objects.filter(is_hidden=True).values_list('tmdb_id', flat=True)) if request.user.is_staff else []
+        'hidden_movies_ids': _hidden_ids_for_staff(request),
     }
-    
-    return render(request, 'movies/search.html', context)
+
+    tag = conditional.etag(query, page, data, hidden_movies.version(), conditional.user_state(request))
+    return conditional.respond(request, 'search', tag, lambda: render(request, 'movies/search.html', context))
+
+
+def _search_payload(query, page):
+    """Results for a normalized query: stored movies when they answer it, TMDB otherwise"""
+    data = local_search_page(query, page)
+    if data is None:
+        data = tmdb_service.search_movies(query, page=page)
+    return data
+
+
+def _search_params(request):
+    """(display query, normalized query or '', page) for a search request"""
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return request.GET.get('q', ''), '', 1
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    return form.cleaned_data['q'], form.cleaned_data['normalized_q'], page
+
+
+def search_movies(request):
+    """Search movies"""
+    query, normalized, page = _search_params(request)
+
+    data = None
+    if normalized:
+        # "Batman", " batman " and "BATMAN" share one cached result
+        count = search_results.record(normalized)
+        data = search_results.get(normalized, page)
+        if data is None:
+            try:
+                data = _search_payload(normalized, page)
+            except Exception as e:
+                logger.error(f"Error searching movies for '{normalized}': {e}")
+            if data:
+                search_results.set(normalized, page, data, count)
+        if data and page == 1 and data.get('total_pages', 1) > 1:
+            search_results.prefetch(normalized, 2, _search_payload, count)
+    return _render_search(request, query, page, data)
+
+
+def search_suggestions(request):
+    """Typeahead suggestions for the search box, from the in-process title index (JSON)"""
+    query = request.GET.get('q', '')[:100]
+    exclude = frozenset() if request.user.is_staff else hidden_movies.ids()
+    payload = {'query': query, 'results': title_index.suggest(query, exclude=exclude)}
+    return conditional.respond(
+        request, 'search_suggestions', conditional.etag(payload), lambda: JsonResponse(payload)
+    )
 
 
 def _get_page_range(current, total):
@@ -260,13 +445,17 @@ def _get_page_range(current, total):
 @login_required
 def watchlist(request):
     """User's watchlist"""
-    watchlist_items = Watchlist.objects.filter(user=request.user).select_related('movie')
+    watchlist_items = list(Watchlist.objects.filter(user=request.user).select_related('movie'))
     
     context = {
         'watchlist_items': watchlist_items,
     }
     
-    return render(request, 'movies/watchlist.html', context)
+    tag = conditional.etag(
+        [(item.pk, item.movie.pk, item.movie.updated_at) for item in watchlist_items],
+        conditional.user_state(request),
+    )
+    return conditional.respond(request, 'watchlist', tag, lambda: render(request, 'movies/watchlist.html', context))
 
 
 @login_required
@@ -329,6 +518,7 @@ def toggle_hide_movie(request, movie_id):
             
             movie.is_hidden = not movie.is_hidden
             movie.save()
+            hidden_movies.bump()
             
             status = "hidden" if movie.is_hidden else "visible"
             return JsonResponse({
@@ -393,6 +583,9 @@ def profile(request):
 
     return redirect('profile') if request.method == 'POST' and 'form_type' not in request.POST else render(request, 'accounts/profile.html', context)
 
+CHART_RANGES = ['7', '30', '90', '365']
+
+
 @staff_member_required
 def supervisor_dashboard(request):
     all_movies = Movie.objects.filter(is_hidden=True).order_by('-updated_at')
@@ -402,60 +595,58 @@ def supervisor_dashboard(request):
     page_number = request.GET.get('page', 1)
     movies = paginator.get_page(page_number)
     hidden_count = Movie.objects.filter(is_hidden=True).count()
-    total_views = MovieView.objects.count()
-    views_today = MovieView.objects.filter(viewed_at__date=timezone.now().date()).count()
+    # View statistics come from the (movie, day) rollup, not the raw MovieView events
+    today = timezone.localdate()
+    total_views = view_total()
+    views_today = view_total(today)
     
-    # Top 10 Viewed Movies
-    top_movies = Movie.objects.annotate(
-        view_count=Count('views')
-    ).order_by('-view_count')[:10]
+    # Top 10 trending movies by time-decayed views (shared snapshot, no aggregate query)
+    top_movies = trending_snapshot.movies(limit=10)
     
     # Live Active Today — each movie shown once, with its total view count for today
-    today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    live_today = (
-        MovieView.objects.filter(viewed_at__gte=today_start)
-        .values('movie_id')
-        .annotate(
-            views_count=Count('id'),
-            last_viewed=Max('viewed_at')
-        )
-        .order_by('-last_viewed')[:20]
-    )
-    # Attach actual Movie objects
-    movie_ids = [item['movie_id'] for item in live_today]
-    movies_map = {m.id: m for m in Movie.objects.filter(id__in=movie_ids)}
     live_today_feed = [
         {
-            'movie': movies_map[item['movie_id']],
-            'views_count': item['views_count'],
-            'last_viewed': item['last_viewed'],
+            'movie': day_stats.movie,
+            'views_count': day_stats.views,
+            'last_viewed': day_stats.last_viewed_at,
         }
-        for item in live_today
-        if item['movie_id'] in movies_map
+        for day_stats in MovieDailyStats.objects.filter(day=today)
+        .select_related('movie').order_by('-last_viewed_at')[:20]
     ]
 
-    # Daily views for the last 7 days
-    seven_days_ago = timezone.now().date() - timedelta(days=6)
-    daily_stats = MovieView.objects.filter(
-        viewed_at__date__gte=seven_days_ago
-    ).values('viewed_at__date').annotate(count=Count('id')).order_by('viewed_at__date')
+    # Daily views for the selected range (7 days by default); days missing from
+    # the rollup are read from the compacted archives
+    chart_days = request.GET.get('days', '7')
+    chart_days = int(chart_days) if chart_days in CHART_RANGES else 7
+    first_day = today - timedelta(days=chart_days - 1)
+    daily_stats = MovieDailyStats.objects.filter(
+        day__gte=first_day
+    ).values('day').annotate(count=Sum('views')).order_by('day')
+    # Unique viewers per day and over the whole range, from the site-wide HyperLogLog sketches
+    daily_uniques = dict(SiteDailyStats.objects.filter(day__gte=first_day).values_list('day', 'unique_viewers'))
+    unique_viewers_range = unique_viewers(first_day, today)
 
     # Prepare data for Chart.js
     chart_labels = []
     chart_data = []
+    chart_unique_data = []
     
     stats_dict = {}
     for s in daily_stats:
-        date_key = s['viewed_at__date']
+        date_key = s['day']
         if date_key:
             if not isinstance(date_key, str):
                 date_key = date_key.strftime('%Y-%m-%d')
             stats_dict[date_key] = s['count']
     
-    for i in range(7):
-        date = seven_days_ago + timedelta(days=i)
+    for day, count in archived_view_totals(first_day, today).items():
+        stats_dict.setdefault(day.strftime('%Y-%m-%d'), count)
+
+    for i in range(chart_days):
+        date = first_day + timedelta(days=i)
         chart_labels.append(date.strftime('%b %d'))
         chart_data.append(stats_dict.get(date.strftime('%Y-%m-%d'), 0))
+        chart_unique_data.append(daily_uniques.get(date, 0))
 
     context = {
         'movies': movies,
@@ -466,6 +657,78 @@ def supervisor_dashboard(request):
         'live_today_feed': live_today_feed,
         'chart_labels': chart_labels,
         'chart_data': chart_data,
+        'chart_unique_data': chart_unique_data,
+        'unique_viewers_range': unique_viewers_range,
+        'chart_days': chart_days,
+        'chart_ranges': CHART_RANGES,
+        'upstream_breakers': breaker_states(),
+        'youtube_quota': youtube_quota.usage(),
+        'live_seq': live_views.seq(),
+        'live_sse': settings.ASYNC_VIEWS,
+        'live_poll_ms': int(getattr(settings, 'LIVE_FEED_CLIENT_POLL_INTERVAL', 5) * 1000),
+        'today': today.isoformat(),
     }
     
     return render(request, 'movies/supervisor_dashboard.html', context)
+
+
+@staff_member_required
+def live_view_feed(request):
+    """
+    View deltas for the supervisor dashboard (Supervisor only).
+
+    ASGI workers stream them as server-sent events; sync workers answer one
+    JSON poll so an open dashboard never holds a worker.
+    """
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    try:
+        since = int(since)
+    except (TypeError, ValueError):
+        since = live_views.seq()
+    if not settings.ASYNC_VIEWS:
+        response = JsonResponse(live_poll(live_views, since))
+        response['Cache-Control'] = 'no-cache'
+        return response
+    events = live_astream(live_views, since, getattr(settings, 'LIVE_FEED_POLL_INTERVAL', 1.0))
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """Stream MovieView or Watchlist rows as CSV / NDJSON, optionally gzipped (Supervisor only)"""
+    if dataset not in EXPORT_DATASETS:
+        return JsonResponse({'status': 'error', 'message': 'Unknown dataset'}, status=404)
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+    options = form.cleaned_data
+
+    chunks = export_chunks(
+        dataset, options['format'], options['gzip'],
+        start=options['start'], end=options['end'], tmdb_id=options['movie'],
+    )
+    if settings.ASYNC_VIEWS:
+        chunks = aexport_chunks(chunks)
+    content_type = 'application/gzip' if options['gzip'] else FORMATS[options['format']]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = export_filename(dataset, options['format'], options['gzip'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+def upstream_status(request):
+    """Circuit breaker states and this worker's upstream / analytics counters (Supervisor only)"""
+    return JsonResponse({
+        'breakers': breaker_states(),
+        'quotas': [youtube_quota.usage()],
+        'analytics': view_events.describe(),
+        'autocomplete': title_index.describe(),
+        'search_cache': search_results.describe(),
+        'page_cache': page_cache.describe(),
+        'fanout_overdue': fanout_overdue(),
+        'metrics': snapshot_all(),
+    })